@@ -0,0 +1,80 @@
+"""Throughput of the compiled column classifier versus per-pattern re.match.
+
+Usage: python -m benchmarks.classifier [--names N] [--extra-keywords N]
+"""
+import argparse
+import random
+import re
+import string
+import time
+
+from column_classifier import ColumnClassifier
+
+# The hard-coded patterns the automator used before rules moved to classification_rules.json
+LEGACY_PATTERNS = {
+    'email': r'.*email.*|.*mail.*',
+    'phone': r'.*phone.*|.*mobile.*|.*tel.*',
+    'ssn': r'.*ssn.*|.*social.*security.*',
+    'credit_card': r'.*card.*|.*cc.*|.*credit.*',
+    'name': r'.*name.*|.*first.*|.*last.*',
+    'address': r'.*address.*|.*addr.*|.*street.*'
+}
+
+WORDS = ['customer', 'order', 'id', 'email', 'phone', 'amount', 'created', 'at', 'ssn', 'card',
+         'first', 'name', 'street', 'total', 'status', 'account', 'region', 'code', 'payload', 'ts']
+
+
+def synthetic_names(count: int, seed: int = 7):
+    rng = random.Random(seed)
+    return ['_'.join(rng.choice(WORDS) for _ in range(rng.randint(1, 4))) for _ in range(count)]
+
+
+def legacy_classify(names, patterns):
+    result = []
+    for name in names:
+        for sensitivity_type, pattern in patterns.items():
+            if re.match(pattern, name.lower()):
+                result.append(sensitivity_type)
+                break
+        else:
+            result.append(None)
+    return result
+
+
+def timed(label, func, names):
+    start = time.perf_counter()
+    result = func(names)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<42} {elapsed:8.2f}s  {len(names) / elapsed:>12,.0f} names/s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--names', type=int, default=1000000)
+    parser.add_argument('--extra-keywords', type=int, default=5000,
+                        help='size of a synthetic company PII dictionary added as one extra rule')
+    args = parser.parse_args()
+
+    names = synthetic_names(args.names)
+    default = ColumnClassifier.from_config()
+
+    legacy = timed('legacy re.match loop (default rules)', lambda n: legacy_classify(n, LEGACY_PATTERNS), names)
+    compiled = timed('compiled classifier (default rules)', default.classify, names)
+    mismatches = sum(1 for a, b in zip(legacy, compiled) if a != b)
+    print(f"agreement with legacy: {len(names) - mismatches}/{len(names)}")
+
+    rng = random.Random(11)
+    dictionary = {''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(5, 10)))
+                  for _ in range(args.extra_keywords)}
+    rules = default.rules + [{'type': 'company_pii', 'keywords': sorted(dictionary)}]
+    legacy_rules = dict(LEGACY_PATTERNS, company_pii='|'.join(f'.*{k}.*' for k in sorted(dictionary)))
+
+    sample = names[:max(1, args.names // 100)]
+    timed(f'legacy re.match loop (+{len(dictionary)} keywords, 1% sample)',
+          lambda n: legacy_classify(n, legacy_rules), sample)
+    timed(f'compiled classifier (+{len(dictionary)} keywords)', ColumnClassifier(rules).classify, names)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+"""Scan, generate and execute throughput against the fake Data API client.
+
+For each catalog size, reports statements issued, Data API calls (describe
+calls broken out), wall clock and peak traced memory per stage:
+
+    scan      catalog read + classification (scan_new_columns)
+    generate  policy-state read + reconcile of the scanned columns
+    execute   execute_plan of the generated plan
+    rerun     a second plan against the now-masked cluster (should be empty)
+    cleanup   drop --drop-fraction of the tables, then cleanup_policies() (DETACH/DROP of their policies)
+    lambda    lambda_function.lambda_handler end to end on a fresh cluster
+
+Data API rate limits are off unless --quota-rates is given; --throttle-rate
+and --max-active-statements make the fake throttle like the real service.
+
+Usage: python -m benchmarks.end_to_end [--sizes 1000 10000 100000] [--latency 0.005]
+"""
+import argparse
+import contextlib
+import json
+import os
+import time
+import tracemalloc
+
+import lambda_function
+from benchmarks.fake_redshift_data import FakeRedshiftDataClient, SyntheticCatalog, installed
+from masking_plan import reconcile
+from redshift_masking_automation import ALL_SCHEMAS, RedshiftMaskingAutomator
+from throttled_client import DEFAULT_RATES, ThrottleController, cluster_controller
+
+DATABASE = 'dev'
+STAGES = ('scan', 'generate', 'execute', 'rerun', 'cleanup', 'lambda')
+
+
+class StageRunner:
+    """Runs the stages in order against one fake cluster, passing results forward"""
+
+    def __init__(self, columns: int, args):
+        self.args = args
+        self.catalog = SyntheticCatalog.with_columns(columns, seed=args.seed)
+        self.client = self._client()
+        self.automator = RedshiftMaskingAutomator('benchmark-cluster', max_concurrency=args.concurrency,
+                                                  throttle=ThrottleController(args.concurrency, self._rates()))
+        self.automator.redshift_data = self.client
+        self.sensitive_columns = {}
+        self.plan = None
+
+    def _client(self) -> FakeRedshiftDataClient:
+        return FakeRedshiftDataClient(self.catalog, latency=self.args.latency, page_size=self.args.page_size,
+                                      throttle_rate=self.args.throttle_rate,
+                                      max_active_statements=self.args.max_active_statements, seed=self.args.seed)
+
+    def _rates(self) -> dict:
+        return DEFAULT_RATES if self.args.quota_rates else {}
+
+    def scan(self, client):
+        self.sensitive_columns = self.automator.scan_new_columns(DATABASE, ALL_SCHEMAS)
+        return {'sensitive_columns': sum(len(columns) for columns in self.sensitive_columns.values())}
+
+    def generate(self, client):
+        policies, attachments = self.automator.fetch_policy_state(DATABASE)
+        steps = self.automator._policy_steps(self.sensitive_columns, ALL_SCHEMAS)
+        self.plan = reconcile(steps, policies, attachments, self.sensitive_columns)
+        return self.plan.summary()
+
+    def execute(self, client):
+        execution = self.automator.execute_plan(DATABASE, self.plan, batch_size=self.args.batch_size)
+        return {key: execution[key] for key in ('status', 'executed_commands', 'total_batches')}
+
+    def rerun(self, client):
+        return self.automator.plan_masking(DATABASE, ALL_SCHEMAS).summary()
+
+    def cleanup(self, client):
+        self.catalog.drop_tables(self.args.drop_fraction)
+        report = self.automator.cleanup_policies(DATABASE, dry_run=False, batch_size=self.args.batch_size)
+        result = {key: report[key] for key in ('stale_policies', 'stale_attachments', 'plan_summary')}
+        result.update(report.get('execution', {}))
+        # A second pass should find nothing left
+        result['stale_after'] = len(self.automator.find_stale_policies(DATABASE))
+        return result
+
+    def lambda_handler(self, client):
+        event = {'cluster_identifier': 'benchmark-cluster', 'database': DATABASE, 'schema': ALL_SCHEMAS,
+                 'batch_size': self.args.batch_size, 'concurrency': self.args.concurrency}
+        lambda_function.reset_warm_state()
+        cluster_controller('benchmark-cluster', self.args.concurrency, self._rates())
+        with installed(client):
+            response = lambda_function.lambda_handler(event, None)
+        return {'statusCode': response['statusCode']}
+
+    def run(self, stage: str, trace_memory: bool) -> dict:
+        # The Lambda builds its own automator, so it gets a fresh, unmasked cluster
+        client = self._client() if stage == 'lambda' else self.client
+        handler = self.lambda_handler if stage == 'lambda' else getattr(self, stage)
+        client.reset_counters()
+        if trace_memory:
+            tracemalloc.start()
+        with open(os.devnull, 'w') as quiet, contextlib.redirect_stdout(quiet):
+            start = time.perf_counter()
+            result = handler(client)
+            elapsed = time.perf_counter() - start
+        peak = None
+        if trace_memory:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+        counters = client.counters()
+        return {
+            'columns': len(self.catalog),
+            'stage': stage,
+            'seconds': round(elapsed, 3),
+            'statements': counters.pop('statements'),
+            'describe_calls': counters.get('DescribeStatement', 0),
+            'throttled': counters.pop('throttled', 0),
+            'api_calls': sum(counters.values()),
+            'peak_mib': round(peak / 2 ** 20, 1) if peak is not None else None,
+            'result': result
+        }
+
+
+def run(columns: int, args) -> list:
+    runner = StageRunner(columns, args)
+    results = [runner.run(stage, trace_memory=False) for stage in args.stages]
+    if not args.skip_memory:
+        # Measure memory on a second pass so tracing overhead doesn't skew the timing
+        runner = StageRunner(columns, args)
+        for result, stage in zip(results, args.stages):
+            result['peak_mib'] = runner.run(stage, trace_memory=True)['peak_mib']
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=list(STAGES))
+    parser.add_argument('--latency', type=float, default=0.005, help='seconds per fake statement')
+    parser.add_argument('--page-size', type=int, default=1000)
+    parser.add_argument('--batch-size', type=int, default=40)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='chance of ThrottlingException per call')
+    parser.add_argument('--max-active-statements', type=int, help='fake active statement quota')
+    parser.add_argument('--quota-rates', action='store_true', help='apply the default Data API rate limits')
+    parser.add_argument('--drop-fraction', type=float, default=0.1, help='share of tables dropped before cleanup')
+    parser.add_argument('--skip-memory', action='store_true', help='skip the tracemalloc pass')
+    args = parser.parse_args()
+
+    for columns in args.sizes:
+        for result in run(columns, args):
+            print(json.dumps(result))
+
+
+if __name__ == '__main__':
+    main()
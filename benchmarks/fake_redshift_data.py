@@ -0,0 +1,505 @@
+"""In-process stand-in for the boto3 redshift-data client.
+
+Serves a synthetic catalog (N schemas x M tables x K columns), applies
+masking-policy DDL to an in-memory policy/attachment state so reconcile
+sees what earlier runs created, and can inject latency, failures and
+throttling. Statements sent with ResultFormat='CSV' are read through
+get_statement_result_v2 with NULL as an empty field, as on the real API. Call counts are kept per operation for the benchmarks.
+
+    client = FakeRedshiftDataClient(SyntheticCatalog(10, 50, 20), latency=0.01)
+    automator.redshift_data = client
+
+    with installed(client) as boto3:   # code that builds its own boto3 client
+        lambda_function.lambda_handler(event, None)
+        boto3.clients_created
+"""
+import csv
+import heapq
+import io
+import itertools
+import json
+import random
+import re
+import sys
+import threading
+import time
+import types
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+try:
+    from botocore.exceptions import ClientError
+except ImportError:
+    class ClientError(Exception):
+        """Same shape as botocore.exceptions.ClientError (response['Error']['Code'])"""
+
+        def __init__(self, error_response: Dict, operation_name: str):
+            self.response = error_response
+            self.operation_name = operation_name
+            error = error_response.get('Error', {})
+            super().__init__(f"An error occurred ({error.get('Code')}) when calling the "
+                             f"{operation_name} operation: {error.get('Message')}")
+
+SENSITIVE_NAMES = [('email', 'character varying'), ('phone_number', 'character varying'),
+                   ('ssn', 'character varying'), ('credit_card_number', 'character varying'),
+                   ('first_name', 'character varying'), ('street_address', 'character varying')]
+PLAIN_NAMES = [('id', 'integer'), ('amount', 'numeric(12,2)'), ('created_at', 'timestamp without time zone'),
+               ('status', 'character varying'), ('quantity', 'integer'), ('region', 'character varying'),
+               ('sku', 'character varying'), ('price', 'numeric(12,2)')]
+
+CREATE_PATTERN = re.compile(r'^\s*CREATE\s+MASKING\s+POLICY\s+(\S+)\s+WITH\s*\((.*?)\)\s*USING\s*\((.*)\)\s*;?\s*$',
+                            re.IGNORECASE | re.DOTALL)
+ALTER_PATTERN = re.compile(r'^\s*ALTER\s+MASKING\s+POLICY\s+(\S+)\s+USING\s*\((.*)\)\s*;?\s*$',
+                           re.IGNORECASE | re.DOTALL)
+DROP_PATTERN = re.compile(r'^\s*DROP\s+MASKING\s+POLICY\s+(\S+)', re.IGNORECASE)
+ATTACH_PATTERN = re.compile(r'^\s*(ATTACH|DETACH)\s+MASKING\s+POLICY\s+(\S+)\s+ON\s+([^\s(]+)\s*\(([^)]*)\)\s*'
+                            r'(?:TO|FROM)\s+(?:PUBLIC|ROLE\s+([^\s;]+))', re.IGNORECASE)
+LIKE_FILTER_PATTERN = re.compile(r"schema_name\s+(NOT\s+)?LIKE\s+'((?:[^']|'')*)'", re.IGNORECASE)
+SCHEMA_FILTER_PATTERN = re.compile(r"table_schema\s*=\s*'((?:[^']|'')*)'", re.IGNORECASE)
+TABLE_FILTER_PATTERN = re.compile(r"\(\s*\w+\s*=\s*'((?:[^']|'')*)'\s+AND\s+(\w+)\s+IN\s*\(([^)]*)\)\s*\)",
+                                  re.IGNORECASE)
+POLICY_FILTER_PATTERN = re.compile(r"policy_name\s+IN\s*\(([^)]*)\)", re.IGNORECASE)
+QUOTED_PATTERN = re.compile(r"'((?:[^']|'')*)'")
+
+
+class SyntheticCatalog:
+    """schemas x tables_per_schema x columns_per_table columns; sensitive_ratio of them look like PII"""
+
+    def __init__(self, schemas: int, tables_per_schema: int, columns_per_table: int,
+                 sensitive_ratio: float = 0.25, seed: int = 0):
+        self.schemas = ['public'] + [f'schema_{i:03d}' for i in range(1, schemas)]
+        self.tables_per_schema = tables_per_schema
+        self.columns_per_table = columns_per_table
+        self.sensitive_ratio = sensitive_ratio
+        self.seed = seed
+        self.dropped: Set[Tuple[str, str]] = set()  # (schema, table) pairs removed by drop_tables()
+
+    @classmethod
+    def with_columns(cls, total: int, tables_per_schema: int = 50, columns_per_table: int = 20,
+                     **kwargs) -> 'SyntheticCatalog':
+        schemas = max(1, total // (tables_per_schema * columns_per_table))
+        return cls(schemas, tables_per_schema, columns_per_table, **kwargs)
+
+    def __len__(self) -> int:
+        return len(self.schemas) * self.tables_per_schema * self.columns_per_table
+
+    def drop_tables(self, fraction: float) -> Set[Tuple[str, str]]:
+        """Remove every 1/fraction-th table from the catalog (policies on them become orphaned)"""
+        step = max(1, round(1 / fraction)) if fraction > 0 else 0
+        for schema in self.schemas:
+            for table_index in range(0, self.tables_per_schema, step or self.tables_per_schema + 1):
+                self.dropped.add((schema, f'table_{table_index:04d}'))
+        return self.dropped
+
+    def rows(self, schemas: Optional[List[str]] = None,
+             tables: Optional[Set[Tuple[str, str]]] = None) -> Iterator[Tuple[str, str, str, str]]:
+        """(schema, table, column, data_type), in the same order on every call"""
+        rng = random.Random(self.seed)
+        for schema in self.schemas:
+            for table_index in range(self.tables_per_schema):
+                for column_index in range(self.columns_per_table):
+                    sensitive = rng.random() < self.sensitive_ratio
+                    base, data_type = rng.choice(SENSITIVE_NAMES if sensitive else PLAIN_NAMES)
+                    table = f'table_{table_index:04d}'
+                    if (tables is not None and (schema, table) not in tables) or (schema, table) in self.dropped:
+                        continue
+                    if schemas is None or schema in schemas:
+                        yield schema, table, f'{base}_{column_index}', data_type
+
+
+class _FakeStatement:
+    __slots__ = ('id', 'sqls', 'ready_at', 'status', 'error', 'results', 'created_at', 'result_format', 'db_user')
+
+    def __init__(self, statement_id: str, sqls: List[str], ready_at: float, result_format: str = 'JSON',
+                 db_user: Optional[str] = None):
+        self.id = statement_id
+        self.sqls = sqls
+        self.result_format = result_format
+        self.db_user = db_user
+        self.ready_at = ready_at
+        self.created_at = time.time()
+        self.status = 'SUBMITTED'
+        self.error = None
+        self.results = []  # (column names, rows) per SQL
+
+    def __lt__(self, other):
+        return self.ready_at < other.ready_at
+
+
+class FakeRedshiftDataClient:
+    """Thread-safe fake of execute/batch_execute/describe_statement and paginated get_statement_result.
+
+    latency           seconds before a statement finishes, plus latency_per_sql per batch member
+    failure_rate      chance that a statement (a whole batch, as it is one transaction) fails
+    fail_pattern      regex; any statement whose SQL matches it fails
+    throttle_rate     chance that any API call raises ThrottlingException
+    max_active_statements  unfinished statements allowed before ActiveStatementsExceededException
+    hidden_tables     (schema, table) pairs missing from SVV_ALL_COLUMNS unless run as superuser
+                      (DbUser); pg_attribute still lists them, as on a cluster with table privileges
+    """
+
+    def __init__(self, catalog: Optional[SyntheticCatalog] = None, latency: float = 0.0,
+                 latency_per_sql: float = 0.0, page_size: int = 1000, failure_rate: float = 0.0,
+                 fail_pattern: Optional[str] = None, throttle_rate: float = 0.0,
+                 max_active_statements: Optional[int] = None, seed: int = 0,
+                 hidden_tables: Optional[Set[Tuple[str, str]]] = None, superuser: str = 'awsuser'):
+        self.catalog = catalog or SyntheticCatalog(1, 10, 20)
+        self.latency = latency
+        self.latency_per_sql = latency_per_sql
+        self.page_size = page_size
+        self.failure_rate = failure_rate
+        self.fail_pattern = re.compile(fail_pattern, re.IGNORECASE | re.DOTALL) if fail_pattern else None
+        self.throttle_rate = throttle_rate
+        self.max_active_statements = max_active_statements
+        self.hidden_tables = set(hidden_tables or ())
+        self.superuser = superuser
+        self._user = None
+
+        self.policies: Dict[str, str] = {}  # name -> expression
+        self.attachments: Set[Tuple[str, str, str, str, str]] = set()  # (policy, schema, table, column, grantee)
+        self.calls = Counter()
+        self.statements_issued = 0
+        self.requests: List[Dict] = []
+
+        self._rng = random.Random(seed)
+        self._ids = itertools.count(1)
+        self._lock = threading.RLock()
+        self._statements: Dict[str, _FakeStatement] = {}
+        self._pending: List[_FakeStatement] = []
+
+    # Data API operations
+
+    def execute_statement(self, Sql: str, **params) -> Dict:
+        return self._submit('ExecuteStatement', [Sql], dict(params, Sql=Sql))
+
+    def batch_execute_statement(self, Sqls: List[str], **params) -> Dict:
+        return self._submit('BatchExecuteStatement', list(Sqls), dict(params, Sqls=list(Sqls)))
+
+    def describe_statement(self, Id: str) -> Dict:
+        with self._lock:
+            self._call('DescribeStatement')
+            statement = self._statement(Id)
+            response = {
+                'Id': statement.id,
+                'Status': statement.status if statement.status != 'SUBMITTED' else 'STARTED',
+                'HasResultSet': bool(statement.results and statement.results[-1][1]),
+                'ResultRows': len(statement.results[-1][1]) if statement.results else 0
+            }
+            if statement.error:
+                response['Error'] = statement.error
+            if len(statement.sqls) > 1:
+                response['SubStatements'] = [
+                    {'Id': f'{statement.id}:{index + 1}', 'QueryString': sql,
+                     'Status': response['Status'],
+                     'HasResultSet': index < len(statement.results) and bool(statement.results[index][1])}
+                    for index, sql in enumerate(statement.sqls)
+                ]
+            return response
+
+    def get_statement_result(self, Id: str, NextToken: Optional[str] = None) -> Dict:
+        columns, rows = self._result('GetStatementResult', Id, 'JSON')
+        start = int(NextToken or 0)
+        page = {
+            'ColumnMetadata': [{'name': name} for name in columns],
+            'TotalNumRows': len(rows),
+            'Records': [[{'isNull': True} if value is None else
+                         {'longValue': value} if isinstance(value, int) else {'stringValue': value}
+                         for value in row] for row in rows[start:start + self.page_size]]
+        }
+        if start + self.page_size < len(rows):
+            page['NextToken'] = str(start + self.page_size)
+        return page
+
+    def get_statement_result_v2(self, Id: str, NextToken: Optional[str] = None) -> Dict:
+        columns, rows = self._result('GetStatementResultV2', Id, 'CSV')
+        start = int(NextToken or 0)
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator='\n')
+        if not start:
+            writer.writerow(columns)
+        # NULL and '' both come back as an empty field
+        writer.writerows(['' if value is None else value for value in row]
+                         for row in rows[start:start + self.page_size])
+        page = {
+            'ColumnMetadata': [{'name': name} for name in columns],
+            'TotalNumRows': len(rows),
+            'ResultFormat': 'CSV',
+            'Records': [{'CSVRecords': buffer.getvalue()}]
+        }
+        if start + self.page_size < len(rows):
+            page['NextToken'] = str(start + self.page_size)
+        return page
+
+    def _result(self, operation: str, statement_id: str, result_format: str) -> Tuple[List[str], List[Tuple]]:
+        with self._lock:
+            self._call(operation)
+            parent_id, _, sub_index = statement_id.partition(':')
+            statement = self._statement(parent_id)
+            if statement.status != 'FINISHED':
+                raise self._error('ValidationException', f'Query {statement_id} has not finished', operation)
+            if statement.result_format != result_format:
+                raise self._error('ValidationException',
+                                  f'Query {statement_id} has {statement.result_format} results', operation)
+            index = int(sub_index) - 1 if sub_index else len(statement.results) - 1
+            return statement.results[index]
+
+    # Bookkeeping
+
+    def reset_counters(self):
+        with self._lock:
+            self.calls.clear()
+            self.statements_issued = 0
+
+    def counters(self) -> Dict[str, int]:
+        with self._lock:
+            counts = dict(self.calls)
+            counts['statements'] = self.statements_issued
+            return counts
+
+    def _call(self, operation: str):
+        self.calls[operation] += 1
+        self._advance(time.time())
+        if self.throttle_rate and self._rng.random() < self.throttle_rate:
+            self.calls['throttled'] += 1
+            raise self._error('ThrottlingException', 'Rate exceeded', operation)
+
+    def _submit(self, operation: str, sqls: List[str], params: Dict) -> Dict:
+        with self._lock:
+            self._call(operation)
+            active = len(self._pending)
+            if self.max_active_statements is not None and active >= self.max_active_statements:
+                self.calls['throttled'] += 1
+                raise self._error('ActiveStatementsExceededException',
+                                  f'Active statements exceeded the allowed quota ({self.max_active_statements})',
+                                  operation)
+            self.statements_issued += len(sqls)
+            self.requests.append(params)
+            statement_id = f'fake-{next(self._ids):08d}'
+            ready_at = time.time() + self.latency + self.latency_per_sql * (len(sqls) - 1)
+            statement = _FakeStatement(statement_id, sqls, ready_at, params.get('ResultFormat', 'JSON'),
+                                       params.get('DbUser'))
+            self._statements[statement_id] = statement
+            heapq.heappush(self._pending, statement)
+            self._advance(time.time())
+            return {'Id': statement_id, 'CreatedAt': statement.created_at}
+
+    def _statement(self, statement_id: str) -> _FakeStatement:
+        try:
+            return self._statements[statement_id]
+        except KeyError:
+            raise self._error('ResourceNotFoundException', f'Query {statement_id} does not exist', 'DescribeStatement')
+
+    def _advance(self, now: float):
+        """Run every statement whose latency has elapsed, in completion order"""
+        while self._pending and self._pending[0].ready_at <= now:
+            self._run(heapq.heappop(self._pending))
+
+    def _run(self, statement: _FakeStatement):
+        # A batch is one transaction: on failure its changes are rolled back
+        undo = []
+        results = []
+        self._user = statement.db_user
+        try:
+            for sql in statement.sqls:
+                if self.fail_pattern and self.fail_pattern.search(sql):
+                    raise ValueError(f'ERROR: injected failure for: {sql.strip().splitlines()[0]}')
+                if self.failure_rate and self._rng.random() < self.failure_rate:
+                    raise ValueError('ERROR: injected random failure')
+                results.append(self._execute_sql(sql, undo))
+        except ValueError as e:
+            for rollback in reversed(undo):
+                rollback()
+            statement.status = 'FAILED'
+            statement.error = str(e)
+            return
+        statement.results = results
+        statement.status = 'FINISHED'
+
+    # SQL
+
+    def _execute_sql(self, sql: str, undo: List) -> Tuple[List[str], List[Tuple]]:
+        policies, attachments = self.policies, self.attachments
+        lowered = sql.lower()
+        match = CREATE_PATTERN.match(sql)
+        if match:
+            name = _identifier(match.group(1))
+            if name in policies:
+                raise ValueError(f'ERROR: masking policy "{name}" already exists')
+            policies[name] = match.group(3).strip()
+            undo.append(lambda: policies.pop(name))
+            return [], []
+        match = ALTER_PATTERN.match(sql)
+        if match:
+            name = _identifier(match.group(1))
+            if name not in policies:
+                raise ValueError(f'ERROR: masking policy "{name}" does not exist')
+            previous = policies[name]
+            policies[name] = match.group(2).strip()
+            undo.append(lambda: policies.__setitem__(name, previous))
+            return [], []
+        match = DROP_PATTERN.match(sql)
+        if match:
+            name = _identifier(match.group(1))
+            if any(key[0] == name for key in attachments):
+                raise ValueError(f'ERROR: masking policy "{name}" is attached')
+            if name not in policies:
+                raise ValueError(f'ERROR: masking policy "{name}" does not exist')
+            previous = policies.pop(name)
+            undo.append(lambda: policies.__setitem__(name, previous))
+            return [], []
+        match = ATTACH_PATTERN.match(sql)
+        if match:
+            action, name, relation, column, role = match.groups()
+            name = _identifier(name)
+            schema, _, table = relation.rpartition('.')
+            key = (name, _identifier(schema or 'public'), _identifier(table), _identifier(column),
+                   _identifier(role) if role else 'public')
+            if action.upper() == 'ATTACH':
+                if name not in policies:
+                    raise ValueError(f'ERROR: masking policy "{name}" does not exist')
+                if key in attachments:
+                    raise ValueError(f'ERROR: masking policy "{name}" is already attached to {relation}({column})')
+                attachments.add(key)
+                undo.append(lambda: attachments.discard(key))
+            elif key in attachments:
+                attachments.remove(key)
+                undo.append(lambda: attachments.add(key))
+            else:
+                raise ValueError(f'ERROR: masking policy "{name}" is not attached to {relation}({column})')
+            return [], []
+        if 'from pg_attribute' in lowered:
+            relations = _table_filter(sql)
+            return ['nspname', 'relname', 'attname'], [
+                (schema, table, column) for schema, table, column, _ in self.catalog.rows(None, relations)]
+        if 'join svv_attached_masking_policy' in lowered:
+            # Stale policy join: one row per managed policy attachment with its live column count
+            live = {(schema, table, column) for schema, table, column, _ in self._visible_rows()}
+            by_policy = {}
+            for name, schema, table, column, grantee in attachments:
+                by_policy.setdefault(name, []).append((schema, table, column, grantee))
+            rows = []
+            for name in sorted(policies):
+                if not name.startswith('mask_'):
+                    continue
+                for schema, table, column, grantee in by_policy.get(name) or [(None, None, None, None)]:
+                    if schema is None:
+                        rows.append((name, None, None, None, None, None, 0))
+                        continue
+                    rows.append((name, schema, table, grantee, 'public' if grantee == 'public' else 'role',
+                                 json.dumps([column]), int((schema, table, column) in live)))
+            return ['policy_name', 'schema_name', 'table_name', 'grantee', 'grantee_type', 'input_columns',
+                    'count'], rows
+        if 'svv_masking_policy' in lowered:
+            names = POLICY_FILTER_PATTERN.search(sql)
+            wanted = {_unquote(v) for v in QUOTED_PATTERN.findall(names.group(1))} if names else None
+            if 'where 1 = 0' in lowered:
+                wanted = set()
+            relations = _table_filter(sql)
+            rows = [('policy', name, None, None, None, json.dumps([{'expr': expr, 'type': 'character varying'}]))
+                    for name, expr in policies.items() if wanted is None or name in wanted]
+            rows += [('attachment', name, schema, table, grantee, json.dumps([column]))
+                     for name, schema, table, column, grantee in attachments
+                     if relations is None or (schema, table) in relations]
+            return ['kind', 'policy_name', 'schema_name', 'table_name', 'grantee', 'detail'], rows
+        if 'svv_all_columns' in lowered:
+            return ['schema_name', 'table_name', 'column_name', 'data_type'], list(
+                self._visible_rows(_filter_schemas(self.catalog.schemas, sql)))
+        if 'information_schema.columns' in lowered:
+            relations = _table_filter(sql)
+            schemas = None
+            if relations is None:
+                schemas = [_unquote(value) for value in SCHEMA_FILTER_PATTERN.findall(sql)] or None
+            return ['table_schema', 'table_name', 'column_name', 'data_type'], list(
+                self.catalog.rows(schemas, relations))
+        # Anything else (SELECT 1, SET ..., sampling) succeeds without rows
+        return [], []
+
+    def _visible_rows(self, schemas: Optional[List[str]] = None) -> Iterator[Tuple[str, str, str, str]]:
+        """Catalog rows SVV_ALL_COLUMNS shows the identity running the current statement"""
+        for row in self.catalog.rows(schemas):
+            if self._user == self.superuser or row[:2] not in self.hidden_tables:
+                yield row
+
+    @staticmethod
+    def _error(code: str, message: str, operation: str) -> ClientError:
+        return ClientError({'Error': {'Code': code, 'Message': message}}, operation)
+
+
+def _identifier(name: str) -> str:
+    name = name.strip().rstrip(';')
+    if name.startswith('"') and name.endswith('"'):
+        return name[1:-1]
+    return name.lower()
+
+
+def _unquote(value: str) -> str:
+    return value.replace("''", "'")
+
+
+def _like_regex(pattern: str):
+    parts = []
+    chars = iter(_unquote(pattern))
+    for char in chars:
+        if char == '\\':
+            parts.append(re.escape(next(chars, '\\')))
+        elif char == '%':
+            parts.append('.*')
+        elif char == '_':
+            parts.append('.')
+        else:
+            parts.append(re.escape(char))
+    return re.compile(''.join(parts) + r'\Z', re.DOTALL)
+
+
+def _table_filter(sql: str) -> Optional[Set[Tuple[str, str]]]:
+    """(schema, table) pairs of "(schema = 'x' AND table IN ('a', 'b'))" predicates, or None if there are none"""
+    matches = TABLE_FILTER_PATTERN.findall(sql)
+    if not matches:
+        return None
+    return {(_unquote(schema), _unquote(table))
+            for schema, _, tables in matches for table in QUOTED_PATTERN.findall(tables)}
+
+
+def _filter_schemas(schemas: List[str], sql: str) -> List[str]:
+    """Apply the schema_name [NOT] LIKE filters of an SVV_ALL_COLUMNS query"""
+    includes, excludes = [], []
+    for negated, pattern in LIKE_FILTER_PATTERN.findall(sql):
+        (excludes if negated else includes).append(_like_regex(pattern))
+    return [schema for schema in schemas
+            if (not includes or any(p.match(schema) for p in includes))
+            and not any(p.match(schema) for p in excludes)]
+
+
+@contextmanager
+def installed(client: FakeRedshiftDataClient, setup_seconds: float = 0.0):
+    """Make boto3.client('redshift-data') return client for code that creates its own.
+
+    setup_seconds models what building a real boto3 client costs; the
+    module counts clients_created.
+    """
+    names = ('boto3', 'botocore', 'botocore.config')
+    previous = {name: sys.modules.get(name) for name in names}
+    module = types.ModuleType('boto3')
+    module.clients_created = 0
+
+    def create_client(service_name, **kwargs):
+        module.clients_created += 1
+        time.sleep(setup_seconds)
+        return client
+
+    module.client = create_client
+    # Client options (botocore.config.Config) are accepted and ignored
+    config = types.ModuleType('botocore.config')
+    config.Config = lambda **options: options
+    botocore = types.ModuleType('botocore')
+    botocore.config = config
+    sys.modules.update({'boto3': module, 'botocore': botocore, 'botocore.config': config})
+    try:
+        yield module
+    finally:
+        for name, original in previous.items():
+            if original is None:
+                sys.modules.pop(name, None)
+            else:
+                sys.modules[name] = original
@@ -0,0 +1,68 @@
+"""Fleet sweep wall clock: targets one at a time versus concurrently, against fake clusters.
+
+Each target is a fake cluster with its own catalog and statement latency;
+--fail-targets of them reject every statement, to show that a failing
+target is reported without stopping the rest. Prints one JSON line per
+mode with wall clock, the slowest single target and per-status counts.
+
+Usage: python -m benchmarks.fleet [--targets 8] [--columns 2000] [--latency 0.02]
+"""
+import argparse
+import contextlib
+import json
+import os
+
+from benchmarks.fake_redshift_data import FakeRedshiftDataClient, SyntheticCatalog
+from fleet_runner import FleetRunner, FleetTarget
+from redshift_masking_automation import RedshiftMaskingAutomator
+from throttled_client import ThrottleController
+
+
+def targets(args):
+    found = []
+    for index in range(args.targets):
+        kind = {'workgroup_name': f'workgroup-{index:02d}'} if index % 2 else {'cluster_identifier': f'cluster-{index:02d}'}
+        found.append(FleetTarget(['dev'], schema='*', concurrency=args.concurrency, **kind))
+    return found
+
+
+def factory(args):
+    def build(target: FleetTarget) -> RedshiftMaskingAutomator:
+        index = int(target.name[-2:])
+        automator = RedshiftMaskingAutomator(target.cluster_identifier, max_concurrency=target.concurrency,
+                                             workgroup_name=target.workgroup_name,
+                                             throttle=ThrottleController(target.concurrency, {}))
+        # A fresh, unmasked fake cluster per run; the first fail_targets reject every statement
+        automator.redshift_data = FakeRedshiftDataClient(
+            SyntheticCatalog.with_columns(args.columns, seed=index), latency=args.latency,
+            failure_rate=1.0 if index < args.fail_targets else 0.0, seed=index
+        )
+        return automator
+    return build
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--targets', type=int, default=8)
+    parser.add_argument('--columns', type=int, default=2000, help='columns per target')
+    parser.add_argument('--latency', type=float, default=0.02, help='seconds per fake statement')
+    parser.add_argument('--concurrency', type=int, default=8, help='statement concurrency per target')
+    parser.add_argument('--fail-targets', type=int, default=1, help='targets whose statements all fail')
+    args = parser.parse_args()
+
+    for mode, max_targets in (('sequential', 1), ('concurrent', args.targets)):
+        runner = FleetRunner(targets(args), max_targets=max_targets, automator_factory=factory(args))
+        with open(os.devnull, 'w') as quiet, contextlib.redirect_stdout(quiet):
+            report = runner.run()
+        print(json.dumps({
+            'mode': mode,
+            'targets': report['targets'],
+            'seconds': report['seconds'],
+            'slowest_target_seconds': report['slowest_target_seconds'],
+            'status': report['status'],
+            'executed_commands': report['totals']['executed_commands']
+        }))
+
+
+if __name__ == '__main__':
+    main()
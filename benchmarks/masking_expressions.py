@@ -0,0 +1,289 @@
+"""Equivalence and per-row cost of every masking expression on a local SQL engine.
+
+Each expression in RedshiftMaskingAutomator.masking_policies (plus the
+REDACT_SSN Python UDF it replaces) is translated to the local engine's
+dialect and run over synthetic values for its sensitivity type:
+
+    equivalent   output matches a Python reference of the Redshift semantics
+    ns_per_row   time per row to evaluate the expression
+    overhead_ns  ns_per_row minus reading the bare column
+
+DuckDB is used when installed; otherwise sqlite3, which has no regular
+expressions, so REGEXP_REPLACE runs as a registered Python function and
+such rows are reported with "emulated". The UDF variant always runs as a
+Python function, as plpythonu does on the cluster.
+
+Usage: python -m benchmarks.masking_expressions [--rows 1000000] [--check-rows 100000]
+"""
+import argparse
+import json
+import random
+import re
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from masking_verifier import REFERENCE_MASKS, redact_ssn
+from redshift_masking_automation import NATIVE_MASKING_EXPRESSIONS, RedshiftMaskingAutomator
+
+COLUMN = 'v'
+FUNCTION_CALL = re.compile(r'\b([A-Za-z_]+)\s*\(')
+
+
+def synthetic_values(sensitivity_type: str, rows: int, seed: int = 0) -> List[Optional[str]]:
+    """Realistic values plus the edge cases each mask has to survive (NULL, empty, short, odd formats)"""
+    rng = random.Random(seed)
+    digits = lambda n: ''.join(rng.choice('0123456789') for _ in range(n))
+    letters = lambda n: ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(n))
+    generators = {
+        'email': lambda: f'{letters(rng.randint(1, 12))}@{letters(rng.randint(2, 8))}.com',
+        'phone': lambda: rng.choice([f'{digits(3)}-{digits(3)}-{digits(4)}', f'({digits(3)}) {digits(3)} {digits(4)}',
+                                     digits(10)]),
+        'ssn': lambda: rng.choice([f'{digits(3)}-{digits(2)}-{digits(4)}', digits(9), f'{digits(3)} {digits(2)} {digits(4)}',
+                                   digits(rng.randint(1, 12)), f'SSN:{digits(9)}', letters(5)]),
+        'credit_card': lambda: rng.choice(['-'.join(digits(4) for _ in range(4)), digits(16), digits(rng.randint(1, 5))]),
+        'name': lambda: letters(rng.randint(1, 20)).capitalize(),
+        'address': lambda: f'{digits(rng.randint(1, 5))} {letters(rng.randint(3, 12)).capitalize()} St'
+    }
+    edge_cases = {
+        'email': ['no-at-sign', '@', 'a@b@c.com'],
+        'ssn': ['', '123-45-678', '1234567890', '12a34b56c789'],
+        'credit_card': ['', '123'],
+        'name': ['', 'A'],
+        'address': ['', 'short']
+    }
+    values = [None, ''] + edge_cases.get(sensitivity_type, [])
+    generate = generators[sensitivity_type]
+    values.extend(generate() for _ in range(max(0, rows - len(values))))
+    return values[:rows]
+
+
+def _split_arguments(text: str) -> List[str]:
+    """Top-level comma-separated arguments, ignoring commas in quotes or nested calls"""
+    arguments, depth, quoted, start = [], 0, False, 0
+    for index, char in enumerate(text):
+        if char == "'":
+            quoted = not quoted
+        elif quoted:
+            continue
+        elif char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif char == ',' and depth == 0:
+            arguments.append(text[start:index].strip())
+            start = index + 1
+    arguments.append(text[start:].strip())
+    return arguments
+
+
+def _call_end(text: str, open_index: int) -> int:
+    """Index of the parenthesis closing the one at open_index"""
+    depth, quoted = 0, False
+    for index in range(open_index, len(text)):
+        char = text[index]
+        if char == "'":
+            quoted = not quoted
+        elif not quoted and char == '(':
+            depth += 1
+        elif not quoted and char == ')':
+            depth -= 1
+            if depth == 0:
+                return index
+    raise ValueError(f'Unbalanced parentheses in {text!r}')
+
+
+class Engine:
+    """A local SQL engine holding one table of values per sensitivity type"""
+
+    name = 'engine'
+
+    def __init__(self):
+        self.emulated = set()
+
+    def load(self, table: str, values: List[Optional[str]]):
+        raise NotImplementedError
+
+    def query(self, sql: str) -> List[Tuple]:
+        raise NotImplementedError
+
+    def register(self, name: str, function: Callable):
+        raise NotImplementedError
+
+    def translate(self, expression: str) -> str:
+        """Rewrite a Redshift masking expression in this engine's dialect"""
+        expression = expression.replace('::text', '')
+        output = []
+        position = 0
+        for match in FUNCTION_CALL.finditer(expression):
+            if match.start() < position:
+                continue
+            end = _call_end(expression, match.end() - 1)
+            arguments = [self.translate(argument)
+                         for argument in _split_arguments(expression[match.end():end])]
+            output.append(expression[position:match.start()])
+            output.append(self.function(match.group(1).upper(), arguments))
+            position = end + 1
+        output.append(expression[position:])
+        return ''.join(output)
+
+    def function(self, name: str, arguments: List[str]) -> str:
+        if name == 'CONCAT':
+            # Redshift CONCAT returns NULL if either input is NULL, like ||
+            return '(' + ' || '.join(arguments) + ')'
+        if name in ('LEN', 'LENGTH'):
+            return f'length({arguments[0]})'
+        if name == 'LEFT':
+            return f'substr({arguments[0]}, 1, {arguments[1]})'
+        return f'{name.lower()}({", ".join(arguments)})'
+
+
+class SqliteEngine(Engine):
+    name = 'sqlite'
+
+    def __init__(self):
+        super().__init__()
+        import sqlite3
+        self.connection = sqlite3.connect(':memory:')
+
+    def load(self, table: str, values: List[Optional[str]]):
+        self.connection.execute(f'CREATE TABLE {table} ({COLUMN} TEXT)')
+        self.connection.executemany(f'INSERT INTO {table} VALUES (?)', ((value,) for value in values))
+
+    def query(self, sql: str) -> List[Tuple]:
+        return self.connection.execute(sql).fetchall()
+
+    def register(self, name: str, function: Callable):
+        self.connection.create_function(name, -1, function, deterministic=True)
+
+    def function(self, name: str, arguments: List[str]) -> str:
+        if name == 'RIGHT':
+            return f'substr({arguments[0]}, -({arguments[1]}))'
+        if name == 'REPEAT':
+            # n copies of s without a user function: zeroblob(n) hex-encodes to n '00' pairs
+            return f"replace(hex(zeroblob(max({arguments[1]}, 0))), '00', {arguments[0]})"
+        if name == 'REGEXP_REPLACE':
+            self.emulated.add('regexp_replace')
+            self.register('regexp_replace', lambda value, pattern, replacement:
+                          None if value is None else re.sub(pattern, replacement, value))
+            return f'regexp_replace({", ".join(arguments)})'
+        return super().function(name, arguments)
+
+
+class DuckDbEngine(Engine):
+    name = 'duckdb'
+
+    def __init__(self):
+        super().__init__()
+        import duckdb
+        self.connection = duckdb.connect()
+
+    def load(self, table: str, values: List[Optional[str]]):
+        self.connection.execute(f'CREATE TABLE {table} ({COLUMN} VARCHAR)')
+        self.connection.executemany(f'INSERT INTO {table} VALUES (?)', [(value,) for value in values])
+
+    def query(self, sql: str) -> List[Tuple]:
+        return self.connection.execute(sql).fetchall()
+
+    def register(self, name: str, function: Callable):
+        from duckdb.typing import VARCHAR
+        self.connection.create_function(name, function, [VARCHAR], VARCHAR, null_handling='special')
+
+    def function(self, name: str, arguments: List[str]) -> str:
+        if name == 'REGEXP_REPLACE':
+            # Redshift replaces every match; DuckDB only the first without 'g'
+            return f"regexp_replace({', '.join(arguments)}, 'g')"
+        return super().function(name, arguments)
+
+
+def open_engine(name: Optional[str] = None) -> Engine:
+    if name in (None, 'duckdb'):
+        try:
+            return DuckDbEngine()
+        except ImportError:
+            if name == 'duckdb':
+                raise
+    return SqliteEngine()
+
+
+def expressions() -> List[Tuple[str, str, str, str]]:
+    """(role, sensitivity type, variant, Redshift expression) for the native policies and the UDFs they replace"""
+    native = RedshiftMaskingAutomator('benchmark').masking_policies
+    udf = RedshiftMaskingAutomator('benchmark', native_sql=False).masking_policies
+    found = []
+    for role, by_type in native.items():
+        for sensitivity_type, expression in by_type.items():
+            found.append((role, sensitivity_type, 'native', expression.format(column=COLUMN)))
+            if udf[role][sensitivity_type] in NATIVE_MASKING_EXPRESSIONS:
+                found.append((role, sensitivity_type, 'udf', udf[role][sensitivity_type].format(column=COLUMN)))
+    return found
+
+
+def _seconds(engine: Engine, sql: str, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        engine.query(sql)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(args) -> List[Dict]:
+    engine = open_engine(args.engine)
+    engine.register('redact_ssn', redact_ssn)
+    types = sorted({sensitivity_type for _, sensitivity_type, _, _ in expressions()})
+    samples = {}
+    for sensitivity_type in types:
+        values = synthetic_values(sensitivity_type, args.rows, args.seed)
+        samples[sensitivity_type] = values[:args.check_rows]
+        engine.load(sensitivity_type, values)
+
+    # Aggregating keeps result transfer out of the timing
+    baselines = {t: _seconds(engine, f'SELECT SUM(length({COLUMN})) FROM {t}', args.repeat) for t in types}
+    results = []
+    for role, sensitivity_type, variant, expression in expressions():
+        engine.emulated.clear()
+        translated = engine.translate(expression)
+        emulated = sorted(engine.emulated)
+
+        rows = engine.query(f'SELECT {translated} FROM {sensitivity_type} LIMIT {args.check_rows}')
+        reference = REFERENCE_MASKS[role][sensitivity_type]
+        mismatches = [(value, row[0], reference(value))
+                      for value, row in zip(samples[sensitivity_type], rows) if row[0] != reference(value)]
+
+        seconds = _seconds(engine, f'SELECT SUM(length({translated})) FROM {sensitivity_type}', args.repeat)
+        result = {
+            'engine': engine.name,
+            'role': role,
+            'type': sensitivity_type,
+            'variant': variant,
+            'rows': args.rows,
+            'equivalent': not mismatches,
+            'mismatches': len(mismatches),
+            'ns_per_row': round(seconds / args.rows * 1e9, 1),
+            'overhead_ns': round((seconds - baselines[sensitivity_type]) / args.rows * 1e9, 1),
+            'expression': expression
+        }
+        if emulated:
+            result['emulated'] = emulated
+        if mismatches:
+            value, actual, expected = mismatches[0]
+            result['first_mismatch'] = {'value': value, 'actual': actual, 'expected': expected}
+        results.append(result)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000000, help='synthetic values per sensitivity type')
+    parser.add_argument('--check-rows', type=int, default=100000, help='rows compared against the reference')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per expression (best is kept)')
+    parser.add_argument('--engine', choices=['duckdb', 'sqlite'], help='default: duckdb if installed, else sqlite')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    for result in run(args):
+        print(json.dumps(result))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""Cold versus warm Lambda invocation latency against the fake Data API client.
+
+Each sample runs in a fresh interpreter: it times importing lambda_function,
+one cold invocation (client, classifier and caches built from scratch),
+warm invocations that reuse them, and one warm invocation flagged as DDL so
+the catalog cache is invalidated. The fake cluster is fully masked first, so
+every invocation is the common "nothing new" case.
+
+Usage: python -m benchmarks.startup [--columns N] [--samples N] [--warm N] [--latency S] [--client-setup S]
+"""
+import argparse
+import contextlib
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.fake_redshift_data import FakeRedshiftDataClient, SyntheticCatalog, installed
+
+
+def _timed_invocation(lambda_function, event, client) -> dict:
+    client.reset_counters()
+    with open(os.devnull, 'w') as quiet, contextlib.redirect_stdout(quiet):
+        start = time.perf_counter()
+        response = lambda_function.lambda_handler(event, None)
+        elapsed = time.perf_counter() - start
+    assert response['statusCode'] == 200, response
+    counters = client.counters()
+    counters.pop('statements')
+    return {'ms': elapsed * 1000, 'api_calls': sum(counters.values())}
+
+
+def sample(args) -> dict:
+    """One cold start and its warm follow-ups; runs inside the child interpreter"""
+    start = time.perf_counter()
+    import lambda_function
+    import_ms = (time.perf_counter() - start) * 1000
+
+    client = FakeRedshiftDataClient(SyntheticCatalog.with_columns(args.columns), latency=args.latency)
+    event = {'cluster_identifier': 'benchmark-cluster', 'database': 'dev', 'schema': '*'}
+    with installed(client, setup_seconds=args.client_setup) as boto3:
+        with open(os.devnull, 'w') as quiet, contextlib.redirect_stdout(quiet):
+            lambda_function.lambda_handler(event, None)
+        lambda_function.reset_warm_state()
+        boto3.clients_created = 0
+
+        cold = _timed_invocation(lambda_function, event, client)
+        warm = [_timed_invocation(lambda_function, event, client) for _ in range(args.warm)]
+        ddl = _timed_invocation(lambda_function, dict(event, ddl=True), client)
+        clients_created = boto3.clients_created
+
+    return {
+        'import_ms': import_ms,
+        'cold_ms': cold['ms'],
+        'cold_api_calls': cold['api_calls'],
+        'warm_ms': statistics.median(result['ms'] for result in warm),
+        'warm_api_calls': warm[-1]['api_calls'],
+        'ddl_ms': ddl['ms'],
+        'ddl_api_calls': ddl['api_calls'],
+        'clients_created': clients_created
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--columns', type=int, default=10000)
+    parser.add_argument('--samples', type=int, default=5, help='fresh interpreters to start')
+    parser.add_argument('--warm', type=int, default=5, help='warm invocations per sample')
+    parser.add_argument('--latency', type=float, default=0.02, help='seconds per fake statement')
+    parser.add_argument('--client-setup', type=float, default=0.05,
+                        help='seconds to build a client, standing in for boto3')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(sample(args)))
+        return
+
+    command = [sys.executable, '-m', 'benchmarks.startup', '--child'] + sys.argv[1:]
+    samples = [json.loads(subprocess.run(command, check=True, capture_output=True, text=True).stdout)
+               for _ in range(args.samples)]
+    print(json.dumps({
+        'columns': args.columns,
+        'samples': args.samples,
+        **{key: round(statistics.median(s[key] for s in samples), 1) for key in samples[0]}
+    }))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+import threading
+import time
+from typing import Dict, Hashable, Optional, Tuple
+
+# Catalog rows (plus policies and attachments) held across all entries unless max_rows says otherwise
+DEFAULT_MAX_ROWS = 200000
+
+
+class CatalogCache:
+    """In-process cache of catalog rows and policy state per (cluster, database).
+
+    Entries expire after ttl seconds; invalidate() drops them early, e.g.
+    when an event reports DDL or after this process executed a plan.
+    Shared by every automator in a warm Lambda container. Entries are sized
+    in rows and the cache holds at most max_rows in total: the oldest entries
+    are evicted to make room, and a result larger than max_rows on its own is
+    not cached at all, so large catalogs keep streaming.
+    """
+
+    def __init__(self, ttl: float = 300.0, max_rows: int = DEFAULT_MAX_ROWS):
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self.hits = 0
+        self.misses = 0
+        self._entries: Dict[Tuple[str, str, Hashable], Tuple[float, object, int]] = {}
+        self._rows = 0
+        self._lock = threading.Lock()
+
+    def get(self, cluster: str, database: str, key: Hashable) -> Optional[object]:
+        with self._lock:
+            entry = self._entries.get((cluster, database, key))
+            if entry is not None and entry[0] > time.monotonic():
+                self.hits += 1
+                return entry[1]
+            self._drop((cluster, database, key))
+            self.misses += 1
+            return None
+
+    def fits(self, rows: int) -> bool:
+        """Whether an entry of this many rows can be cached"""
+        return self.ttl > 0 and rows <= self.max_rows
+
+    def put(self, cluster: str, database: str, key: Hashable, value: object, rows: int = 1):
+        if not self.fits(rows):
+            return
+        with self._lock:
+            self._drop((cluster, database, key))
+            now = time.monotonic()
+            for entry_key, (expires, _, _) in list(self._entries.items()):
+                if expires <= now:
+                    self._drop(entry_key)
+            # Oldest first: dicts keep insertion order
+            for entry_key in list(self._entries):
+                if self._rows + rows <= self.max_rows:
+                    break
+                self._drop(entry_key)
+            self._entries[(cluster, database, key)] = (now + self.ttl, value, rows)
+            self._rows += rows
+
+    def _drop(self, entry_key: Tuple[str, str, Hashable]):
+        entry = self._entries.pop(entry_key, None)
+        if entry is not None:
+            self._rows -= entry[2]
+
+    def invalidate(self, cluster: str, database: Optional[str] = None, key: Optional[Hashable] = None):
+        """Drop entries for a cluster, optionally narrowed to one database and key"""
+        with self._lock:
+            for entry_key in list(self._entries):
+                entry_cluster, entry_database, entry_name = entry_key
+                if entry_cluster != cluster:
+                    continue
+                if database is not None and entry_database != database:
+                    continue
+                if key is not None and entry_name != key:
+                    continue
+                self._drop(entry_key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._rows = 0
@@ -0,0 +1,170 @@
+import json
+import os
+import re
+from contextlib import contextmanager
+from typing import Dict, Iterable, List
+
+# policy_state values recorded per column
+POLICY_NONE = 'none'
+POLICY_PENDING = 'pending'
+POLICY_APPLIED = 'applied'
+
+
+def column_key(schema: str, table: str, column: str) -> str:
+    return f"{schema}.{table}.{column}"
+
+
+class CatalogDelta:
+    """Columns added, removed or retyped since the previous snapshot"""
+
+    def __init__(self, added: List[Dict], removed: List[Dict], retyped: List[Dict], pending: List[Dict]):
+        self.added = added
+        self.removed = removed
+        self.retyped = retyped
+        # Sensitive columns seen before whose policies were never confirmed applied
+        self.pending = pending
+
+    def columns_to_mask(self) -> List[Dict]:
+        """Sensitive columns that need masking SQL in this run"""
+        return [entry for entry in self.added + self.retyped + self.pending if entry['type']]
+
+    def is_empty(self) -> bool:
+        return not (self.added or self.removed or self.retyped or self.pending)
+
+    def summary(self) -> Dict[str, int]:
+        return {
+            'added': len(self.added),
+            'removed': len(self.removed),
+            'retyped': len(self.retyped),
+            'pending': len(self.pending)
+        }
+
+
+def diff_catalog(previous: Dict[str, Dict], current: Dict[str, Dict]) -> CatalogDelta:
+    """Compare two snapshots keyed by column_key()"""
+    added, retyped, pending = [], [], []
+    for key, entry in current.items():
+        before = previous.get(key)
+        if before is None:
+            added.append(entry)
+        elif before['data_type'] != entry['data_type'] or before['type'] != entry['type']:
+            retyped.append(entry)
+        elif entry['type'] and before['policy_state'] != POLICY_APPLIED:
+            pending.append(entry)
+    removed = [entry for key, entry in previous.items() if key not in current]
+    return CatalogDelta(added, removed, retyped, pending)
+
+
+class SnapshotStore:
+    """Persists catalog snapshots (column_key -> entry) under a string key"""
+
+    def load(self, key: str) -> Dict[str, Dict]:
+        raise NotImplementedError
+
+    def save(self, key: str, snapshot: Dict[str, Dict]):
+        raise NotImplementedError
+
+    def update(self, key: str, changed: Iterable[Dict], removed: Iterable[str] = ()):
+        """Upsert changed entries and delete removed column keys"""
+        snapshot = self.load(key)
+        for entry in changed:
+            snapshot[column_key(entry['schema'], entry['table'], entry['column'])] = entry
+        for removed_key in removed:
+            snapshot.pop(removed_key, None)
+        self.save(key, snapshot)
+
+
+class JsonSnapshotStore(SnapshotStore):
+    """One JSON file per snapshot key in a local directory"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, re.sub(r'[^\w.-]', '_', key) + '.json')
+
+    def load(self, key: str) -> Dict[str, Dict]:
+        try:
+            with open(self._path(key)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def save(self, key: str, snapshot: Dict[str, Dict]):
+        path = self._path(key)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(snapshot, f)
+        os.replace(path + '.tmp', path)
+
+
+class SqliteSnapshotStore(SnapshotStore):
+    """SQLite-backed store; updates touch only the changed rows"""
+
+    _UPSERT = "INSERT OR REPLACE INTO catalog_snapshot VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+
+    def __init__(self, path: str):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS catalog_snapshot (
+                    snapshot_key TEXT NOT NULL,
+                    column_key TEXT NOT NULL,
+                    schema_name TEXT NOT NULL,
+                    table_name TEXT NOT NULL,
+                    column_name TEXT NOT NULL,
+                    data_type TEXT,
+                    sensitivity_type TEXT,
+                    policy_state TEXT NOT NULL,
+                    PRIMARY KEY (snapshot_key, column_key)
+                )
+            """)
+
+    @contextmanager
+    def _connect(self):
+        import sqlite3
+        conn = sqlite3.connect(self.path)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def load(self, key: str) -> Dict[str, Dict]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT column_key, schema_name, table_name, column_name, data_type, sensitivity_type, policy_state "
+                "FROM catalog_snapshot WHERE snapshot_key = ?", (key,)
+            )
+            return {
+                row[0]: {
+                    'schema': row[1],
+                    'table': row[2],
+                    'column': row[3],
+                    'data_type': row[4],
+                    'type': row[5],
+                    'policy_state': row[6]
+                }
+                for row in rows
+            }
+
+    def save(self, key: str, snapshot: Dict[str, Dict]):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM catalog_snapshot WHERE snapshot_key = ?", (key,))
+            conn.executemany(self._UPSERT, (self._row(key, entry) for entry in snapshot.values()))
+
+    def update(self, key: str, changed: Iterable[Dict], removed: Iterable[str] = ()):
+        with self._connect() as conn:
+            conn.executemany(self._UPSERT, (self._row(key, entry) for entry in changed))
+            conn.executemany(
+                "DELETE FROM catalog_snapshot WHERE snapshot_key = ? AND column_key = ?",
+                ((key, removed_key) for removed_key in removed)
+            )
+
+    @staticmethod
+    def _row(key: str, entry: Dict) -> tuple:
+        return (
+            key, column_key(entry['schema'], entry['table'], entry['column']),
+            entry['schema'], entry['table'], entry['column'],
+            entry['data_type'], entry['type'], entry['policy_state']
+        )
@@ -0,0 +1,144 @@
+import bisect
+import functools
+import json
+import os
+import re
+from typing import Dict, Iterable, Iterator, List, Optional
+
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'classification_rules.json')
+
+
+def _trie_pattern(keywords: Iterable[str]) -> str:
+    """Compile literal keywords into one trie-shaped regex so alternation stays linear in name length"""
+    trie = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node: Dict) -> str:
+        # Containment is all we need, so a keyword ending here makes the rest of the branch irrelevant
+        if '' in node:
+            return ''
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items())]
+        return branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+
+    return build(trie) if trie else ''
+
+
+class ColumnClassifier:
+    """Classifies column names against ordered sensitivity rules in a single compiled regex.
+
+    Each rule has a type plus literal keywords and/or regex patterns; a name
+    matches a rule when it contains any of them (case-insensitive). When
+    several rules match, the earliest rule in the config wins.
+    """
+
+    def __init__(self, rules: List[Dict], batch_size: int = 10000):
+        self.rules = rules
+        self.types = [rule['type'] for rule in rules]
+        self.batch_size = batch_size
+
+        # Literal keywords resolve to their rule by dict lookup; regex patterns are re-tested on the match
+        self._keyword_rules = {}
+        self._pattern_rules = []
+        alternatives = []
+        for index, rule in enumerate(rules):
+            keywords = [keyword.lower() for keyword in rule.get('keywords', []) if keyword]
+            for keyword in keywords:
+                self._keyword_rules.setdefault(keyword, index)
+            rule_alternatives = [_trie_pattern(keywords)] if keywords else []
+            for pattern in rule.get('patterns', []):
+                rule_alternatives.append(pattern)
+                self._pattern_rules.append((index, re.compile(pattern)))
+            if rule_alternatives:
+                alternatives.append('(?:' + '|'.join(rule_alternatives) + ')')
+        # A lookahead reports a match at every position, so no rule is hidden by an overlapping one.
+        # Alternatives are in rule order, so each position reports its highest-priority rule.
+        self._pattern = re.compile('(?=(' + '|'.join(alternatives) + '))') if alternatives else None
+
+    @classmethod
+    def from_config(cls, path: Optional[str] = None, **kwargs) -> 'ColumnClassifier':
+        """Load rules from a JSON file; keywords_file entries are resolved relative to it"""
+        path = path or os.environ.get('CLASSIFICATION_RULES', DEFAULT_RULES_PATH)
+        with open(path) as f:
+            config = json.load(f)
+
+        rules = []
+        for rule in config['rules']:
+            rule = dict(rule)
+            keywords_file = rule.pop('keywords_file', None)
+            if keywords_file:
+                with open(os.path.join(os.path.dirname(os.path.abspath(path)), keywords_file)) as f:
+                    extra = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+                rule['keywords'] = list(rule.get('keywords', [])) + extra
+            rules.append(rule)
+        return cls(rules, **kwargs)
+
+    @classmethod
+    def shared(cls, path: Optional[str] = None) -> 'ColumnClassifier':
+        """from_config(), compiled once per rules file version and reused by every caller in the process"""
+        path = os.path.abspath(path or os.environ.get('CLASSIFICATION_RULES', DEFAULT_RULES_PATH))
+        return _shared_classifier(path, os.path.getmtime(path))
+
+    @staticmethod
+    def clear_shared():
+        _shared_classifier.cache_clear()
+
+    def classify(self, names: List[str]) -> List[Optional[str]]:
+        """Return the sensitivity type (or None) for each name, in order"""
+        return list(self.classify_iter(names))
+
+    def classify_iter(self, names: Iterable[str]) -> Iterator[Optional[str]]:
+        """Streaming form of classify(); names are processed batch_size at a time"""
+        batch = []
+        for name in names:
+            batch.append(name)
+            if len(batch) >= self.batch_size:
+                yield from self._classify_batch(batch)
+                batch = []
+        if batch:
+            yield from self._classify_batch(batch)
+
+    def _classify_batch(self, names: List[str]) -> List[Optional[str]]:
+        if self._pattern is None:
+            return [None] * len(names)
+
+        # One regex pass over the whole batch; offsets map matches back to names
+        text = '\n'.join(names).lower()
+        starts = []
+        offset = 0
+        for name in names:
+            starts.append(offset)
+            offset += len(name) + 1
+
+        best = {}
+        no_rule = len(self.types)
+        for match in self._pattern.finditer(text):
+            matched = match.group(1)
+            rule_index = self._keyword_rules.get(matched, no_rule)
+            if self._pattern_rules:
+                rule_index = self._rule_for_pattern_match(matched, rule_index)
+            name_index = bisect.bisect_right(starts, match.start()) - 1
+            if rule_index < best.get(name_index, no_rule):
+                best[name_index] = rule_index
+
+        result = [None] * len(names)
+        for name_index, rule_index in best.items():
+            result[name_index] = self.types[rule_index]
+        return result
+
+    def _rule_for_pattern_match(self, matched: str, keyword_rule: int) -> int:
+        """A pattern from an earlier rule can produce text that is also a later rule's keyword"""
+        for rule_index, pattern in self._pattern_rules:
+            if rule_index >= keyword_rule:
+                break
+            if pattern.fullmatch(matched):
+                return rule_index
+        return keyword_rule
+
+
+@functools.lru_cache(maxsize=8)
+def _shared_classifier(path: str, modified: float) -> ColumnClassifier:
+    return ColumnClassifier.from_config(path)
@@ -11,7 +11,7 @@ if [ -z "$CLUSTER_IDENTIFIER" ] || [ -z "$DATABASE_NAME" ]; then
 fi
 
 # Package Lambda function
-zip -r masking-lambda.zip redshift_masking_automation.py lambda_trigger.py
+zip -r masking-lambda.zip *.py classification_rules.json
 
 # Deploy CloudFormation stack
 aws cloudformation deploy \
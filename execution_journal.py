@@ -0,0 +1,165 @@
+import json
+import os
+import re
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set
+
+
+def plan_hash(sql_commands: Iterable[str]) -> str:
+    """Stable identifier for a plan: the same statements in the same order hash the same"""
+    import hashlib
+    digest = hashlib.sha256()
+    for sql in sql_commands:
+        digest.update(sql.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()[:32]
+
+
+class JournalStore:
+    """Persists in-progress plans and the step ranges already executed, keyed by plan hash.
+
+    Each scope (e.g. cluster/database/schema) has at most one active plan.
+    """
+
+    def active(self, scope: str) -> Optional[str]:
+        """Hash of the unfinished plan for scope, if any"""
+        raise NotImplementedError
+
+    def load(self, plan_id: str) -> Optional[Dict]:
+        """The plan header plus 'completed', the set of executed step indexes"""
+        raise NotImplementedError
+
+    def begin(self, scope: str, header: Dict):
+        """Make header['plan_hash'] the active plan for scope; progress on the same hash is kept"""
+        raise NotImplementedError
+
+    def record(self, plan_id: str, start: int, end: int):
+        """Mark steps [start, end) as executed"""
+        raise NotImplementedError
+
+    def finish(self, scope: str, plan_id: str):
+        """Drop a plan once every step has run (or it is abandoned)"""
+        raise NotImplementedError
+
+
+class FileJournalStore(JournalStore):
+    """Append-only JSON lines journal per plan in a local directory (e.g. an EFS mount).
+
+    Completed ranges are appended and flushed as each batch finishes, so a
+    killed invocation loses at most the batches that were still running.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def _path(self, name: str, suffix: str) -> str:
+        return os.path.join(self.directory, re.sub(r'[^\w.-]', '_', name) + suffix)
+
+    def active(self, scope: str) -> Optional[str]:
+        try:
+            with open(self._path(scope, '.active')) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def load(self, plan_id: str) -> Optional[Dict]:
+        try:
+            with open(self._path(plan_id, '.jsonl')) as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return None
+        if not lines:
+            return None
+
+        header = json.loads(lines[0])
+        completed = set()
+        for line in lines[1:]:
+            try:
+                start, end = json.loads(line)['done']
+            except ValueError:
+                # A write cut short by a timeout; that batch is simply redone
+                continue
+            completed.update(range(start, end))
+        header['completed'] = completed
+        return header
+
+    def begin(self, scope: str, header: Dict):
+        path = self._path(header['plan_hash'], '.jsonl')
+        with self._lock:
+            if not os.path.exists(path):
+                with open(path + '.tmp', 'w') as f:
+                    f.write(json.dumps(header) + '\n')
+                os.replace(path + '.tmp', path)
+            pointer = self._path(scope, '.active')
+            with open(pointer + '.tmp', 'w') as f:
+                f.write(header['plan_hash'])
+            os.replace(pointer + '.tmp', pointer)
+
+    def record(self, plan_id: str, start: int, end: int):
+        with self._lock:
+            with open(self._path(plan_id, '.jsonl'), 'a') as f:
+                f.write(json.dumps({'done': [start, end]}) + '\n')
+
+    def finish(self, scope: str, plan_id: str):
+        with self._lock:
+            for path in (self._path(plan_id, '.jsonl'), self._path(scope, '.active')):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+
+class PlanCheckpoint:
+    """Tracks which steps of one journaled plan have executed; passed to execute_plan()"""
+
+    def __init__(self, store: JournalStore, scope: str, header: Dict, completed: Iterable[int] = ()):
+        self.store = store
+        self.scope = scope
+        self.header = header
+        self.completed: Set[int] = set(completed)
+        self._lock = threading.Lock()
+
+    @property
+    def plan_hash(self) -> str:
+        return self.header['plan_hash']
+
+    @property
+    def sql_commands(self) -> List[str]:
+        return self.header['sql_commands']
+
+    @classmethod
+    def start(cls, store: JournalStore, scope: str, sql_commands: List[str], batch_size: int,
+              **details) -> 'PlanCheckpoint':
+        """Journal a new plan; extra details (e.g. sensitive_columns) are kept for the resume"""
+        header = dict(details, plan_hash=plan_hash(sql_commands), scope=scope, batch_size=batch_size,
+                      sql_commands=list(sql_commands), started_at=time.time())
+        store.begin(scope, header)
+        existing = store.load(header['plan_hash'])
+        return cls(store, scope, header, existing['completed'] if existing else ())
+
+    @classmethod
+    def resume(cls, store: JournalStore, scope: str) -> Optional['PlanCheckpoint']:
+        """The unfinished plan for scope, or None"""
+        plan_id = store.active(scope)
+        header = store.load(plan_id) if plan_id else None
+        if header is None:
+            return None
+        completed = header.pop('completed')
+        return cls(store, scope, header, completed)
+
+    def is_done(self, start: int, end: int) -> bool:
+        return all(index in self.completed for index in range(start, end))
+
+    def record(self, start: int, end: int):
+        with self._lock:
+            self.completed.update(range(start, end))
+        self.store.record(self.plan_hash, start, end)
+
+    def remaining(self) -> int:
+        return len(self.sql_commands) - len(self.completed)
+
+    def finish(self):
+        self.store.finish(self.scope, self.plan_hash)
@@ -0,0 +1,212 @@
+"""Run scan, plan and execute across a fleet of clusters and serverless workgroups at once.
+
+The inventory is JSON: a list of targets, or {"defaults": {...}, "targets": [...]}
+where each target names a cluster_identifier or a workgroup_name and its
+databases; any other setting can be given per target or in defaults:
+
+    {
+      "defaults": {"schema": "*", "concurrency": 8, "db_user": "awsuser"},
+      "targets": [
+        {"cluster_identifier": "prod-east", "databases": ["dev", "sales"]},
+        {"workgroup_name": "analytics", "region": "us-west-2", "databases": ["dev"],
+         "secret_arn": "arn:aws:secretsmanager:us-west-2:123456789012:secret:masking"}
+      ]
+    }
+
+Targets run concurrently, each with its own statement concurrency limit;
+databases on one target run one after another, since they share its quota.
+A failing target or database is recorded in the report and does not stop
+the others, so a sweep takes about as long as the slowest target.
+
+Usage:
+    python fleet_runner.py inventory.json -o report.json
+    python fleet_runner.py inventory.json --dry-run --max-targets 32
+"""
+import argparse
+import contextlib
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from masking_plan import MAX_BATCH_SIZE
+from plan_sinks import ExecutorSink
+from redshift_masking_automation import RedshiftMaskingAutomator
+from throttled_client import is_throttling_error
+
+# Targets swept at the same time unless --max-targets says otherwise
+DEFAULT_MAX_TARGETS = 16
+
+
+class FleetTarget:
+    """One cluster or serverless workgroup and the databases to mask on it"""
+
+    def __init__(self, databases: List[str], cluster_identifier: Optional[str] = None,
+                 workgroup_name: Optional[str] = None, region: str = 'us-east-1', concurrency: int = 8,
+                 schema: str = 'public', include_schemas: Optional[List[str]] = None,
+                 exclude_schemas: Optional[List[str]] = None, db_user: Optional[str] = None,
+                 secret_arn: Optional[str] = None, share_policies: bool = False, batch_size: int = MAX_BATCH_SIZE):
+        if bool(cluster_identifier) == bool(workgroup_name):
+            raise ValueError('Each target needs exactly one of cluster_identifier or workgroup_name')
+        if not databases:
+            raise ValueError(f"Target {cluster_identifier or workgroup_name} lists no databases")
+        self.databases = list(databases)
+        self.cluster_identifier = cluster_identifier
+        self.workgroup_name = workgroup_name
+        self.region = region
+        self.concurrency = concurrency
+        self.schema = schema
+        self.include_schemas = include_schemas
+        self.exclude_schemas = exclude_schemas
+        self.db_user = db_user
+        self.secret_arn = secret_arn
+        self.share_policies = share_policies
+        self.batch_size = batch_size
+
+    @property
+    def name(self) -> str:
+        return self.cluster_identifier or f"workgroup:{self.workgroup_name}"
+
+    @classmethod
+    def from_dict(cls, entry: Dict, defaults: Optional[Dict] = None) -> 'FleetTarget':
+        settings = dict(defaults or {}, **entry)
+        if 'database' in settings and 'databases' not in settings:
+            settings['databases'] = [settings.pop('database')]
+        return cls(**settings)
+
+
+def load_inventory(path: str) -> List[FleetTarget]:
+    """Targets from an inventory JSON file (a list, or {"defaults": ..., "targets": [...]})"""
+    with open(path) as f:
+        inventory = json.load(f)
+    if isinstance(inventory, list):
+        inventory = {'targets': inventory}
+    defaults = inventory.get('defaults', {})
+    return [FleetTarget.from_dict(entry, defaults) for entry in inventory['targets']]
+
+
+def build_automator(target: FleetTarget) -> RedshiftMaskingAutomator:
+    return RedshiftMaskingAutomator(
+        target.cluster_identifier,
+        region=target.region,
+        max_concurrency=target.concurrency,
+        share_policies=target.share_policies,
+        workgroup_name=target.workgroup_name,
+        secret_arn=target.secret_arn
+    )
+
+
+class FleetRunner:
+    """Sweeps up to max_targets targets concurrently and merges their results into one report.
+
+    With dry_run, each database is only scanned and planned. automator_factory
+    builds the automator for a target (build_automator by default).
+    """
+
+    def __init__(self, targets: List[FleetTarget], max_targets: int = DEFAULT_MAX_TARGETS, dry_run: bool = False,
+                 automator_factory: Callable[[FleetTarget], RedshiftMaskingAutomator] = build_automator):
+        self.targets = targets
+        self.max_targets = max(1, max_targets)
+        self.dry_run = dry_run
+        self.automator_factory = automator_factory
+
+    def run(self) -> Dict:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=min(self.max_targets, max(1, len(self.targets)))) as pool:
+            per_target = list(pool.map(self._run_target, self.targets))
+        results = [result for target_results in per_target for result in target_results]
+
+        status = {}
+        for result in results:
+            status[result['status']] = status.get(result['status'], 0) + 1
+        target_seconds = [sum(result['seconds'] for result in target_results) for target_results in per_target]
+        return {
+            'dry_run': self.dry_run,
+            'targets': len(self.targets),
+            'databases': len(results),
+            'seconds': round(time.perf_counter() - start, 3),
+            'slowest_target_seconds': round(max(target_seconds, default=0.0), 3),
+            'status': status,
+            'totals': {
+                'sensitive_columns': sum(result.get('sensitive_columns', 0) for result in results),
+                'planned_statements': sum(result.get('planned_statements', 0) for result in results),
+                'executed_commands': sum(result.get('executed_commands', 0) for result in results)
+            },
+            'results': results
+        }
+
+    def _run_target(self, target: FleetTarget) -> List[Dict]:
+        try:
+            automator = self.automator_factory(target)
+        except Exception as e:
+            return [{'target': target.name, 'database': database, 'status': 'error', 'seconds': 0.0,
+                     'error': f"Could not build automator: {e}"} for database in target.databases]
+        return [self._run_database(target, automator, database) for database in target.databases]
+
+    def _run_database(self, target: FleetTarget, automator: RedshiftMaskingAutomator, database: str) -> Dict:
+        automator.metrics.reset()
+        result = {'target': target.name, 'database': database}
+        start = time.perf_counter()
+        try:
+            if self.dry_run:
+                plan = automator.plan_masking(database, target.schema, target.include_schemas,
+                                              target.exclude_schemas)
+                result.update(
+                    status='planned',
+                    sensitive_columns=sum(len(columns) for columns in plan.sensitive_columns.values()),
+                    planned_statements=len(plan.steps),
+                    plan_summary=plan.summary()
+                )
+            else:
+                executor = ExecutorSink(automator, database, target.batch_size, db_user=target.db_user)
+                masking = automator.apply_automated_masking(database, target.schema, target.include_schemas,
+                                                            target.exclude_schemas, sinks=[executor])
+                execution = masking['outputs'].pop(executor.name)
+                sensitive_columns = masking.get('sensitive_columns') or {}
+                result.update(
+                    status=execution['status'],
+                    sensitive_columns=sum(len(columns) for columns in sensitive_columns.values()),
+                    planned_statements=sum(masking.get('plan_summary', {}).get(action, 0)
+                                           for action in ('create', 'alter', 'attach', 'detach', 'drop')),
+                    plan_summary=masking.get('plan_summary', {}),
+                    executed_commands=execution['executed_commands'],
+                    total_batches=execution['total_batches']
+                )
+                if execution['status'] != 'succeeded':
+                    result['failed_batches'] = len(execution.get('failed_batches', []))
+                    result['error'] = execution.get('error')
+        except Exception as e:
+            # Quota still exceeded after retries is worth a later retry; anything else needs a look
+            result.update(status='throttled' if is_throttling_error(e) else 'error', error=str(e))
+        result['seconds'] = round(time.perf_counter() - start, 3)
+        result['metrics'] = automator.metrics.snapshot()
+        print(f"{target.name}/{database}: {result['status']} in {result['seconds']}s")
+        return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Apply masking across many clusters and workgroups')
+    parser.add_argument('inventory', help='inventory JSON of clusters/workgroups and their databases')
+    parser.add_argument('-o', '--output', help='write the merged report here (default: stdout)')
+    parser.add_argument('--dry-run', action='store_true', help='scan and plan only')
+    parser.add_argument('--max-targets', type=int, default=DEFAULT_MAX_TARGETS,
+                        help='targets swept at the same time')
+    args = parser.parse_args(argv)
+
+    runner = FleetRunner(load_inventory(args.inventory), args.max_targets, args.dry_run)
+    # Progress lines go to stderr so the report on stdout stays valid JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        report = runner.run()
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+    print(json.dumps({key: report[key] for key in ('targets', 'databases', 'seconds', 'status')}), file=sys.stderr)
+    healthy = ('succeeded', 'planned')
+    return 0 if all(result['status'] in healthy for result in report['results']) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
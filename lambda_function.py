@@ -1,21 +1,122 @@
 import json
-import boto3
-from redshift_masking_automation import RedshiftMaskingAutomator
+import os
+import time
+from catalog_cache import DEFAULT_MAX_ROWS, CatalogCache
+from catalog_snapshot import SqliteSnapshotStore
+from column_classifier import ColumnClassifier
+from execution_journal import FileJournalStore, PlanCheckpoint, plan_hash
+from redshift_masking_automation import (
+    DEFAULT_CLEANUP_LIMIT, MAX_BATCH_SIZE, RedshiftMaskingAutomator, clear_shared_clients
+)
+from plan_sinks import DEFAULT_CHUNK_SIZE, ExecutorSink, output_sink, result_summary, write_plan
+from run_metrics import RunMetrics
+from table_events import handle_event
+from throttled_client import clear_controllers, is_throttling_error
+from value_sampler import SamplingBudget
+
+# Kept across warm invocations of the same container
+CATALOG_CACHE = CatalogCache(ttl=float(os.environ.get('CATALOG_CACHE_TTL', 300)),
+                             max_rows=int(os.environ.get('CATALOG_CACHE_MAX_ROWS', DEFAULT_MAX_ROWS)))
+_AUTOMATORS = {}
+
+# Reset per invocation and printed as one CloudWatch EMF record
+RUN_METRICS = RunMetrics(dimensions={'Function': 'lambda_function'})
+
+
+def get_automator(cluster_identifier, event, snapshot_path, workgroup_name=None):
+    """Reuse the automator (client, classifier, scheduler thread) built for the same settings"""
+    key = json.dumps([cluster_identifier, workgroup_name, event.get('concurrency', 8),
+                      bool(event.get('share_policies', False)), event.get('sampling'), snapshot_path,
+                      bool(event.get('native_sql', True))], sort_keys=True)
+    automator = _AUTOMATORS.get(key)
+    if automator is None:
+        automator = _AUTOMATORS[key] = RedshiftMaskingAutomator(
+            cluster_identifier,
+            workgroup_name=workgroup_name,
+            max_concurrency=int(event.get('concurrency', 8)),
+            share_policies=bool(event.get('share_policies', False)),
+            # e.g. {"max_rows": 100000, "max_statements": 50, "rows_per_column": 100}
+            sampling_budget=SamplingBudget(**event['sampling']) if event.get('sampling') else None,
+            snapshot_store=SqliteSnapshotStore(snapshot_path) if snapshot_path else None,
+            catalog_cache=CATALOG_CACHE,
+            metrics=RUN_METRICS,
+            # "native_sql": false keeps policies calling the REDACT_SSN Python UDF
+            native_sql=bool(event.get('native_sql', True))
+        )
+    return automator
+
+
+def plan_output_sinks(event, target_name, database):
+    """Chunked plan copy under plan_output (a local directory or s3://bucket/prefix), one prefix per run"""
+    location = event.get('plan_output', os.environ.get('PLAN_OUTPUT'))
+    if not location:
+        return []
+    run = time.strftime('%Y%m%dT%H%M%SZ', time.gmtime())
+    chunk_size = int(event.get('plan_chunk_size', DEFAULT_CHUNK_SIZE))
+    # 'workgroup:name' targets are written under workgroup/name
+    return [output_sink(location, target_name.replace(':', '/'), database, run, chunk_size=chunk_size)]
+
+
+def cleanup_response(automator, event, database, batch_size, deadline, output_sinks):
+    """"cleanup": true drops mask_ policies left behind by dropped tables and columns instead of masking.
+
+    Dry run unless "dry_run": false; at most "max_policies" policies per invocation.
+    """
+    report = automator.cleanup_policies(
+        database,
+        dry_run=bool(event.get('dry_run', True)),
+        max_policies=int(event.get('max_policies', DEFAULT_CLEANUP_LIMIT)),
+        batch_size=batch_size,
+        db_user='awsuser',
+        deadline=deadline,
+        sinks=output_sinks
+    )
+    report.pop('plan', None)
+    report.pop('sql_commands', None)
+    report['manifest'] = report.pop('outputs', {})
+    status = report.get('execution', {}).get('status', 'succeeded')
+    # Deferred or failed policies are still stale, so the next invocation finds them again
+    status_code = {'succeeded': 200, 'incomplete': 202}.get(status, 207)
+    return {
+        'statusCode': status_code,
+        'body': json.dumps(report)
+    }
+
+
+def reset_warm_state():
+    """Drop everything reused across invocations, as in a fresh container"""
+    _AUTOMATORS.clear()
+    CATALOG_CACHE.clear()
+    clear_shared_clients()
+    ColumnClassifier.clear_shared()
+    clear_controllers()
+
 
 def lambda_handler(event, context):
-    """Lambda function to trigger masking when schema changes detected"""
-    
+    """Lambda function to trigger masking when schema changes detected.
+
+    An SQS batch of table change events is coalesced into one scan per
+    (cluster, database); messages whose scan did not finish are returned
+    as batchItemFailures so SQS redelivers them.
+    """
+    return handle_event(event, lambda target: _handle(target, context), RUN_METRICS, defaults={'database': 'dev'})
+
+
+def _handle(event, context):
     print(f"Received event: {json.dumps(event)}")
     
-    # Extract cluster info from event
-    cluster_identifier = event.get('cluster_identifier', 'daab-redshift-cluster-jr-bedrock')
+    # Extract cluster (or serverless workgroup) info from event
+    cluster_identifier = event.get('cluster_identifier')
+    workgroup_name = event.get('workgroup_name')
     database = event.get('database', 'dev')
     schema = event.get('schema', 'public')
+    # Table-scoped events (a table list or DDL text) scan only those relations
+    tables = event.get('tables')
     
-    if not cluster_identifier or not database:
+    if not (cluster_identifier or workgroup_name) or not database:
         missing = []
-        if not cluster_identifier:
-            missing.append('cluster_identifier')
+        if not (cluster_identifier or workgroup_name):
+            missing.append('cluster_identifier or workgroup_name')
         if not database:
             missing.append('database')
         
@@ -26,58 +127,154 @@ def lambda_handler(event, context):
     
     try:
         # Initialize automator
-        automator = RedshiftMaskingAutomator(cluster_identifier)
+        # Incremental scans need a snapshot location (e.g. an EFS mount)
+        snapshot_path = event.get('snapshot_path', os.environ.get('SNAPSHOT_PATH'))
+        automator = get_automator(cluster_identifier, event, snapshot_path, workgroup_name)
+        target_name = automator.target_name
+        
+        # Catalog and policy state are cached per (cluster, database) until the TTL or reported DDL
+        if event.get('ddl') or tables:
+            CATALOG_CACHE.invalidate(target_name, database)
         
-        # Get SQL commands and sensitive columns
-        result = automator.apply_automated_masking(database, schema)
+        # A journaled plan left unfinished by an earlier invocation resumes without rescanning
+        journal_path = event.get('journal_path', os.environ.get('JOURNAL_PATH'))
+        journal = FileJournalStore(journal_path) if journal_path else None
+        scope = f"{target_name}/{database}/{schema}"
+        if tables:
+            scope += '/' + plan_hash(sorted(tables))[:12]
+        checkpoint = PlanCheckpoint.resume(journal, scope) if journal else None
+        if checkpoint is not None and event.get('restart_plan'):
+            checkpoint.finish()
+            checkpoint = None
         
-        if 'sql_commands' in result:
-            # Execute SQL commands as superuser
-            redshift_data = boto3.client('redshift-data')
-            executed_commands = []
+        # Stop sending batches early enough for in-flight ones to finish before the timeout
+        deadline = None
+        if context is not None and hasattr(context, 'get_remaining_time_in_millis'):
+            margin = float(event.get('deadline_margin_seconds', 60))
+            deadline = time.time() + context.get_remaining_time_in_millis() / 1000 - margin
+        
+        output_sinks = plan_output_sinks(event, target_name, database)
+        batch_size = int(event.get('batch_size', MAX_BATCH_SIZE))
+        if event.get('cleanup'):
+            return cleanup_response(automator, event, database, batch_size, deadline, output_sinks)
+        
+        execution = None
+        if checkpoint is not None:
+            print(f"Resuming plan {checkpoint.plan_hash}: {checkpoint.remaining()} of "
+                  f"{len(checkpoint.sql_commands)} statements left")
+            result = {
+                'sensitive_columns': checkpoint.header['sensitive_columns'],
+                'plan_summary': checkpoint.header['plan_summary']
+            }
+            execution = automator.execute_plan(
+                database,
+                checkpoint.sql_commands,
+                batch_size=checkpoint.header['batch_size'],
+                db_user='awsuser',
+                checkpoint=checkpoint,
+                deadline=deadline
+            )
+        elif journal:
+            # The journal holds the whole plan so a later invocation can resume it
+            # schema '*' scans the whole database in one catalog query
+            result = automator.apply_automated_masking(
+                database,
+                schema,
+                include_schemas=event.get('include_schemas'),
+                exclude_schemas=event.get('exclude_schemas'),
+                tables=tables
+            )
+            if 'sql_commands' in result:
+                checkpoint = PlanCheckpoint.start(
+                    journal, scope, result['sql_commands'], batch_size,
+                    sensitive_columns=result['sensitive_columns'],
+                    plan_summary=result['plan_summary']
+                )
+                result['outputs'] = write_plan(result['plan'].steps, output_sinks)
+                # Execute SQL commands as superuser in transactional batches
+                execution = automator.execute_plan(
+                    database,
+                    result['plan'],
+                    batch_size=batch_size,
+                    db_user='awsuser',
+                    checkpoint=checkpoint,
+                    deadline=deadline
+                )
+        else:
+            # Steps go to the executor as they are generated, so the full plan is never held in memory
+            executor = ExecutorSink(automator, database, batch_size, db_user='awsuser', deadline=deadline)
+            result = automator.apply_automated_masking(
+                database,
+                schema,
+                include_schemas=event.get('include_schemas'),
+                exclude_schemas=event.get('exclude_schemas'),
+                tables=tables,
+                sinks=[executor] + output_sinks
+            )
+            execution = result['outputs'].pop(executor.name)
+        
+        # Counts and manifests instead of column lists and SQL keep the response size fixed
+        summary = result_summary(result)
+        if execution is not None:
+            if execution['status'] == 'incomplete':
+                # Out of time; the next invocation picks up from the journal
+                return {
+                    'statusCode': 202,
+                    'body': json.dumps(dict(
+                        summary,
+                        message='Partial execution - stopped before the Lambda timeout',
+                        plan_hash=checkpoint.plan_hash if checkpoint else None,
+                        executed_commands=execution['executed_commands'],
+                        skipped_commands=execution['skipped_commands'],
+                        remaining_commands=len(execution['remaining_sql']),
+                        resumable=checkpoint is not None
+                    ))
+                }
             
-            for sql_command in result['sql_commands']:
-                try:
-                    response = redshift_data.execute_statement(
-                        ClusterIdentifier=cluster_identifier,
-                        Database=database,
-                        DbUser='awsuser',
-                        Sql=sql_command
-                    )
-                    
-                    # Wait for completion
-                    automator._wait_for_query(response['Id'])
-                    executed_commands.append(sql_command)
-                    
-                except Exception as e:
-                    print(f"Error executing SQL: {e}")
-                    # Return partial success with executed commands
-                    return {
-                        'statusCode': 207,
-                        'body': json.dumps({
-                            'message': f'Partial execution - Error: {str(e)}',
-                            'sensitive_columns': result['sensitive_columns'],
-                            'executed_commands': len(executed_commands),
-                            'failed_command': sql_command,
-                            'remaining_sql': result['sql_commands'][len(executed_commands):]
-                        })
-                    }
+            if execution['status'] != 'succeeded':
+                if checkpoint is not None and not execution.get('retryable'):
+                    # A SQL failure would recur on every resume; the next invocation rescans instead,
+                    # and reconciliation skips what this run already applied
+                    checkpoint.finish()
+                # Return partial success; the full plan is in the manifest's chunks when plan_output is set
+                return {
+                    'statusCode': 207,
+                    'body': json.dumps(dict(
+                        summary,
+                        message=f"Partial execution - Error: {execution['error']}",
+                        executed_commands=execution['executed_commands'],
+                        failed_batch=execution['failed_batch'],
+                        failed_batches=execution['failed_batches'],
+                        failed_commands=execution['failed_commands'],
+                        remaining_commands=len(execution['remaining_sql']),
+                        resumable=checkpoint is not None and execution['retryable']
+                    ))
+                }
             
-            return {
-                'statusCode': 200,
-                'body': json.dumps({
-                    'message': 'All masking policies created and applied successfully',
-                    'sensitive_columns': result['sensitive_columns'],
-                    'executed_commands': len(executed_commands)
-                })
-            }
+            if checkpoint is not None:
+                checkpoint.finish()
+            if execution['executed_commands']:
+                summary.update(
+                    message='All masking policies created and applied successfully',
+                    executed_commands=execution['executed_commands'],
+                    total_batches=execution['total_batches']
+                )
+        
+        if 'sensitive_columns' in result:
+            automator.mark_applied(database, schema, result['sensitive_columns'])
         
         return {
             'statusCode': 200,
-            'body': json.dumps(result)
+            'body': json.dumps(summary)
         }
         
     except Exception as e:
+        if is_throttling_error(e):
+            # Data API quota still exceeded after retries; safe to retry the whole event later
+            return {
+                'statusCode': 429,
+                'body': json.dumps(f'Throttled by the Redshift Data API: {str(e)}')
+            }
         return {
             'statusCode': 500,
             'body': json.dumps(f'Error: {str(e)}')
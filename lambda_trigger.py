@@ -1,37 +1,80 @@
 import json
-import boto3
+import os
+import time
+from plan_sinks import output_sink, result_summary
 from redshift_masking_automation import RedshiftMaskingAutomator
+from run_metrics import RunMetrics
+from table_events import handle_event
+from throttled_client import is_throttling_error
+
+# Reset per target and printed as one CloudWatch EMF record
+RUN_METRICS = RunMetrics(dimensions={'Function': 'lambda_trigger'})
+
+# Kept across warm invocations of the same container
+_AUTOMATORS = {}
+
+
+def get_automator(cluster_identifier, workgroup_name):
+    """Reuse the automator (client, classifier, scheduler) built for the same cluster or workgroup"""
+    key = (cluster_identifier, workgroup_name)
+    automator = _AUTOMATORS.get(key)
+    if automator is None:
+        automator = _AUTOMATORS[key] = RedshiftMaskingAutomator(
+            cluster_identifier, metrics=RUN_METRICS, workgroup_name=workgroup_name
+        )
+    return automator
+
 
 def lambda_handler(event, context):
     """Lambda function to trigger masking when schema changes detected"""
-    
-    # Extract cluster info from event
+    # EventBridge and queued events fall back to the stack's cluster (or workgroup) and database
+    return handle_event(event, _handle, RUN_METRICS)
+
+
+def _handle(event):
+    # Extract cluster (or serverless workgroup) info from event
     cluster_identifier = event.get('cluster_identifier')
+    workgroup_name = event.get('workgroup_name')
     database = event.get('database')
     schema = event.get('schema', 'public')
+    # The plan is streamed in chunks to plan_output (a local directory or s3://bucket/prefix)
+    location = event.get('plan_output', os.environ.get('PLAN_OUTPUT'))
     
-    if not cluster_identifier or not database:
+    if not (cluster_identifier or workgroup_name) or not database:
         return {
             'statusCode': 400,
             'body': json.dumps('Missing required parameters')
         }
+    if not location:
+        # Nothing runs the plan here, so without an output it would be computed and lost
+        return {
+            'statusCode': 400,
+            'body': json.dumps('Missing plan output: set plan_output or the PLAN_OUTPUT env var')
+        }
     
     try:
         # Initialize automator
-        automator = RedshiftMaskingAutomator(cluster_identifier)
+        automator = get_automator(cluster_identifier, workgroup_name)
+        
+        run = time.strftime('%Y%m%dT%H%M%SZ', time.gmtime())
+        target = automator.target_name.replace(':', '/')
+        sinks = [output_sink(location, target, database, run)]
         
-        # Apply masking policies
-        sensitive_columns = automator.apply_automated_masking(database, schema)
+        # Plan masking policies, only for the named tables for table-scoped events
+        result = automator.apply_automated_masking(database, schema, tables=event.get('tables'), sinks=sinks)
         
         return {
             'statusCode': 200,
-            'body': json.dumps({
-                'message': 'Masking policies applied successfully',
-                'sensitive_columns': sensitive_columns
-            })
+            'body': json.dumps(result_summary(result))
         }
         
     except Exception as e:
+        if is_throttling_error(e):
+            # Data API quota still exceeded after retries; safe to retry the whole event later
+            return {
+                'statusCode': 429,
+                'body': json.dumps(f'Throttled by the Redshift Data API: {str(e)}')
+            }
         return {
             'statusCode': 500,
             'body': json.dumps(f'Error: {str(e)}')
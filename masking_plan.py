@@ -0,0 +1,230 @@
+import json
+import re
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+# (policy_name, schema, table, column, grantee) as stored in SVV_ATTACHED_MASKING_POLICY
+AttachmentKey = Tuple[str, str, str, str, str]
+
+# Redshift Data API accepts at most 40 statements per BatchExecuteStatement call
+MAX_BATCH_SIZE = 40
+
+POLICY_NAME_PATTERN = re.compile(r'MASKING\s+POLICY\s+("[^"]+"|[\w.$]+)', re.IGNORECASE)
+TABLE_NAME_PATTERN = re.compile(r'\bON\s+("[^"]+"|[\w.$"]+)\s*\(', re.IGNORECASE)
+POLICY_WRITE_ACTIONS = ('CREATE', 'ALTER', 'DROP')
+
+
+class PlanStep:
+    """One DDL statement in a masking plan"""
+
+    __slots__ = ('action', 'policy_name', 'sql', 'schema', 'table', 'column', 'role', 'expression')
+
+    def __init__(self, action: str, policy_name: str, sql: str, schema: Optional[str] = None,
+                 table: Optional[str] = None, column: Optional[str] = None, role: Optional[str] = None,
+                 expression: Optional[str] = None):
+        self.action = action  # create | alter | attach | detach | drop
+        self.policy_name = policy_name
+        self.sql = sql
+        self.schema = schema
+        self.table = table
+        self.column = column
+        self.role = role
+        self.expression = expression
+
+    def attachment_key(self) -> AttachmentKey:
+        grantee = 'public' if self.role == 'public' else self.role
+        return (self.policy_name.lower(), (self.schema or 'public').lower(), self.table.lower(),
+                self.column.lower(), grantee.lower())
+
+    def to_dict(self) -> Dict:
+        return {
+            'action': self.action,
+            'policy_name': self.policy_name,
+            'schema': self.schema,
+            'table': self.table,
+            'column': self.column,
+            'role': self.role,
+            'sql': self.sql
+        }
+
+
+class MaskingPlan:
+    """Ordered plan steps plus bookkeeping about what was already in place"""
+
+    def __init__(self, steps: List[PlanStep], sensitive_columns: Dict[str, List[Dict]], skipped: int = 0):
+        self.steps = steps
+        self.sensitive_columns = sensitive_columns
+        self.skipped = skipped
+
+    @property
+    def sql_commands(self) -> List[str]:
+        return [step.sql for step in self.steps]
+
+    def is_empty(self) -> bool:
+        return not self.steps
+
+    def summary(self) -> Dict[str, int]:
+        counts = {'create': 0, 'alter': 0, 'attach': 0, 'detach': 0, 'drop': 0}
+        for step in self.steps:
+            counts[step.action] = counts.get(step.action, 0) + 1
+        counts['already_applied'] = self.skipped
+        return counts
+
+    def to_dict(self) -> Dict:
+        return {
+            'summary': self.summary(),
+            'sensitive_columns': self.sensitive_columns,
+            'steps': [step.to_dict() for step in self.steps]
+        }
+
+
+def normalize_expression(expression: str) -> str:
+    """Canonical form for comparing policy expressions with what Redshift stores"""
+    expression = re.sub(r'\s+', '', expression or '').lower()
+    while expression.startswith('(') and expression.endswith(')'):
+        expression = expression[1:-1]
+    return expression
+
+
+def parse_policy_expression(stored: str) -> str:
+    """SVV_MASKING_POLICY.policy_expression is a JSON list of {expr, type}; fall back to raw text"""
+    try:
+        parsed = json.loads(stored)
+    except (TypeError, ValueError):
+        return stored
+    if isinstance(parsed, list) and parsed and isinstance(parsed[0], dict):
+        return parsed[0].get('expr', stored)
+    return stored
+
+
+def parse_input_columns(stored: str) -> List[str]:
+    """SVV_ATTACHED_MASKING_POLICY.input_columns is a JSON list of column names"""
+    try:
+        parsed = json.loads(stored)
+    except (TypeError, ValueError):
+        return [stored] if stored else []
+    return [str(column) for column in parsed] if isinstance(parsed, list) else [str(parsed)]
+
+
+class PlanStream:
+    """Reconciled plan steps produced one at a time from a lazy iterable of desired steps.
+
+    Iterate it once; summary() is complete after the last step has been read.
+    existing_policies maps lower-cased policy name to its stored expression.
+    """
+
+    def __init__(self, desired: Iterable[PlanStep], existing_policies: Dict[str, str],
+                 existing_attachments: Set[AttachmentKey], sensitive_columns: Dict[str, List[Dict]]):
+        self.desired = desired
+        self.existing_policies = existing_policies
+        self.existing_attachments = existing_attachments
+        self.sensitive_columns = sensitive_columns
+        self.counts = {'create': 0, 'alter': 0, 'attach': 0, 'detach': 0, 'drop': 0}
+        self.skipped = 0
+
+    def __iter__(self) -> Iterator[PlanStep]:
+        for step in self._reconcile():
+            self.counts[step.action] = self.counts.get(step.action, 0) + 1
+            yield step
+
+    def _reconcile(self) -> Iterator[PlanStep]:
+        """Keep only the creates, alters and attaches that are missing or changed"""
+        planned_policies = set()
+        for step in self.desired:
+            if step.action == 'create':
+                name = step.policy_name.lower()
+                if name in planned_policies:
+                    continue
+                planned_policies.add(name)
+                if name not in self.existing_policies:
+                    yield step
+                elif normalize_expression(self.existing_policies[name]) != normalize_expression(step.expression):
+                    yield PlanStep(
+                        'alter', step.policy_name,
+                        f"ALTER MASKING POLICY {step.policy_name}\nUSING ({step.expression});",
+                        expression=step.expression
+                    )
+                else:
+                    self.skipped += 1
+            elif step.action == 'attach' and step.attachment_key() in self.existing_attachments:
+                self.skipped += 1
+            else:
+                yield step
+
+    def summary(self) -> Dict[str, int]:
+        return dict(self.counts, already_applied=self.skipped)
+
+
+def reconcile(desired: Iterable[PlanStep], existing_policies: Dict[str, str],
+              existing_attachments: Set[AttachmentKey], sensitive_columns: Dict[str, List[Dict]]) -> MaskingPlan:
+    """Keep only the creates, alters and attaches that are missing or changed, as a materialized plan"""
+    stream = PlanStream(desired, existing_policies, existing_attachments, sensitive_columns)
+    steps = list(stream)
+    return MaskingPlan(steps, sensitive_columns, stream.skipped)
+
+
+class BatchPacker:
+    """Packs statements into batches as they arrive, keeping each CREATE with its ATTACHes.
+
+    add() and flush() return finished (statements, indexes of earlier batches
+    it must wait for) pairs, so only the open batch is held in memory.
+    """
+
+    def __init__(self, batch_size: int = MAX_BATCH_SIZE):
+        self.batch_size = max(1, min(batch_size, MAX_BATCH_SIZE))
+        self._unit_policy = None
+        self._unit: List[str] = []
+        self._batch: Optional[List[str]] = None
+        self._count = 0
+        self._last_writer: Dict[str, int] = {}
+        self._readers_since_write: Dict[str, Set[int]] = {}
+
+    def add(self, sql: str) -> List[Tuple[List[str], Set[int]]]:
+        match = POLICY_NAME_PATTERN.search(sql)
+        policy = match.group(1).lower() if match else None
+        if self._unit and policy and self._unit_policy == policy and not sql.lstrip().upper().startswith('CREATE'):
+            self._unit.append(sql)
+            return []
+        finished = self._place_unit()
+        self._unit_policy, self._unit = policy, [sql]
+        return finished
+
+    def flush(self) -> List[Tuple[List[str], Set[int]]]:
+        finished = self._place_unit()
+        if self._batch:
+            finished.append(self._close(self._batch))
+        self._batch = None
+        return finished
+
+    def _place_unit(self) -> List[Tuple[List[str], Set[int]]]:
+        unit, self._unit = self._unit, []
+        if not unit:
+            return []
+        if self._batch is not None and len(self._batch) + len(unit) <= self.batch_size:
+            self._batch.extend(unit)
+            return []
+        finished = [self._close(self._batch)] if self._batch else []
+        chunks = [unit[i:i + self.batch_size] for i in range(0, len(unit), self.batch_size)]
+        finished.extend(self._close(chunk) for chunk in chunks[:-1])
+        self._batch = chunks[-1]
+        return finished
+
+    def _close(self, batch: List[str]) -> Tuple[List[str], Set[int]]:
+        # CREATE/ALTER/DROP write a policy; ATTACH/DETACH only need it to exist, so attaches of a
+        # shared policy can run side by side. Statements on the same table are always serialized.
+        batch_index = self._count
+        self._count += 1
+        writes, reads = set(), set()
+        for sql in batch:
+            action = sql.lstrip().split(None, 1)[0].upper() if sql.strip() else ''
+            policies = {m.lower() for m in POLICY_NAME_PATTERN.findall(sql)}
+            (writes if action in POLICY_WRITE_ACTIONS else reads).update(policies)
+            writes.update(f"table:{m.lower()}" for m in TABLE_NAME_PATTERN.findall(sql))
+        reads -= writes
+        depends_on = {self._last_writer[key] for key in writes | reads if key in self._last_writer}
+        for key in writes:
+            depends_on.update(self._readers_since_write.pop(key, ()))
+            self._last_writer[key] = batch_index
+        for key in reads:
+            self._readers_since_write.setdefault(key, set()).add(batch_index)
+        depends_on.discard(batch_index)
+        return batch, depends_on
@@ -0,0 +1,241 @@
+import re
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from value_sampler import _quote_identifier
+
+NON_DIGITS = re.compile(r'[^0-9]')
+
+# Column types Redshift cannot sort by (or that do not compare as plain values), so they never order rows
+UNSORTABLE_TYPES = ('super', 'varbyte', 'varbinary', 'binary varying', 'geometry', 'geography', 'hllsketch')
+
+# Users to impersonate for each role the automator attaches policies to
+DEFAULT_ROLE_USERS = {
+    'public': 'regular_user',
+    'analyst_role': 'analyst_user',
+    'admin_role': 'admin_user'
+}
+
+
+def redact_ssn(value: Optional[str]) -> Optional[str]:
+    """REDACT_SSN from notebook_setup.sql; plpythonu is Python 2, where \\d only matches 0-9"""
+    if value is None:
+        return None
+    digits = NON_DIGITS.sub('', value)
+    return 'xxx-xx-' + digits[5:9] if len(digits) == 9 else 'invalid ssn'
+
+
+def _null_safe(mask: Callable[[str], str]) -> Callable[[Optional[str]], Optional[str]]:
+    return lambda value: None if value is None else mask(value)
+
+
+# What each role should see for a value, by sensitivity type: the automator's masking expressions in Python
+REFERENCE_MASKS = {
+    'public': {
+        'email': lambda value: '***MASKED***',
+        'phone': lambda value: '***MASKED***',
+        'ssn': lambda value: 'XXX-XX-XXXX',
+        'credit_card': lambda value: '****-****-****-****',
+        'name': lambda value: '***MASKED***',
+        'address': lambda value: '***MASKED***'
+    },
+    'analyst_role': {
+        'email': _null_safe(lambda value: re.sub('@.*', '@*****.com', value, flags=re.DOTALL)),
+        'phone': _null_safe(lambda value: value[:3] + '-***-****'),
+        'ssn': redact_ssn,
+        'credit_card': _null_safe(lambda value: '****-****-****-' + value[-4:]),
+        'name': _null_safe(lambda value: value[:1] + '*' * (len(value) - 1)),
+        'address': _null_safe(lambda value: value[:10] + '***')
+    },
+    'admin_role': {sensitivity_type: (lambda value: value) for sensitivity_type in
+                   ('email', 'phone', 'ssn', 'credit_card', 'name', 'address')}
+}
+
+
+class TableCheck:
+    """Columns of one table to verify: unmasked sortable key columns align rows, masked columns are compared"""
+
+    def __init__(self, schema_name: str, table_name: str):
+        self.schema_name = schema_name
+        self.table_name = table_name
+        self.key_columns: List[str] = []
+        self.masked_columns: List[Tuple[str, str]] = []
+
+    @property
+    def relation(self) -> str:
+        return f"{self.schema_name}.{self.table_name}"
+
+    def projection(self, sample_rows: int) -> str:
+        """One query for every masked column, ordered by the unmasked ones so each role reads the same rows.
+
+        Masking rewrites every reference to a masked column, including ORDER BY,
+        so only unmasked columns give the same order for every role. One row
+        past the sample is read so stable_rows() can tell where ties make the
+        cut ambiguous.
+        """
+        columns = [_quote_identifier(column) for column in
+                   self.key_columns + [column for column, _ in self.masked_columns]]
+        select = ', '.join(f"{column}::VARCHAR" for column in columns)
+        order_by = f"\nORDER BY {', '.join(columns[:len(self.key_columns)])}" if self.key_columns else ''
+        relation = f"{_quote_identifier(self.schema_name)}.{_quote_identifier(self.table_name)}"
+        return f"SELECT {select}\nFROM {relation}{order_by}\nLIMIT {sample_rows + 1}"
+
+    def stable_rows(self, rows: List[Tuple], sample_rows: int) -> Optional[List[Tuple]]:
+        """The projection rows every reader is guaranteed to get, or None if there are none.
+
+        Rows tied on every unmasked column with the first row past the sample
+        may be any of the tied rows, so that group is dropped. A table with
+        no unmasked column is only stable if it fits in the sample.
+        """
+        if len(rows) <= sample_rows:
+            return rows
+        if not self.key_columns:
+            return None
+        width = len(self.key_columns)
+        cut = rows[sample_rows][:width]
+        return [row for row in rows[:sample_rows] if row[:width] != cut] or None
+
+
+class MaskingVerifier:
+    """Checks what each role actually sees in every masked column, as a table × role pass/fail matrix.
+
+    Each (role, table) check is a batch of SET SESSION AUTHORIZATION and one
+    projection of all the table's masked columns, so a table costs one
+    statement per role however many columns it has. All checks are submitted
+    at once through the automator's scheduler and run concurrently. The
+    reference read (unmasked values) runs as db_user, or reference_user when
+    given; either must see raw data. Values are compared as strings.
+    """
+
+    def __init__(self, automator, role_users: Optional[Dict[str, str]] = None, db_user: Optional[str] = None,
+                 reference_user: Optional[str] = None, sample_rows: int = 100, timeout: float = 300):
+        self.automator = automator
+        self.role_users = dict(DEFAULT_ROLE_USERS if role_users is None else role_users)
+        self.db_user = db_user
+        self.reference_user = reference_user
+        self.sample_rows = sample_rows
+        self.timeout = timeout
+
+    def tables_to_check(self, database: str, schema: str = 'public', include_schemas: Optional[List[str]] = None,
+                        exclude_schemas: Optional[List[str]] = None,
+                        tables: Optional[List[str]] = None) -> List[TableCheck]:
+        """Every table with a sensitive column, classified the same way the automator plans policies"""
+        checks = {}
+        rows = self.automator.iter_catalog(database, schema, include_schemas, exclude_schemas, tables)
+        for row, sensitivity_type, _ in self.automator._classify_catalog(database, rows):
+            schema_name, table_name, column_name, data_type = row
+            check = checks.get((schema_name, table_name))
+            if check is None:
+                check = checks[(schema_name, table_name)] = TableCheck(schema_name, table_name)
+            if sensitivity_type:
+                check.masked_columns.append((column_name, sensitivity_type))
+            elif (data_type or '').lower().split('(')[0].strip() not in UNSORTABLE_TYPES:
+                # Only sortable scalar columns can order (and align) the sampled rows
+                check.key_columns.append(column_name)
+        return [check for check in checks.values() if check.masked_columns]
+
+    def _submit(self, database: str, sql: str, user: Optional[str]) -> Future:
+        if user is None:
+            return self.automator.submit_statement(database, sql, db_user=self.db_user, timeout=self.timeout)
+        return self.automator.submit_statement(database, [f"SET SESSION AUTHORIZATION {user}", sql],
+                                               db_user=self.db_user, timeout=self.timeout)
+
+    def _rows(self, future: Future, batched: bool) -> List[Tuple]:
+        response = future.result()
+        # In a batch the projection is sub-statement 2, after SET SESSION AUTHORIZATION
+        statement_id = f"{response['Id']}:2" if batched else response['Id']
+        return list(self.automator._iter_statement_rows(statement_id))
+
+    def verify(self, database: str, schema: str = 'public', include_schemas: Optional[List[str]] = None,
+               exclude_schemas: Optional[List[str]] = None, tables: Optional[List[str]] = None) -> Dict:
+        """Run every (role, table) check; returns the matrix, failure details and a summary"""
+        metrics = self.automator.metrics
+        with metrics.stage('verify'):
+            checks = self.tables_to_check(database, schema, include_schemas, exclude_schemas, tables)
+            submitted = []
+            for check in checks:
+                sql = check.projection(self.sample_rows)
+                reference = self._submit(database, sql, self.reference_user)
+                by_role = {role: self._submit(database, sql, user) for role, user in self.role_users.items()}
+                submitted.append((check, reference, by_role))
+
+            # Result pages are fetched in parallel too; the scheduler only waits on the statements
+            with ThreadPoolExecutor(max_workers=max(1, self.automator.max_concurrency)) as pool:
+                outcomes = list(pool.map(lambda item: self._check_table(*item), submitted))
+
+        matrix = {}
+        failures = []
+        summary = Counter()
+        for check, cells in outcomes:
+            matrix[check.relation] = {}
+            for role, cell in cells.items():
+                matrix[check.relation][role] = cell['status']
+                summary[cell['status']] += 1
+                if cell['status'] != 'pass':
+                    failures.append(dict(cell, table=check.relation, role=role))
+        metrics.count('verify_checks', sum(summary.values()))
+        metrics.count('verify_failures', summary['fail'] + summary['error'])
+        return {
+            'roles': list(self.role_users),
+            'matrix': matrix,
+            'failures': failures,
+            'summary': dict(summary, tables=len(matrix))
+        }
+
+    def _check_table(self, check: TableCheck, reference: Future,
+                     by_role: Dict[str, Future]) -> Tuple[TableCheck, Dict[str, Dict]]:
+        try:
+            raw_rows = check.stable_rows(self._rows(reference, self.reference_user is not None), self.sample_rows)
+        except Exception as e:
+            return check, {role: {'status': 'error', 'error': f"Reference read failed: {e}"} for role in by_role}
+        if raw_rows is None:
+            # Unordered or all-tied samples of a larger table need not hold the same rows
+            cell = {'status': 'skipped', 'error': 'Unmasked columns do not pick a stable sample of sample_rows rows'}
+            return check, {role: dict(cell) for role in by_role}
+
+        cells = {}
+        for role, future in by_role.items():
+            try:
+                masked_rows = check.stable_rows(self._rows(future, True), self.sample_rows) or []
+                cells[role] = self._compare(check, role, raw_rows, masked_rows)
+            except Exception as e:
+                cells[role] = {'status': 'error', 'error': str(e)}
+        return check, cells
+
+    @staticmethod
+    def _compare(check: TableCheck, role: str, raw_rows: List[Tuple], masked_rows: List[Tuple]) -> Dict:
+        """Per masked column, the multiset of (key, value) pairs the role saw against the reference masks"""
+        key_width = len(check.key_columns)
+        failed_columns = {}
+        for offset, (column, sensitivity_type) in enumerate(check.masked_columns, start=key_width):
+            mask = REFERENCE_MASKS.get(role, {}).get(sensitivity_type)
+            if mask is None:
+                failed_columns[column] = {'error': f"No reference mask for {role}/{sensitivity_type}"}
+                continue
+            expected = Counter((row[:key_width], mask(row[offset])) for row in raw_rows)
+            actual = Counter((row[:key_width], row[offset]) for row in masked_rows)
+            if expected != actual:
+                missing = expected - actual
+                unexpected = actual - expected
+                failed_columns[column] = {
+                    'type': sensitivity_type,
+                    'expected': next(iter(missing))[1] if missing else None,
+                    'actual': next(iter(unexpected))[1] if unexpected else None
+                }
+        return {
+            'status': 'fail' if failed_columns else 'pass',
+            'columns': len(check.masked_columns),
+            'rows': len(masked_rows),
+            'failed_columns': failed_columns
+        }
+
+
+def format_matrix(report: Dict) -> str:
+    """The verify() matrix as a fixed-width text table"""
+    roles = report['roles']
+    width = max([len('table')] + [len(table) for table in report['matrix']])
+    lines = ['  '.join(['table'.ljust(width)] + [role.ljust(12) for role in roles]).rstrip()]
+    for table, cells in report['matrix'].items():
+        lines.append('  '.join([table.ljust(width)] + [cells.get(role, '-').ljust(12) for role in roles]).rstrip())
+    return '\n'.join(lines)
@@ -0,0 +1,173 @@
+"""Compile a masking plan offline from a catalog dump.
+
+Reads (schema, table, column, data_type) rows from CSV, JSON (array or
+JSON lines) or Parquet and streams the plan to SQL or JSON lines, so plans
+can be reviewed in CI or precomputed without a cluster session.
+
+Usage:
+    python plan_compiler.py catalog.csv -o plan.sql
+    python plan_compiler.py catalog.jsonl --output-format jsonl --share-policies
+"""
+import argparse
+import csv
+import json
+import sys
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+from plan_sinks import format_step
+from redshift_masking_automation import RedshiftMaskingAutomator
+
+CatalogRow = Tuple[str, str, str, str]
+
+# Accepted column headings / JSON keys for each catalog field
+FIELD_ALIASES = {
+    'schema': ('schema', 'table_schema', 'schema_name'),
+    'table': ('table', 'table_name'),
+    'column': ('column', 'column_name'),
+    'data_type': ('data_type', 'type', 'column_type')
+}
+
+
+def _row_from_mapping(record: Dict) -> CatalogRow:
+    values = []
+    for field, aliases in FIELD_ALIASES.items():
+        value = next((record[alias] for alias in aliases if record.get(alias) is not None), None)
+        if value is None and field == 'schema':
+            value = 'public'
+        elif value is None and field != 'data_type':
+            raise ValueError(f"Catalog row is missing '{field}': {record}")
+        values.append(value)
+    return tuple(values)
+
+
+def _field_indexes(header: List[str]) -> List[Optional[int]]:
+    """Position of each catalog field in a CSV header, resolved once per file"""
+    positions = {name.strip().lower(): index for index, name in enumerate(header)}
+    indexes = []
+    for field, aliases in FIELD_ALIASES.items():
+        index = next((positions[alias] for alias in aliases if alias in positions), None)
+        if index is None and field in ('table', 'column'):
+            raise ValueError(f"Catalog header is missing '{field}': {header}")
+        indexes.append(index)
+    return indexes
+
+
+def _iter_csv_rows(f: TextIO) -> Iterator[CatalogRow]:
+    reader = csv.reader(f)
+    header = next(reader, None)
+    if header is None:
+        return
+    schema_index, table_index, column_index, type_index = _field_indexes(header)
+    for record in reader:
+        if not record:
+            continue
+        yield (record[schema_index] or 'public' if schema_index is not None else 'public',
+               record[table_index], record[column_index],
+               record[type_index] or None if type_index is not None else None)
+
+
+def read_catalog(path: str, input_format: Optional[str] = None) -> Iterator[CatalogRow]:
+    """Stream catalog rows from a CSV, JSON/JSON-lines or Parquet file"""
+    input_format = input_format or path.rsplit('.', 1)[-1].lower()
+    if input_format == 'csv':
+        with open(path, newline='') as f:
+            yield from _iter_csv_rows(f)
+    elif input_format in ('json', 'jsonl', 'ndjson'):
+        with open(path) as f:
+            for record in _iter_json_records(f):
+                yield _row_from_mapping(record)
+    elif input_format == 'parquet':
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise Exception("Reading Parquet catalogs requires pyarrow (pip install pyarrow)")
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=65536):
+            for record in batch.to_pylist():
+                yield _row_from_mapping(record)
+    else:
+        raise ValueError(f"Unsupported catalog format: {input_format}")
+
+
+def _iter_json_records(f: TextIO, chunk_size: int = 1 << 20) -> Iterator[Dict]:
+    """Decode a top-level JSON array or JSON lines incrementally"""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    in_array = None
+    eof = False
+    while True:
+        buffer = buffer.lstrip()
+        if in_array is None and buffer:
+            in_array = buffer[0] == '['
+            if in_array:
+                buffer = buffer[1:]
+            continue
+        if in_array and buffer[:1] in (',', ']'):
+            buffer = buffer[1:]
+            continue
+        if buffer:
+            try:
+                record, end = decoder.raw_decode(buffer)
+            except ValueError:
+                if eof:
+                    raise
+            else:
+                # A value that runs to the end of the buffer may still be incomplete
+                if end < len(buffer) or eof:
+                    yield record
+                    buffer = buffer[end:]
+                    continue
+        if eof:
+            return
+        chunk = f.read(chunk_size)
+        eof = not chunk
+        buffer += chunk
+
+
+def compile_plan(rows: Iterable[CatalogRow], share_policies: bool = False,
+                 rules_path: Optional[str] = None) -> Iterator:
+    """Lazily yield PlanSteps for catalog rows; no cluster connection is made"""
+    automator = RedshiftMaskingAutomator('offline', rules_path=rules_path, share_policies=share_policies)
+    return automator.iter_plan_steps(rows)
+
+
+def compile_catalog_file(input_path: str, output: TextIO, input_format: Optional[str] = None,
+                         output_format: str = 'sql', share_policies: bool = False,
+                         rules_path: Optional[str] = None) -> Dict[str, int]:
+    """Compile a catalog dump into output, one statement at a time; returns step counts"""
+    counts = {'columns_read': 0, 'create': 0, 'attach': 0}
+
+    def counted_rows():
+        for row in read_catalog(input_path, input_format):
+            counts['columns_read'] += 1
+            yield row
+
+    for step in compile_plan(counted_rows(), share_policies, rules_path):
+        counts[step.action] += 1
+        output.write(format_step(step, output_format))
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compile a Redshift masking plan from a catalog dump')
+    parser.add_argument('catalog', help='catalog file with schema/table/column/data_type rows')
+    parser.add_argument('-o', '--output', help='output file (default: stdout)')
+    parser.add_argument('--input-format', choices=['csv', 'json', 'jsonl', 'parquet'],
+                        help='defaults to the file extension')
+    parser.add_argument('--output-format', choices=['sql', 'jsonl'], default='sql')
+    parser.add_argument('--share-policies', action='store_true',
+                        help='one policy per (type, role) for string columns instead of one per column')
+    parser.add_argument('--rules', help='classification rules JSON (default: classification_rules.json)')
+    args = parser.parse_args(argv)
+
+    output = open(args.output, 'w') if args.output else sys.stdout
+    try:
+        counts = compile_catalog_file(args.catalog, output, args.input_format, args.output_format,
+                                      args.share_policies, args.rules)
+    finally:
+        if args.output:
+            output.close()
+    print(json.dumps(counts), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
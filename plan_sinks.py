@@ -0,0 +1,360 @@
+import io
+import json
+import os
+import time
+from concurrent.futures import Future, wait as wait_futures
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from execution_journal import PlanCheckpoint
+from masking_plan import MAX_BATCH_SIZE, BatchPacker, PlanStep
+from statement_scheduler import DependencyFailed, SendDeadlinePassed
+from throttled_client import is_throttling_error
+
+# Statements per output chunk
+DEFAULT_CHUNK_SIZE = 1000
+
+
+def format_step(step: PlanStep, output_format: str = 'sql') -> str:
+    """One plan step as SQL text or a JSON line"""
+    if output_format == 'jsonl':
+        return json.dumps(step.to_dict()) + '\n'
+    return step.sql + '\n\n'
+
+
+def write_plan(steps: Iterable[PlanStep], sinks: List['PlanSink']) -> Dict[str, Dict]:
+    """Send every step to each sink, then close them; returns each sink's manifest by name"""
+    for step in steps:
+        for sink in sinks:
+            sink.write(step)
+    return {sink.name: sink.close() for sink in sinks}
+
+
+class PlanSink:
+    """Receives plan steps one at a time; close() returns a small manifest of what was written"""
+
+    name = 'sink'
+
+    def write(self, step: PlanStep):
+        raise NotImplementedError
+
+    def close(self) -> Dict:
+        raise NotImplementedError
+
+
+class ChunkedFileSink(PlanSink):
+    """Writes the plan to numbered files of chunk_size statements plus a manifest.json"""
+
+    name = 'files'
+
+    def __init__(self, directory: str, chunk_size: int = DEFAULT_CHUNK_SIZE, output_format: str = 'sql',
+                 prefix: str = 'plan'):
+        self.directory = directory
+        self.chunk_size = chunk_size
+        self.output_format = output_format
+        self.prefix = prefix
+        self.statements = 0
+        self.chunks: List[Dict] = []
+        self._file = None
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, step: PlanStep):
+        if self._file is None:
+            extension = 'jsonl' if self.output_format == 'jsonl' else 'sql'
+            path = os.path.join(self.directory, f'{self.prefix}-{len(self.chunks):05d}.{extension}')
+            self._file = open(path, 'w')
+            self.chunks.append({'location': path, 'statements': 0})
+        self._file.write(format_step(step, self.output_format))
+        self.chunks[-1]['statements'] += 1
+        self.statements += 1
+        if self.chunks[-1]['statements'] >= self.chunk_size:
+            self._close_chunk()
+
+    def _close_chunk(self):
+        if self._file is not None:
+            self.chunks[-1]['bytes'] = self._file.tell()
+            self._file.close()
+            self._file = None
+
+    def close(self) -> Dict:
+        self._close_chunk()
+        manifest_path = os.path.join(self.directory, f'{self.prefix}-manifest.json')
+        with open(manifest_path, 'w') as f:
+            json.dump({'format': self.output_format, 'statements': self.statements, 'chunks': self.chunks}, f)
+        return {'manifest': manifest_path, 'statements': self.statements, 'chunks': len(self.chunks)}
+
+
+class ObjectStore:
+    """Minimal put-only object store used for plan chunks"""
+
+    def put(self, key: str, body: bytes) -> str:
+        """Store body under key; returns its location"""
+        raise NotImplementedError
+
+
+class LocalObjectStore(ObjectStore):
+    """Objects as files under a local directory; stands in for S3 in tests and offline runs"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def put(self, key: str, body: bytes) -> str:
+        path = os.path.join(self.directory, *key.split('/'))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + '.tmp', 'wb') as f:
+            f.write(body)
+        os.replace(path + '.tmp', path)
+        return path
+
+
+class S3ObjectStore(ObjectStore):
+    """Objects in an S3 bucket; boto3 is imported on first use"""
+
+    def __init__(self, bucket: str, client=None):
+        self.bucket = bucket
+        self._client = client
+
+    def put(self, key: str, body: bytes) -> str:
+        if self._client is None:
+            import boto3
+            self._client = boto3.client('s3')
+        self._client.put_object(Bucket=self.bucket, Key=key, Body=body)
+        return f's3://{self.bucket}/{key}'
+
+
+def open_object_store(location: str) -> Tuple[ObjectStore, str]:
+    """(store, key prefix) for 's3://bucket/prefix' or a local directory"""
+    if location.startswith('s3://'):
+        bucket, _, prefix = location[len('s3://'):].partition('/')
+        return S3ObjectStore(bucket), prefix.strip('/')
+    return LocalObjectStore(location), ''
+
+
+def output_sink(location: str, *path: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> 'ObjectStoreSink':
+    """ObjectStoreSink writing under location (a local directory or s3://bucket/prefix) and path"""
+    store, prefix = open_object_store(location)
+    return ObjectStoreSink(store, '/'.join(part for part in (prefix,) + path if part), chunk_size)
+
+
+def result_summary(result: Dict) -> Dict:
+    """apply_automated_masking() result with counts and manifests in place of column lists and SQL"""
+    summary = {key: result[key] for key in ('message', 'plan_summary', 'catalog_delta') if key in result}
+    sensitive_columns = result.get('sensitive_columns') or {}
+    summary['sensitive_tables'] = len(sensitive_columns)
+    summary['sensitive_column_count'] = sum(len(columns) for columns in sensitive_columns.values())
+    summary['manifest'] = result.get('outputs', {})
+    return summary
+
+
+class ObjectStoreSink(PlanSink):
+    """Buffers one chunk of statements at a time and puts it as an object, then a manifest object"""
+
+    name = 'object_store'
+
+    def __init__(self, store: ObjectStore, prefix: str = '', chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 output_format: str = 'sql'):
+        self.store = store
+        self.prefix = prefix.strip('/')
+        self.chunk_size = chunk_size
+        self.output_format = output_format
+        self.statements = 0
+        self.chunks: List[Dict] = []
+        self._buffer = io.StringIO()
+        self._buffered = 0
+
+    def _key(self, name: str) -> str:
+        return f'{self.prefix}/{name}' if self.prefix else name
+
+    def write(self, step: PlanStep):
+        self._buffer.write(format_step(step, self.output_format))
+        self._buffered += 1
+        self.statements += 1
+        if self._buffered >= self.chunk_size:
+            self._put_chunk()
+
+    def _put_chunk(self):
+        if not self._buffered:
+            return
+        extension = 'jsonl' if self.output_format == 'jsonl' else 'sql'
+        body = self._buffer.getvalue().encode('utf-8')
+        location = self.store.put(self._key(f'plan-{len(self.chunks):05d}.{extension}'), body)
+        self.chunks.append({'location': location, 'statements': self._buffered, 'bytes': len(body)})
+        self._buffer = io.StringIO()
+        self._buffered = 0
+
+    def close(self) -> Dict:
+        self._put_chunk()
+        manifest = json.dumps({'format': self.output_format, 'statements': self.statements, 'chunks': self.chunks})
+        location = self.store.put(self._key('manifest.json'), manifest.encode('utf-8'))
+        return {'manifest': location, 'statements': self.statements, 'chunks': len(self.chunks)}
+
+
+def _completed_future() -> Future:
+    future = Future()
+    future.set_result(None)
+    return future
+
+
+def _cancelled_future() -> Future:
+    future = Future()
+    future.cancel()
+    return future
+
+
+def _checkpoint_callback(checkpoint: PlanCheckpoint, start: int, end: int):
+    """Journal [start, end) once its batch has committed"""
+    def record(future: Future):
+        if not future.cancelled() and future.exception() is None:
+            checkpoint.record(start, end)
+    return record
+
+
+class ExecutorSink(PlanSink):
+    """Sends steps to the cluster in transactional batches while the plan is still being produced.
+
+    Independent batches run concurrently; a batch that touches a policy or
+    table used by an earlier batch waits for that batch to finish first.
+    With a checkpoint, batches it already records are skipped and each
+    finished batch is recorded. Batches not sent by deadline (a time.time()
+    value) are dropped, close() waits no longer than the deadline, and
+    every batch unsent or unfinished by then is reported as deferred, with
+    the plan 'incomplete'.
+    Statements are kept only until their batch succeeds, for the report.
+    """
+
+    name = 'execute'
+
+    def __init__(self, automator, database: str, batch_size: int = MAX_BATCH_SIZE, db_user: Optional[str] = None,
+                 checkpoint: Optional[PlanCheckpoint] = None, deadline: Optional[float] = None):
+        self.automator = automator
+        self.database = database
+        self.db_user = db_user
+        self.checkpoint = checkpoint
+        self.deadline = deadline
+        self._packer = BatchPacker(batch_size)
+        self._batches: List[Tuple[int, Future]] = []
+        self._pending: Dict[int, List[str]] = {}
+        self._skipped: Set[int] = set()
+        self._offset = 0
+
+    def write(self, step: PlanStep):
+        self.write_sql(step.sql)
+
+    def write_sql(self, sql: str):
+        for batch, depends_on in self._packer.add(sql):
+            self._submit(batch, depends_on)
+
+    def _submit(self, batch: List[str], depends_on: Set[int]):
+        batch_index = len(self._batches)
+        start, self._offset = self._offset, self._offset + len(batch)
+        if self.checkpoint is not None and self.checkpoint.is_done(start, self._offset):
+            self._batches.append((len(batch), _completed_future()))
+            self._skipped.add(batch_index)
+            return
+        self._pending[batch_index] = batch
+        if self.deadline is not None and time.time() >= self.deadline:
+            self._batches.append((len(batch), _cancelled_future()))
+            return
+        # A batch runs as one transaction, so allow each statement the usual wait, but not past the deadline
+        timeout = 30 * len(batch)
+        if self.deadline is not None:
+            timeout = min(timeout, max(1.0, self.deadline - time.time()))
+        future = self.automator.submit_statement(
+            self.database, batch,
+            depends_on=[self._batches[i][1] for i in depends_on],
+            db_user=self.db_user,
+            timeout=timeout,
+            send_by=self.deadline
+        )
+        future.add_done_callback(self._release_callback(batch_index))
+        if self.checkpoint is not None:
+            future.add_done_callback(_checkpoint_callback(self.checkpoint, start, self._offset))
+        self._batches.append((len(batch), future))
+
+    def _release_callback(self, batch_index: int):
+        def release(future: Future):
+            if not future.cancelled() and future.exception() is None:
+                self._pending.pop(batch_index, None)
+        return release
+
+    def close(self) -> Dict:
+        for batch, depends_on in self._packer.flush():
+            self._submit(batch, depends_on)
+        futures = [future for _, future in self._batches]
+
+        if self.deadline is not None:
+            _, not_done = wait_futures(futures, timeout=max(0.0, self.deadline - time.time()))
+            if not_done:
+                # The scheduler drops batches still unsent at the deadline; batches already sent finish
+                # on the cluster, but are not waited for past the deadline
+                print(f"Deadline reached with {len(not_done)} batches outstanding; deferring them")
+                for future in not_done:
+                    future.cancel()
+
+        total = len(self._batches)
+        executed_commands = 0
+        failed_batches = []
+        deferred_batches = []
+        remaining_sql = []
+        error = None
+        retryable = True
+        for batch_index, (size, future) in enumerate(self._batches):
+            if batch_index in self._skipped:
+                continue
+            # Without a deadline, result() below waits for the batch (up to its statement timeout)
+            unfinished = self.deadline is not None and not future.done()
+            if unfinished or future.cancelled() or isinstance(future.exception(), SendDeadlinePassed):
+                deferred_batches.append(batch_index)
+                remaining_sql.extend(self._pending[batch_index])
+                continue
+            try:
+                future.result()
+                executed_commands += size
+                print(f"Executed batch {batch_index + 1}/{total} ({size} statements)")
+            except Exception as e:
+                print(f"Error executing batch {batch_index + 1}/{total}: {e}")
+                failed_batches.append(batch_index)
+                remaining_sql.extend(self._pending[batch_index])
+                error = error or str(e)
+                retryable = retryable and (is_throttling_error(e) or isinstance(e, DependencyFailed))
+        skipped_commands = sum(self._batches[i][0] for i in self._skipped)
+        if len(self._skipped) < total:
+            self.automator.invalidate_policy_state(self.database)
+
+        metrics = self.automator.metrics
+        metrics.count('statements_executed', executed_commands)
+        metrics.count('batches_total', total)
+        metrics.count('batches_failed', len(failed_batches))
+        metrics.count('batches_deferred', len(deferred_batches))
+
+        if failed_batches:
+            return {
+                'status': 'failed',
+                'error': error,
+                # Only throttling (and batches that depended on a throttled one): the same plan can be resumed
+                'retryable': retryable,
+                'executed_commands': executed_commands,
+                'skipped_commands': skipped_commands,
+                'total_batches': total,
+                'failed_batch': failed_batches[0],
+                'failed_batches': failed_batches,
+                'deferred_batches': deferred_batches,
+                'failed_commands': self._pending[failed_batches[0]],
+                'remaining_sql': remaining_sql
+            }
+
+        if deferred_batches:
+            return {
+                'status': 'incomplete',
+                'executed_commands': executed_commands,
+                'skipped_commands': skipped_commands,
+                'total_batches': total,
+                'deferred_batches': deferred_batches,
+                'remaining_sql': remaining_sql
+            }
+
+        return {
+            'status': 'succeeded',
+            'executed_commands': executed_commands,
+            'skipped_commands': skipped_commands,
+            'total_batches': total
+        }
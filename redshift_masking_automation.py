@@ -1,21 +1,142 @@
-import boto3
+import csv
+import hashlib
+import io
 import json
-import re
-from typing import Dict, List
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from catalog_cache import CatalogCache
+from catalog_snapshot import (
+    POLICY_APPLIED, POLICY_NONE, POLICY_PENDING, CatalogDelta, SnapshotStore, column_key, diff_catalog
+)
+from column_classifier import ColumnClassifier
+from execution_journal import PlanCheckpoint
+from masking_plan import (
+    MAX_BATCH_SIZE, AttachmentKey, MaskingPlan, PlanStep, PlanStream, parse_input_columns,
+    parse_policy_expression
+)
+from plan_sinks import ExecutorSink, PlanSink, write_plan
+from run_metrics import InstrumentedClient, RunMetrics
+from statement_scheduler import StatementScheduler
+from throttled_client import ThrottleController, ThrottledClient, cluster_controller, is_throttling_error
+from value_sampler import DETECTABLE_TYPES, SamplingBudget, ValueSampler
+
+# Input argument name used by shared policies
+SHARED_POLICY_INPUT = 'masked_value'
+
+# Column data types that share one VARCHAR(256) policy input; the masking expressions are string-only,
+# so other types keep per-column policies even when share_policies is on
+STRING_TYPES = ('character varying', 'varchar', 'character', 'char', 'bpchar', 'text', 'nvarchar', 'nchar')
+
+# Native SQL for the plpythonu masking UDFs in notebook_setup.sql: the same output for every
+# non-NULL input, without starting a Python interpreter per row (NULL stays NULL)
+NATIVE_MASKING_EXPRESSIONS = {
+    'REDACT_SSN({column})': (
+        "CASE WHEN {column} IS NULL THEN NULL "
+        "WHEN LEN(REGEXP_REPLACE({column}, '[^0-9]', '')) = 9 "
+        "THEN 'xxx-xx-' || RIGHT(REGEXP_REPLACE({column}, '[^0-9]', ''), 4) "
+        "ELSE 'invalid ssn' END"
+    )
+}
+
+# catalog_cache key for the SVV_MASKING_POLICY / SVV_ATTACHED_MASKING_POLICY read
+POLICY_STATE_KEY = 'policy_state'
+
+# Policies the automator creates (per-column and shared); cleanup never touches other policies
+MANAGED_POLICY_PREFIX = 'mask_'
+
+# Redshift identifiers (including masking policy names) are at most 127 bytes
+MAX_IDENTIFIER_LENGTH = 127
+
+# Policies cleaned up per cleanup_policies() run unless max_policies says otherwise
+DEFAULT_CLEANUP_LIMIT = 1000
+
+# schema='*' scans every schema except these
+ALL_SCHEMAS = '*'
+SYSTEM_SCHEMAS = ('information_schema', 'pg_catalog', 'pg_internal', 'pg_automv', 'pg_auto_copy', 'pg_mv', 'pg_s3')
+
+
+# boto3 clients are thread-safe and slow to build, so automators share one per region
+_CLIENTS: Dict[str, object] = {}
+_CLIENTS_LOCK = threading.Lock()
+
+# HTTP connections per shared client; every automator in the region (e.g. a fleet run) polls through it
+CLIENT_POOL_CONNECTIONS = 50
+
+
+def shared_client(region: str):
+    """The process-wide redshift-data client for region; boto3 is imported on first use"""
+    with _CLIENTS_LOCK:
+        client = _CLIENTS.get(region)
+        if client is None:
+            import boto3
+            from botocore.config import Config
+            client = _CLIENTS[region] = boto3.client(
+                'redshift-data', region_name=region, config=Config(max_pool_connections=CLIENT_POOL_CONNECTIONS)
+            )
+        return client
+
+
+def clear_shared_clients():
+    with _CLIENTS_LOCK:
+        _CLIENTS.clear()
+
+
+def _sql_literal(value: str) -> str:
+    return value.replace("'", "''")
+
+
+def _glob_to_like(pattern: str) -> str:
+    """Translate a shell-style glob (* and ?) into a LIKE pattern"""
+    escaped = _sql_literal(pattern).replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return escaped.replace('*', '%').replace('?', '_')
+
 
 class RedshiftMaskingAutomator:
-    def __init__(self, cluster_identifier: str, region: str = 'us-east-1'):
+    def __init__(self, cluster_identifier: Optional[str], region: str = 'us-east-1', max_concurrency: int = 8,
+                 snapshot_store: Optional[SnapshotStore] = None, rules_path: Optional[str] = None,
+                 share_policies: bool = False, sampling_budget: Optional[SamplingBudget] = None,
+                 catalog_cache: Optional[CatalogCache] = None, metrics: Optional[RunMetrics] = None,
+                 throttle: Optional[ThrottleController] = None, native_sql: bool = True,
+                 workgroup_name: Optional[str] = None, secret_arn: Optional[str] = None):
+        if bool(cluster_identifier) == bool(workgroup_name):
+            raise ValueError('Pass exactly one of cluster_identifier or workgroup_name')
         self.cluster_identifier = cluster_identifier
-        self.redshift_data = boto3.client('redshift-data', region_name=region)
-        
-        self.sensitive_patterns = {
-            'email': r'.*email.*|.*mail.*',
-            'phone': r'.*phone.*|.*mobile.*|.*tel.*',
-            'ssn': r'.*ssn.*|.*social.*security.*',
-            'credit_card': r'.*card.*|.*cc.*|.*credit.*',
-            'name': r'.*name.*|.*first.*|.*last.*',
-            'address': r'.*address.*|.*addr.*|.*street.*'
-        }
+        # Redshift Serverless: the Data API addresses a workgroup instead of a cluster
+        self.workgroup_name = workgroup_name
+        self.secret_arn = secret_arn
+        # Key for caches, snapshots and throttle controllers; workgroups can't collide with cluster names
+        self.target_name = cluster_identifier or f"workgroup:{workgroup_name}"
+        self.region = region
+        self._redshift_data = None
+        self._client_wrapper = None
+        
+        # Stage timings and Data API call counts; callers reset() it per run
+        dimensions = {'Cluster': cluster_identifier} if cluster_identifier else {'Workgroup': workgroup_name}
+        self.metrics = metrics or RunMetrics(dimensions=dimensions)
+        self.max_concurrency = max_concurrency
+        self._scheduler = None
+        
+        # Rate limits and adaptive concurrency cap, shared with other automators on this cluster
+        self.throttle = throttle or cluster_controller(self.target_name, max_concurrency)
+        
+        # One policy per (sensitivity type, role, input type) instead of one per column
+        self.share_policies = share_policies
+        
+        # Optional value sampling for columns whose names say little (c17, payload)
+        self.value_sampler = ValueSampler(self, sampling_budget) if sampling_budget else None
+        
+        # Optional catalog snapshot for incremental scans
+        self.snapshot_store = snapshot_store
+        self.last_catalog_delta = None
+        
+        # Optional in-process cache of catalog rows and policy state (warm Lambda containers)
+        self.catalog_cache = catalog_cache
+        
+        # Sensitivity rules come from classification_rules.json (or rules_path / CLASSIFICATION_RULES)
+        self.classifier = ColumnClassifier.shared(rules_path)
         
         # Role-based masking policies
         self.masking_policies = {
@@ -44,101 +165,648 @@ class RedshiftMaskingAutomator:
                 'address': "{column}"
             }
         }
+        
+        # Swap Python UDF calls for their native SQL equivalents (native_sql=False keeps REDACT_SSN)
+        if native_sql:
+            for expressions in self.masking_policies.values():
+                for sensitivity_type, expression in expressions.items():
+                    expressions[sensitivity_type] = NATIVE_MASKING_EXPRESSIONS.get(expression, expression)
 
-    def scan_new_columns(self, database: str, schema: str = 'public') -> Dict[str, List[str]]:
-        """Scan for new columns and identify sensitive ones"""
-        query = f"""
-        SELECT table_name, column_name
+    def iter_catalog(self, database: str, schema: str = 'public', include_schemas: Optional[List[str]] = None,
+                     exclude_schemas: Optional[List[str]] = None,
+                     tables: Optional[List[str]] = None) -> Iterator[Tuple[str, str, str, str]]:
+        """Stream (schema, table, column, data_type) rows, following result pagination.
+
+        schema='*' reads every user schema in one SVV_ALL_COLUMNS query,
+        optionally narrowed by include/exclude glob patterns (e.g. 'stage_*').
+        tables ('orders' or 'sales.orders') reads only those relations, which
+        keeps a table-scoped event independent of warehouse size.
+        """
+        if tables:
+            # Narrow reads follow fresh DDL, so they bypass the catalog cache
+            query = f"""
+        SELECT table_schema, table_name, column_name, data_type
+        FROM information_schema.columns
+        WHERE {self._table_filter(self._table_refs(schema, tables), 'table_schema', 'table_name')}
+        """
+            return self._iter_query_rows(database, query)
+        if schema == ALL_SCHEMAS:
+            filters = [f"database_name = '{_sql_literal(database)}'"]
+            filters.append("schema_name NOT IN ({})".format(', '.join(f"'{s}'" for s in SYSTEM_SCHEMAS)))
+            filters.append("schema_name NOT LIKE 'pg\\_temp\\_%'")
+            if include_schemas:
+                filters.append('(' + ' OR '.join(
+                    f"schema_name LIKE '{_glob_to_like(pattern)}'" for pattern in include_schemas) + ')')
+            for pattern in exclude_schemas or []:
+                filters.append(f"schema_name NOT LIKE '{_glob_to_like(pattern)}'")
+            query = f"""
+        SELECT schema_name, table_name, column_name, data_type
+        FROM svv_all_columns
+        WHERE {' AND '.join(filters)}
+        """
+        else:
+            query = f"""
+        SELECT table_schema, table_name, column_name, data_type
         FROM information_schema.columns 
-        WHERE table_schema = '{schema}'
+        WHERE table_schema = '{_sql_literal(schema)}'
         """
+        if self.catalog_cache is None:
+            return self._iter_query_rows(database, query)
         
-        response = self.redshift_data.execute_statement(
-            ClusterIdentifier=self.cluster_identifier,
-            Database=database,
-            Sql=query
+        key = ('catalog', schema, tuple(include_schemas or ()), tuple(exclude_schemas or ()))
+        rows = self.catalog_cache.get(self.target_name, database, key)
+        if rows is None:
+            return self._cache_rows(database, key, self._iter_query_rows(database, query))
+        return iter(rows)
+
+    def _cache_rows(self, database: str, key: Tuple, rows: Iterator[Tuple]) -> Iterator[Tuple]:
+        """Pass rows through, caching them once fully read unless there are more than the cache holds"""
+        kept = []
+        for row in rows:
+            if kept is not None:
+                kept.append(row)
+                if not self.catalog_cache.fits(len(kept)):
+                    # Too large to keep: stream the rest without holding the catalog
+                    kept = None
+            yield row
+        if kept is not None:
+            self.catalog_cache.put(self.target_name, database, key, kept, rows=len(kept))
+
+    def scan_new_columns(self, database: str, schema: str = 'public', include_schemas: Optional[List[str]] = None,
+                         exclude_schemas: Optional[List[str]] = None,
+                         tables: Optional[List[str]] = None) -> Dict[str, List[str]]:
+        """Scan for new columns and identify sensitive ones"""
+        rows = self.iter_catalog(database, schema, include_schemas, exclude_schemas, tables)
+        sensitive_columns = {}
+        for row, sensitivity_type, sample in self._classify_catalog(database, rows):
+            schema_name, table_name, column_name, data_type = row
+            if sensitivity_type:
+                table_key = self._table_key(schema, schema_name, table_name)
+                if table_key not in sensitive_columns:
+                    sensitive_columns[table_key] = []
+                col_info = {
+                    'column': column_name,
+                    'type': sensitivity_type,
+                    'data_type': data_type
+                }
+                if sample:
+                    col_info['confidence'] = sample['confidence']
+                sensitive_columns[table_key].append(col_info)
+        
+        return sensitive_columns
+
+    def scan_database(self, database: str, include_schemas: Optional[List[str]] = None,
+                      exclude_schemas: Optional[List[str]] = None) -> Dict[str, List[str]]:
+        """Scan every user schema at once; tables are keyed as schema.table"""
+        return self.scan_new_columns(database, ALL_SCHEMAS, include_schemas, exclude_schemas)
+
+    def scan_catalog_delta(self, database: str, schema: str = 'public', include_schemas: Optional[List[str]] = None,
+                           exclude_schemas: Optional[List[str]] = None,
+                           tables: Optional[List[str]] = None) -> CatalogDelta:
+        """Diff the live catalog against the stored snapshot and persist the new one.
+
+        Newly detected sensitive columns are recorded as pending until
+        mark_applied() confirms their policies were executed.
+        """
+        key = self._snapshot_key(database, schema)
+        previous = self.snapshot_store.load(key)
+        if tables:
+            # Only the scanned tables can be compared; the rest of the snapshot is left alone
+            refs = set(self._table_refs(schema, tables))
+            previous = {k: v for k, v in previous.items() if (v['schema'], v['table']) in refs}
+        current = {}
+        rows = self.iter_catalog(database, schema, include_schemas, exclude_schemas, tables)
+        for row, sensitivity_type, _ in self._classify_catalog(database, rows, previous):
+            schema_name, table_name, column_name, data_type = row
+            entry = {
+                'schema': schema_name,
+                'table': table_name,
+                'column': column_name,
+                'data_type': data_type,
+                'type': sensitivity_type,
+                'policy_state': POLICY_PENDING if sensitivity_type else POLICY_NONE
+            }
+            before = previous.get(column_key(schema_name, table_name, column_name))
+            if before and before['data_type'] == data_type and before['type'] == sensitivity_type:
+                entry['policy_state'] = before['policy_state']
+            current[column_key(schema_name, table_name, column_name)] = entry
+        
+        delta = diff_catalog(previous, current)
+        self.snapshot_store.update(
+            key,
+            changed=delta.added + delta.retyped,
+            removed=[column_key(e['schema'], e['table'], e['column']) for e in delta.removed]
+        )
+        self.last_catalog_delta = delta
+        return delta
+
+    def mark_applied(self, database: str, schema: str, sensitive_columns: Dict[str, List[Dict]]):
+        """Record in the snapshot that policies for these columns were executed"""
+        if self.snapshot_store is None:
+            return
+        key = self._snapshot_key(database, schema)
+        snapshot = self.snapshot_store.load(key)
+        changed = []
+        for table_key, columns in sensitive_columns.items():
+            schema_name, table_name = self._split_table_key(schema, table_key)
+            for col_info in columns:
+                entry = snapshot.get(column_key(schema_name, table_name, col_info['column']))
+                if entry:
+                    entry['policy_state'] = POLICY_APPLIED
+                    changed.append(entry)
+        self.snapshot_store.update(key, changed)
+
+    def _snapshot_key(self, database: str, schema: str) -> str:
+        return f"{self.target_name}/{database}/{schema}"
+
+    @staticmethod
+    def _table_refs(schema: str, tables: Iterable[str]) -> List[Tuple[str, str]]:
+        """(schema, table) pairs for 'table' or 'schema.table' entries"""
+        default_schema = 'public' if schema == ALL_SCHEMAS else schema
+        refs = []
+        for table in tables:
+            schema_name, _, table_name = table.rpartition('.')
+            refs.append((schema_name or default_schema, table_name))
+        return refs
+
+    @staticmethod
+    def _table_filter(refs: Iterable[Tuple[str, str]], schema_column: str, table_column: str) -> str:
+        """SQL predicate matching any of the (schema, table) pairs"""
+        by_schema = {}
+        for schema_name, table_name in refs:
+            by_schema.setdefault(schema_name, set()).add(table_name)
+        if not by_schema:
+            return '1 = 0'
+        return ' OR '.join(
+            "({} = '{}' AND {} IN ({}))".format(
+                schema_column, _sql_literal(schema_name), table_column,
+                ', '.join(f"'{_sql_literal(t)}'" for t in sorted(table_names)))
+            for schema_name, table_names in sorted(by_schema.items())
         )
+
+    @staticmethod
+    def _table_key(schema: str, schema_name: str, table_name: str) -> str:
+        """sensitive_columns keys are bare table names for one schema, schema.table for all schemas"""
+        return f"{schema_name}.{table_name}" if schema == ALL_SCHEMAS else table_name
+
+    @staticmethod
+    def _split_table_key(schema: str, table_key: str) -> Tuple[str, str]:
+        if schema == ALL_SCHEMAS:
+            schema_name, table_name = table_key.split('.', 1)
+            return schema_name, table_name
+        return schema, table_key
+
+    @staticmethod
+    def _policy_name(schema: str, table_name: str, column_name: str, role: str) -> str:
+        """Per-column policy name; outside public it ends in a hash of schema.table.column.
+
+        Policies in public keep their original names so existing deployments
+        reconcile cleanly. Elsewhere (and for public names over the identifier
+        limit) the readable part is truncated to fit, and the hash keeps e.g.
+        public.sales_orders.email and sales.orders.email apart.
+        """
+        name = f"mask_{table_name}_{column_name}_{role}"
+        if schema == 'public' and len(name.encode('utf-8')) <= MAX_IDENTIFIER_LENGTH:
+            return name
+        digest = hashlib.sha256(f"{schema}.{table_name}.{column_name}".encode('utf-8')).hexdigest()[:10]
+        suffix = f"_{role}_{digest}"
+        readable = f"mask_{schema}_{table_name}_{column_name}".encode('utf-8')
+        return readable[:MAX_IDENTIFIER_LENGTH - len(suffix)].decode('utf-8', 'ignore') + suffix
+
+    def _policy_definition(self, schema: str, table_name: str, column_name: str, sensitivity_type: str,
+                           role: str, data_type: Optional[str] = None) -> Tuple[str, str, str, str]:
+        """(policy name, input argument, input type, masking expression) for one column and role"""
+        if not self.share_policies or not self._is_string_type(data_type):
+            policy_name = self._policy_name(schema, table_name, column_name, role)
+            masking_expr = self.masking_policies[role][sensitivity_type].format(column=column_name)
+            return policy_name, column_name, 'VARCHAR(256)', masking_expr
+        
+        # Policies are parameterized by their input, so one policy serves every string column
+        policy_name = f"mask_{sensitivity_type}_{role}_varchar"
+        masking_expr = self.masking_policies[role][sensitivity_type].format(column=SHARED_POLICY_INPUT)
+        return policy_name, SHARED_POLICY_INPUT, 'VARCHAR(256)', masking_expr
+
+    @staticmethod
+    def _is_string_type(data_type: Optional[str]) -> bool:
+        """Whether a column data type takes the string masking expressions (unknown types are assumed to)"""
+        return (data_type or 'character varying').lower().split('(')[0].strip() in STRING_TYPES
+
+    def detect_by_sampling(self, database: str, columns: List[Tuple[str, str, str]],
+                           budget: Optional[SamplingBudget] = None) -> Dict[Tuple[str, str, str], Dict]:
+        """Score (schema, table, column) candidates from sampled values; see value_sampler.ValueSampler"""
+        sampler = ValueSampler(self, budget) if budget else self.value_sampler or ValueSampler(self)
+        return sampler.sample(database, columns)
+
+    def _classify_catalog(self, database: str, rows: Iterable[Tuple],
+                          previous: Optional[Dict[str, Dict]] = None) -> Iterator[Tuple[Tuple, Optional[str], Optional[Dict]]]:
+        """Yield (row, sensitivity type, sample score) using names, then sampled values when enabled.
+
+        Sampling looks for PII in unflagged string columns and drops a name
+        match whose sampled values never look like that type (e.g. card_count).
+        Columns already in the previous snapshot with the same data type keep
+        their recorded type and are not re-sampled.
+        """
+        if self.value_sampler is None:
+            for row, sensitivity_type in self._classify_rows(rows):
+                yield row, sensitivity_type, None
+            return
         
-        self._wait_for_query(response['Id'])
-        result = self.redshift_data.get_statement_result(Id=response['Id'])
+        classified = []
+        candidates = []
+        for row, sensitivity_type in self._classify_rows(rows):
+            before = previous.get(column_key(*row[:3])) if previous else None
+            if before and before['data_type'] == row[3]:
+                sensitivity_type = before['type']
+            elif sensitivity_type in DETECTABLE_TYPES or (
+                    sensitivity_type is None and self._is_string_type(row[3])):
+                candidates.append((row[:3], sensitivity_type is None))
+            classified.append((row, sensitivity_type))
         
-        sensitive_columns = {}
-        for record in result['Records']:
-            table_name = record[0]['stringValue']
-            column_name = record[1]['stringValue']
-            
-            for sensitivity_type, pattern in self.sensitive_patterns.items():
-                if re.match(pattern, column_name.lower()):
-                    if table_name not in sensitive_columns:
-                        sensitive_columns[table_name] = []
-                    sensitive_columns[table_name].append({
-                        'column': column_name,
-                        'type': sensitivity_type
-                    })
-                    break
+        # Name-flagged columns are verified first; the budget decides how many unflagged ones follow
+        candidates.sort(key=lambda candidate: candidate[1])
+        with self.metrics.stage('sampling'):
+            samples = self.value_sampler.sample(database, [column for column, _ in candidates])
         
-        return sensitive_columns
+        for row, sensitivity_type in classified:
+            sample = samples.get(row[:3])
+            if sample:
+                if sample['type']:
+                    sensitivity_type = sample['type']
+                elif sensitivity_type in DETECTABLE_TYPES and sample['sampled'] and not sample['scores'][sensitivity_type]:
+                    sensitivity_type = None
+            yield row, sensitivity_type, sample
+
+    def _classify_rows(self, rows: Iterable[Tuple]) -> Iterator[Tuple[Tuple, Optional[str]]]:
+        """Pair catalog rows with their sensitivity type, classifying one batch of names at a time"""
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.classifier.batch_size:
+                yield from zip(batch, self._classify_batch(batch))
+                batch = []
+        if batch:
+            yield from zip(batch, self._classify_batch(batch))
+
+    def _classify_batch(self, batch: List[Tuple]) -> List[Optional[str]]:
+        with self.metrics.stage('classify'):
+            types = self.classifier.classify([r[2] for r in batch])
+        self.metrics.count('columns_scanned', len(batch))
+        self.metrics.count('columns_sensitive', sum(1 for t in types if t))
+        return types
+
+    def generate_masking_sql(self, database: str, schema: str = 'public', include_schemas: Optional[List[str]] = None,
+                             exclude_schemas: Optional[List[str]] = None,
+                             tables: Optional[List[str]] = None):
+        """Generate SQL commands for manual execution by superuser; the commands are produced lazily"""
+        sensitive_columns = self._scan_sensitive_columns(database, schema, include_schemas, exclude_schemas, tables)
+        sql_commands = (step.sql for step in self._policy_steps(sensitive_columns, schema))
+        return sql_commands, sensitive_columns
+
+    def plan_masking(self, database: str, schema: str = 'public', include_schemas: Optional[List[str]] = None,
+                     exclude_schemas: Optional[List[str]] = None,
+                     tables: Optional[List[str]] = None) -> MaskingPlan:
+        """Build a plan holding only the policies and attachments missing from the cluster"""
+        stream = self.plan_stream(database, schema, include_schemas, exclude_schemas, tables)
+        with self.metrics.stage('plan'):
+            steps = list(stream)
+        return MaskingPlan(steps, stream.sensitive_columns, stream.skipped)
+
+    def plan_stream(self, database: str, schema: str = 'public', include_schemas: Optional[List[str]] = None,
+                    exclude_schemas: Optional[List[str]] = None,
+                    tables: Optional[List[str]] = None) -> PlanStream:
+        """Like plan_masking(), but the missing steps are generated as the stream is read"""
+        sensitive_columns = self._scan_sensitive_columns(database, schema, include_schemas, exclude_schemas, tables)
+        if not sensitive_columns:
+            return PlanStream([], {}, set(), sensitive_columns)
+        if tables:
+            # Read back only the policies this plan needs and the attachments on these tables
+            existing_policies, existing_attachments = self.fetch_policy_state(
+                database, tables=self._table_refs(schema, tables),
+                policy_names={step.policy_name for step in self._policy_steps(sensitive_columns, schema)
+                              if step.action == 'create'}
+            )
+        else:
+            existing_policies, existing_attachments = self.fetch_policy_state(database)
+        return PlanStream(self._policy_steps(sensitive_columns, schema), existing_policies,
+                          existing_attachments, sensitive_columns)
+
+    def fetch_policy_state(self, database: str, tables: Optional[List[Tuple[str, str]]] = None,
+                           policy_names: Optional[Iterable[str]] = None) -> Tuple[Dict[str, str], Set[AttachmentKey]]:
+        """Read existing masking policies and attachments in one query.
 
-    def generate_masking_sql(self, database: str, schema: str = 'public'):
-        """Generate SQL commands for manual execution by superuser"""
-        sensitive_columns = self.scan_new_columns(database, schema)
+        tables ((schema, table) pairs) and policy_names narrow the read; narrowed reads are not cached.
+        """
+        narrowed = tables is not None or policy_names is not None
+        if self.catalog_cache is not None and not narrowed:
+            cached = self.catalog_cache.get(self.target_name, database, POLICY_STATE_KEY)
+            if cached is not None:
+                return cached
         
-        sql_commands = []
-        roles = ['public', 'analyst_role', 'admin_role']
+        policy_filter = attachment_filter = ''
+        if policy_names is not None:
+            names = ', '.join(f"'{_sql_literal(name)}'" for name in sorted(policy_names))
+            policy_filter = f"WHERE policy_name IN ({names})" if names else "WHERE 1 = 0"
+        if tables is not None:
+            attachment_filter = 'WHERE ' + self._table_filter(tables, 'schema_name', 'table_name')
+        query = f"""
+        SELECT 'policy', policy_name, NULL, NULL, NULL, policy_expression::VARCHAR(65535)
+        FROM svv_masking_policy {policy_filter}
+        UNION ALL
+        SELECT 'attachment', policy_name, schema_name, table_name, grantee, input_columns::VARCHAR(65535)
+        FROM svv_attached_masking_policy {attachment_filter}
+        """
+        policies = {}
+        attachments = set()
+        rows = self._iter_query_rows(database, query, stage='policy_state')
+        for kind, policy_name, schema_name, table_name, grantee, detail in rows:
+            if kind == 'policy':
+                policies[policy_name.lower()] = parse_policy_expression(detail)
+            else:
+                for column_name in parse_input_columns(detail):
+                    attachments.add((policy_name.lower(), schema_name.lower(), table_name.lower(),
+                                     column_name.lower(), grantee.lower()))
+        if self.catalog_cache is not None and not narrowed:
+            self.catalog_cache.put(self.target_name, database, POLICY_STATE_KEY, (policies, attachments),
+                                   rows=len(policies) + len(attachments))
+        return policies, attachments
+
+    def _scan_sensitive_columns(self, database: str, schema: str, include_schemas: Optional[List[str]] = None,
+                                exclude_schemas: Optional[List[str]] = None,
+                                tables: Optional[List[str]] = None) -> Dict[str, List[Dict]]:
+        if self.snapshot_store is None:
+            return self.scan_new_columns(database, schema, include_schemas, exclude_schemas, tables)
         
-        for table_name, columns in sensitive_columns.items():
+        # Incremental mode: only columns added, retyped or still pending since the last snapshot
+        sensitive_columns = {}
+        delta = self.scan_catalog_delta(database, schema, include_schemas, exclude_schemas, tables)
+        for entry in delta.columns_to_mask():
+            table_key = self._table_key(schema, entry['schema'], entry['table'])
+            sensitive_columns.setdefault(table_key, []).append({
+                'column': entry['column'],
+                'type': entry['type'],
+                'data_type': entry['data_type']
+            })
+        return sensitive_columns
+
+    def iter_plan_steps(self, rows: Iterable[Tuple[str, str, str, str]]) -> Iterator[PlanStep]:
+        """Stream CREATE/ATTACH steps for (schema, table, column, data_type) rows without touching the cluster"""
+        created = set() if self.share_policies else None
+        owners = {}
+        for (schema_name, table_name, column_name, data_type), sensitivity_type in self._classify_rows(rows):
+            if sensitivity_type:
+                col_info = {'column': column_name, 'type': sensitivity_type, 'data_type': data_type}
+                yield from self._column_steps(schema_name, table_name, col_info, created, owners)
+
+    def _policy_steps(self, sensitive_columns: Dict[str, List[Dict]], schema: str) -> Iterator[PlanStep]:
+        """Desired CREATE/ATTACH steps for every role on every sensitive column, generated lazily"""
+        created = set() if self.share_policies else None
+        owners = {}
+        for table_key, columns in sensitive_columns.items():
+            schema_name, table_name = self._split_table_key(schema, table_key)
             for col_info in columns:
-                for role in roles:
-                    policy_name = f"mask_{table_name}_{col_info['column']}_{role}"
-                    masking_expr = self.masking_policies[role][col_info['type']].format(column=col_info['column'])
-                    
-                    # Create policy SQL
-                    create_sql = f"""CREATE MASKING POLICY {policy_name}
-WITH ({col_info['column']} VARCHAR(256))
+                yield from self._column_steps(schema_name, table_name, col_info, created, owners)
+
+    def _column_steps(self, schema_name: str, table_name: str, col_info: Dict,
+                      created: Optional[Set[str]], owners: Dict[str, str]) -> Iterator[PlanStep]:
+        """Steps for one column; shared policies already in created are not created again.
+
+        owners maps each per-column policy name (for the first role) to its
+        column; a name already owned by another column raises ValueError.
+        """
+        roles = ['public', 'analyst_role', 'admin_role']
+        relation = f"{schema_name}.{table_name}"
+        column_key = f"{relation}.{col_info['column']}"
+        
+        for role in roles:
+            policy_name, arg_name, arg_type, masking_expr = self._policy_definition(
+                schema_name, table_name, col_info['column'], col_info['type'], role,
+                col_info.get('data_type')
+            )
+            
+            # Names differ only by role suffix, so one check per column covers every role
+            if role == roles[0] and arg_name != SHARED_POLICY_INPUT:
+                owner = owners.setdefault(policy_name, column_key)
+                if owner != column_key:
+                    raise ValueError(f"Masking policy name {policy_name} maps to both {owner} and {column_key}")
+            
+            # Create policy SQL (shared policies are created once)
+            if created is None or policy_name not in created:
+                if created is not None:
+                    created.add(policy_name)
+                create_sql = f"""CREATE MASKING POLICY {policy_name}
+WITH ({arg_name} {arg_type})
 USING ({masking_expr});"""
-                    
-                    # Attach policy SQL
-                    if role == 'public':
-                        attach_sql = f"""ATTACH MASKING POLICY {policy_name}
-ON {table_name}({col_info['column']})
+                yield PlanStep('create', policy_name, create_sql, schema_name, table_name,
+                               col_info['column'], role, masking_expr)
+            
+            # Attach policy SQL
+            if role == 'public':
+                attach_sql = f"""ATTACH MASKING POLICY {policy_name}
+ON {relation}({col_info['column']})
 TO PUBLIC;"""
-                    elif role == 'analyst_role':
-                        attach_sql = f"""ATTACH MASKING POLICY {policy_name}
-ON {table_name}({col_info['column']})
+            elif role == 'analyst_role':
+                attach_sql = f"""ATTACH MASKING POLICY {policy_name}
+ON {relation}({col_info['column']})
 TO ROLE {role}
 PRIORITY 10;"""
-                    else:
-                        attach_sql = f"""ATTACH MASKING POLICY {policy_name}
-ON {table_name}({col_info['column']})
+            else:
+                attach_sql = f"""ATTACH MASKING POLICY {policy_name}
+ON {relation}({col_info['column']})
 TO ROLE {role}
 PRIORITY 20;"""
-                    
-                    sql_commands.append(create_sql)
-                    sql_commands.append(attach_sql)
+            
+            yield PlanStep('attach', policy_name, attach_sql, schema_name, table_name,
+                           col_info['column'], role, masking_expr)
+
+    def invalidate_policy_state(self, database: str):
+        """Forget cached policy state after this process changed it"""
+        if self.catalog_cache is not None:
+            self.catalog_cache.invalidate(self.target_name, database, POLICY_STATE_KEY)
+
+    def find_stale_policies(self, database: str, db_user: Optional[str] = None) -> Dict[str, Dict]:
+        """Managed (mask_*) policies that are detached or attached to columns that no longer exist.
+
+        One query joins SVV_MASKING_POLICY to its attachments and to the live
+        columns in SVV_ALL_COLUMNS. Returns, by policy name, its status
+        ('detached': no attachments, 'orphaned': every attachment is stale,
+        'partial': some are) and the stale attachments as (schema, table,
+        columns, grantee, grantee type).
+
+        SVV_ALL_COLUMNS only lists columns the querying identity may see, so
+        the join runs as db_user (the identity that will detach) and
+        PermissionError is raised if any stale attachment's columns still
+        exist in pg_attribute, i.e. the identity cannot see that table.
+        """
+        query = f"""
+        SELECT p.policy_name, a.schema_name, a.table_name, a.grantee, a.grantee_type,
+               a.input_columns::VARCHAR(65535), COUNT(c.column_name)
+        FROM svv_masking_policy p
+        LEFT JOIN svv_attached_masking_policy a ON a.policy_name = p.policy_name
+        LEFT JOIN svv_all_columns c
+            ON c.database_name = '{_sql_literal(database)}'
+            AND c.schema_name = a.schema_name AND c.table_name = a.table_name
+            AND STRPOS(a.input_columns::VARCHAR(65535), '"' || c.column_name || '"') > 0
+        WHERE p.policy_name LIKE '{_glob_to_like(MANAGED_POLICY_PREFIX + '*')}'
+        GROUP BY 1, 2, 3, 4, 5, 6
+        ORDER BY 1
+        """
+        policies = {}
+        # JSON results: a detached policy's LEFT JOIN NULLs must not read as ''
+        rows = self._iter_query_rows(database, query, stage='policy_state', csv_results=False, db_user=db_user)
+        for policy_name, schema_name, table_name, grantee, grantee_type, detail, live_columns in rows:
+            policy = policies.setdefault(policy_name.lower(), {'live': 0, 'stale': []})
+            if not schema_name:
+                continue
+            columns = parse_input_columns(detail)
+            # An attachment is live while all of its columns still exist
+            if int(live_columns or 0) >= len(columns):
+                policy['live'] += 1
+            else:
+                policy['stale'].append((schema_name, table_name, columns, grantee, grantee_type))
         
-        return sql_commands, sensitive_columns
+        self._check_stale_columns_gone(database, [attachment for policy in policies.values()
+                                                  for attachment in policy['stale']], db_user)
+        stale = {}
+        for policy_name, policy in policies.items():
+            if not policy['live'] and not policy['stale']:
+                stale[policy_name] = {'status': 'detached', 'stale_attachments': []}
+            elif policy['stale']:
+                stale[policy_name] = {
+                    'status': 'partial' if policy['live'] else 'orphaned',
+                    'stale_attachments': policy['stale']
+                }
+        self.metrics.count('policies_scanned', len(policies))
+        return stale
+
+    def _check_stale_columns_gone(self, database: str, attachments: List[Tuple], db_user: Optional[str]):
+        """Raise PermissionError if a stale attachment's columns still exist but were hidden from db_user"""
+        if not attachments:
+            return
+        refs = {(schema_name, table_name) for schema_name, table_name, _, _, _ in attachments}
+        query = f"""
+        SELECT nspname, relname, attname
+        FROM pg_attribute
+        JOIN pg_class ON pg_class.oid = attrelid
+        JOIN pg_namespace ON pg_namespace.oid = relnamespace
+        WHERE attnum > 0 AND NOT attisdropped
+            AND ({self._table_filter(refs, 'nspname', 'relname')})
+        """
+        existing = {(schema_name, table_name, column_name) for schema_name, table_name, column_name in
+                    self._iter_query_rows(database, query, stage='policy_state', db_user=db_user)}
+        hidden = sorted({f"{schema_name}.{table_name}"
+                         for schema_name, table_name, columns, _, _ in attachments
+                         if all((schema_name, table_name, column) in existing for column in columns)})
+        if hidden:
+            raise PermissionError(
+                f"{len(hidden)} tables with masking policies are not visible to "
+                f"{db_user or 'the Data API identity'} (e.g. {', '.join(hidden[:3])}); "
+                f"run cleanup as a user that can see every masked table")
+
+    @staticmethod
+    def _detach_sql(policy_name: str, schema_name: str, table_name: str, columns: List[str],
+                    grantee: str, grantee_type: Optional[str]) -> str:
+        if grantee.lower() == 'public' or (grantee_type or '').lower() == 'public':
+            target = 'PUBLIC'
+        elif (grantee_type or 'role').lower() == 'role':
+            target = f"ROLE {grantee}"
+        else:
+            target = grantee
+        return f"""DETACH MASKING POLICY {policy_name}
+ON {schema_name}.{table_name}({', '.join(columns)})
+FROM {target};"""
+
+    def plan_policy_cleanup(self, database: str, max_policies: int = DEFAULT_CLEANUP_LIMIT,
+                            db_user: Optional[str] = None) -> Tuple[MaskingPlan, Dict]:
+        """DETACH/DROP steps for up to max_policies stale policies, plus a report of everything found.
+
+        Stale attachments are detached; a policy is dropped once nothing live
+        uses it. Policies past the cap are only counted, and a later run picks
+        them up, since each run re-reads the catalog.
+        """
+        stale = self.find_stale_policies(database, db_user)
+        steps = []
+        selected = []
+        for policy_name, policy in list(stale.items())[:max(0, max_policies)]:
+            detaches = []
+            for schema_name, table_name, columns, grantee, grantee_type in policy['stale_attachments']:
+                sql = self._detach_sql(policy_name, schema_name, table_name, columns, grantee, grantee_type)
+                steps.append(PlanStep('detach', policy_name, sql, schema_name, table_name,
+                                      ', '.join(columns), grantee))
+                detaches.append(f"{schema_name}.{table_name}({', '.join(columns)}) FROM {grantee}")
+            if policy['status'] != 'partial':
+                steps.append(PlanStep('drop', policy_name, f"DROP MASKING POLICY {policy_name};"))
+            selected.append({'policy': policy_name, 'status': policy['status'], 'detach': detaches})
+        
+        plan = MaskingPlan(steps, {})
+        statuses = [policy['status'] for policy in stale.values()]
+        report = {
+            'stale_policies': len(stale),
+            'detached': statuses.count('detached'),
+            'orphaned': statuses.count('orphaned'),
+            'partial': statuses.count('partial'),
+            'stale_attachments': sum(len(policy['stale_attachments']) for policy in stale.values()),
+            'selected_policies': len(selected),
+            'deferred_policies': len(stale) - len(selected),
+            'plan_summary': plan.summary(),
+            'policies': selected
+        }
+        return plan, report
+
+    def cleanup_policies(self, database: str, dry_run: bool = True, max_policies: int = DEFAULT_CLEANUP_LIMIT,
+                         batch_size: int = MAX_BATCH_SIZE, db_user: Optional[str] = None,
+                         deadline: Optional[float] = None, sinks: Optional[List[PlanSink]] = None) -> Dict:
+        """Remove stale managed policies so the DDM catalog tracks the live schema.
 
-    def create_masking_policy(self, database: str, table_name: str, column_name: str, sensitivity_type: str, role: str, schema: str = 'public'):
-        """Create DDM policy for specific role"""
-        policy_name = f"mask_{table_name}_{column_name}_{role}"
-        masking_expr = self.masking_policies[role][sensitivity_type].format(column=column_name)
+        With dry_run (the default) nothing is executed; the report lists what
+        would be detached and dropped. Otherwise the plan runs through
+        execute_plan, which keeps each policy's DETACHes and DROP in one batch.
+        With sinks, the cleanup plan is also written to them ('outputs').
+        """
+        # Scanned as the same identity that detaches, so it sees the same tables
+        plan, report = self.plan_policy_cleanup(database, max_policies, db_user)
+        report['dry_run'] = dry_run
+        if sinks:
+            report['outputs'] = write_plan(plan.steps, sinks)
+        if dry_run or not plan.steps:
+            report['message'] = 'No stale masking policies' if not report['stale_policies'] else \
+                'Dry run - no statements executed'
+            report['sql_commands'] = plan.sql_commands
+            report['plan'] = plan
+            return report
+        
+        execution = self.execute_plan(database, plan, batch_size=batch_size, db_user=db_user, deadline=deadline)
+        report['execution'] = {key: execution[key] for key in
+                               ('status', 'executed_commands', 'total_batches', 'failed_batches', 'error')
+                               if key in execution}
+        report['message'] = f"Stale masking policy cleanup {execution['status']}"
+        return report
+
+    def create_masking_policy(self, database: str, table_name: str, column_name: str, sensitivity_type: str, role: str,
+                              schema: str = 'public', data_type: Optional[str] = None):
+        """Create DDM policy for specific role (the shared policy when share_policies is on)"""
+        policy_name, arg_name, arg_type, masking_expr = self._policy_definition(
+            schema, table_name, column_name, sensitivity_type, role, data_type
+        )
         
         policy_sql = f"""
         CREATE MASKING POLICY {policy_name}
-        WITH ({column_name} VARCHAR(256))
+        WITH ({arg_name} {arg_type})
         USING ({masking_expr})
         """
         
         try:
             response = self.redshift_data.execute_statement(
-                ClusterIdentifier=self.cluster_identifier,
-                Database=database,
+                **self._connection_params(database),
                 Sql=policy_sql
             )
             self._wait_for_query(response['Id'])
+            self.invalidate_policy_state(database)
             print(f"Created masking policy: {policy_name}")
             return policy_name
         except Exception as e:
+            if is_throttling_error(e):
+                # Still throttled after retries; not a problem with this policy
+                raise
             print(f"Error creating policy {policy_name}: {e}")
             return None
 
@@ -147,58 +815,252 @@ PRIORITY 20;"""
         if role == 'public':
             attach_sql = f"""
             ATTACH MASKING POLICY {policy_name}
-            ON {table_name}({column_name})
+            ON {schema}.{table_name}({column_name})
             TO PUBLIC
             """
         elif role == 'analyst_role':
             attach_sql = f"""
             ATTACH MASKING POLICY {policy_name}
-            ON {table_name}({column_name})
+            ON {schema}.{table_name}({column_name})
             TO ROLE {role}
             PRIORITY 10
             """
         else:  # admin_role
             attach_sql = f"""
             ATTACH MASKING POLICY {policy_name}
-            ON {table_name}({column_name})
+            ON {schema}.{table_name}({column_name})
             TO ROLE {role}
             PRIORITY 20
             """
         
         try:
             response = self.redshift_data.execute_statement(
-                ClusterIdentifier=self.cluster_identifier,
-                Database=database,
+                **self._connection_params(database),
                 Sql=attach_sql
             )
             self._wait_for_query(response['Id'])
+            self.invalidate_policy_state(database)
             print(f"Attached policy {policy_name} to {role}")
         except Exception as e:
+            if is_throttling_error(e):
+                raise
             print(f"Error attaching policy to {role}: {e}")
 
-    def apply_automated_masking(self, database: str, schema: str = 'public'):
-        """Main automation method - generates SQL for superuser execution"""
-        sql_commands, sensitive_columns = self.generate_masking_sql(database, schema)
+    def apply_automated_masking(self, database: str, schema: str = 'public', include_schemas: Optional[List[str]] = None,
+                                exclude_schemas: Optional[List[str]] = None,
+                                tables: Optional[List[str]] = None, sinks: Optional[List[PlanSink]] = None):
+        """Main automation method - plans only the missing policies for superuser execution.
+
+        Pass schema='*' to cover every user schema in one catalog query.
+        With sinks (plan_sinks.ChunkedFileSink, ObjectStoreSink, ExecutorSink)
+        the steps are streamed into them instead of being returned, and the
+        result carries each sink's manifest under 'outputs'.
+        """
+        if sinks is not None:
+            stream = self.plan_stream(database, schema, include_schemas, exclude_schemas, tables)
+            with self.metrics.stage('plan'):
+                for step in stream:
+                    for sink in sinks:
+                        sink.write(step)
+            # Closing waits for the executor's batches to finish
+            with self.metrics.stage('execute'):
+                outputs = {sink.name: sink.close() for sink in sinks}
+            steps = sum(stream.counts.values())
+            sensitive_columns = stream.sensitive_columns
+            plan_summary = stream.summary()
+        else:
+            plan = self.plan_masking(database, schema, include_schemas, exclude_schemas, tables)
+            steps = len(plan.steps)
+            sensitive_columns = plan.sensitive_columns
+            plan_summary = plan.summary()
         
         if not sensitive_columns:
-            return {'message': 'No sensitive columns detected'}
+            result = {'message': 'No sensitive columns detected'}
+            if self.snapshot_store is not None:
+                result = {
+                    'message': 'No new sensitive columns since last snapshot',
+                    'catalog_delta': self.last_catalog_delta.summary()
+                }
+            if sinks is not None:
+                result['outputs'] = outputs
+            return result
         
-        return {
-            'message': 'Masking policies generated - execute SQL as superuser in Redshift',
+        result = {
             'sensitive_columns': sensitive_columns,
-            'sql_commands': sql_commands
+            'plan_summary': plan_summary
         }
+        if self.snapshot_store is not None:
+            result['catalog_delta'] = self.last_catalog_delta.summary()
+        if sinks is not None:
+            result['outputs'] = outputs
+        
+        if not steps:
+            result['message'] = 'Masking policies already up to date'
+            return result
+        
+        result['message'] = 'Masking policies generated - execute SQL as superuser in Redshift'
+        if sinks is None:
+            result['sql_commands'] = plan.sql_commands
+            result['plan'] = plan
+        return result
+
+    def submit_statement(self, database: str, sql, depends_on=(), db_user: Optional[str] = None,
+                         timeout: Optional[float] = None, send_by: Optional[float] = None) -> Future:
+        """Send a statement (or list of statements as one batch) without blocking; returns a Future.
+
+        A statement still unsent at send_by (a time.time() value) fails with
+        statement_scheduler.SendDeadlinePassed instead.
+        """
+        params = self._connection_params(database, db_user)
+        if isinstance(sql, str):
+            params['Sql'] = sql
+        else:
+            params['Sqls'] = list(sql)
+        return self.scheduler.submit(params, depends_on=depends_on, timeout=timeout, send_by=send_by)
+
+    def _connection_params(self, database: str, db_user: Optional[str] = None) -> Dict[str, str]:
+        """Data API target and credentials: a cluster (optionally as db_user) or a serverless workgroup.
+
+        Workgroups have no DbUser; they connect with secret_arn or as the caller's IAM identity.
+        """
+        if self.workgroup_name:
+            params = {'WorkgroupName': self.workgroup_name, 'Database': database}
+        else:
+            params = {'ClusterIdentifier': self.cluster_identifier, 'Database': database}
+            if db_user and not self.secret_arn:
+                params['DbUser'] = db_user
+        if self.secret_arn:
+            params['SecretArn'] = self.secret_arn
+        return params
+
+    def execute_plan(self, database: str, plan, batch_size: int = MAX_BATCH_SIZE,
+                     db_user: Optional[str] = None, checkpoint: Optional[PlanCheckpoint] = None,
+                     deadline: Optional[float] = None) -> Dict:
+        """Execute a MaskingPlan (or list of SQL commands) as transactional batch_execute_statement chunks.
+
+        Independent batches run concurrently; a batch that touches a policy or
+        table used by an earlier batch waits for that batch to finish first.
+        With a checkpoint, batches it already records are skipped and each
+        finished batch is recorded. At deadline (a time.time() value) batches
+        not yet sent are deferred and the plan returns as 'incomplete'.
+        """
+        with self.metrics.stage('execute'):
+            return self._execute_plan(database, plan, batch_size, db_user, checkpoint, deadline)
+
+    def _execute_plan(self, database: str, plan, batch_size: int, db_user: Optional[str],
+                      checkpoint: Optional[PlanCheckpoint], deadline: Optional[float]) -> Dict:
+        sink = ExecutorSink(self, database, batch_size, db_user, checkpoint, deadline)
+        for sql in (plan.sql_commands if isinstance(plan, MaskingPlan) else plan):
+            sink.write_sql(sql)
+        return sink.close()
+
+    def _iter_query_rows(self, database: str, query: str, stage: str = 'catalog_fetch',
+                         csv_results: bool = True, db_user: Optional[str] = None) -> Iterator[Tuple]:
+        """Run a query (as db_user, if given) and yield its rows page by page, using CSV results when supported.
+
+        CSV results carry NULL as '' (see _iter_statement_rows), so queries that
+        must tell the two apart pass csv_results=False. Time spent waiting on
+        the query and its result pages counts toward stage.
+        """
+        csv_format = csv_results and self._supports_csv_results()
+        params = self._connection_params(database, db_user)
+        params['Sql'] = query
+        if csv_format:
+            params['ResultFormat'] = 'CSV'
+        
+        with self.metrics.stage(stage):
+            response = self.redshift_data.execute_statement(**params)
+            self._wait_for_query(response['Id'])
+        return self._iter_statement_rows(response['Id'], csv_format, stage)
+
+    def _iter_statement_rows(self, statement_id: str, csv_format: bool = False,
+                             stage: Optional[str] = None) -> Iterator[Tuple]:
+        """Yield the rows of a finished statement page by page.
+
+        JSON results give NULL as None. CSV has no NULL marker, so there NULL
+        and '' both come back as '' and every value is a string.
+        """
+        for page in self._iter_result_pages(statement_id, csv_format, stage):
+            if csv_format:
+                header = [column['name'] for column in page.get('ColumnMetadata', [])]
+                rows_read = 0
+                for formatted in page['Records']:
+                    for row in csv.reader(io.StringIO(formatted['CSVRecords'])):
+                        if row and row != header:
+                            rows_read += 1
+                            yield tuple(row)
+                self.metrics.count('rows_read', rows_read)
+            else:
+                self.metrics.count('rows_read', len(page['Records']))
+                for record in page['Records']:
+                    yield tuple(None if field.get('isNull') else next(iter(field.values())) for field in record)
+
+    def _iter_result_pages(self, statement_id: str, csv_format: bool, stage: Optional[str] = None) -> Iterator[Dict]:
+        """Yield result pages, fetching the next page while the caller works on the current one.
+
+        Only time spent blocked on a page counts toward stage; prefetching overlaps the caller's work.
+        """
+        if csv_format:
+            fetch = self.redshift_data.get_statement_result_v2
+        else:
+            fetch = self.redshift_data.get_statement_result
+        
+        with ThreadPoolExecutor(max_workers=1) as prefetcher:
+            start = time.perf_counter()
+            page = fetch(Id=statement_id)
+            while True:
+                if stage:
+                    self.metrics.add_time(stage, time.perf_counter() - start)
+                self.metrics.count('result_pages')
+                next_token = page.get('NextToken')
+                next_page = prefetcher.submit(fetch, Id=statement_id, NextToken=next_token) if next_token else None
+                yield page
+                if next_page is None:
+                    return
+                start = time.perf_counter()
+                page = next_page.result()
+
+    def _supports_csv_results(self) -> bool:
+        """CSV results need GetStatementResultV2, which older botocore releases lack"""
+        if not hasattr(self.redshift_data, 'get_statement_result_v2'):
+            return False
+        meta = getattr(self.redshift_data, 'meta', None)
+        if meta is None:
+            return True
+        try:
+            operation = meta.service_model.operation_model('ExecuteStatement')
+        except Exception:
+            return False
+        return 'ResultFormat' in operation.input_shape.members
+
+    @property
+    def redshift_data(self):
+        """Data API client, created on first use so offline planning needs no AWS session.
+
+        Calls go through a ThrottledClient (rate limits, retries of throttling
+        errors) and an InstrumentedClient that counts each request in self.metrics.
+        """
+        if self._redshift_data is None:
+            self._redshift_data = shared_client(self.region)
+        if self._client_wrapper is None:
+            self._client_wrapper = ThrottledClient(
+                InstrumentedClient(self._redshift_data, self.metrics), self.throttle, self.metrics
+            )
+        return self._client_wrapper
+
+    @redshift_data.setter
+    def redshift_data(self, client):
+        self._redshift_data = client
+        self._client_wrapper = None
+        self._scheduler = None
+
+    @property
+    def scheduler(self) -> StatementScheduler:
+        if self._scheduler is None:
+            self._scheduler = StatementScheduler(self.redshift_data, max_in_flight=self.max_concurrency,
+                                                 concurrency=self.throttle.concurrency)
+        return self._scheduler
 
     def _wait_for_query(self, query_id: str, max_wait_time: int = 30):
         """Wait for query completion with timeout"""
-        import time
-        start_time = time.time()
-        while time.time() - start_time < max_wait_time:
-            response = self.redshift_data.describe_statement(Id=query_id)
-            if response['Status'] == 'FINISHED':
-                break
-            elif response['Status'] == 'FAILED':
-                raise Exception(f"Query failed: {response.get('Error')}")
-            time.sleep(0.5)
-        else:
-            raise Exception(f"Query timed out after {max_wait_time} seconds")_wait_time} seconds")
\ No newline at end of file
+        return self.scheduler.wait(query_id, timeout=max_wait_time)
@@ -0,0 +1,129 @@
+import io
+import json
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+METRICS_NAMESPACE = 'RedshiftMasking'
+
+
+class RunMetrics:
+    """Stage timers and counters for one automation run, printed as CloudWatch EMF JSON.
+
+    Stage time accumulates, so a streamed stage (e.g. catalog pages read
+    while classifying) can be timed in pieces. Counters are thread-safe
+    because Data API calls are also made from the scheduler's poller thread.
+    """
+
+    def __init__(self, namespace: str = METRICS_NAMESPACE, dimensions: Optional[Dict[str, str]] = None):
+        self.namespace = namespace
+        self.dimensions = dict(dimensions or {})
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.timings: Dict[str, float] = {}
+            self.counters: Dict[str, int] = {}
+            self.started = time.time()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name: str, seconds: float):
+        with self._lock:
+            self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+    def count(self, name: str, value: int = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def snapshot(self) -> Dict[str, float]:
+        """Flat metric values, including derived statements per second"""
+        with self._lock:
+            values = {f'{name}_seconds': round(seconds, 4) for name, seconds in self.timings.items()}
+            values.update(self.counters)
+            values['total_seconds'] = round(time.time() - self.started, 4)
+        execute_seconds = values.get('execute_seconds')
+        if execute_seconds:
+            values['statements_per_second'] = round(values.get('statements_executed', 0) / execute_seconds, 2)
+        return values
+
+    def to_emf(self, **properties) -> Dict:
+        """Embedded Metric Format record; extra properties are logged but not turned into metrics"""
+        values = self.snapshot()
+        metrics = []
+        for name in values:
+            if name.endswith('_seconds'):
+                unit = 'Seconds'
+            elif name == 'statements_per_second':
+                unit = 'Count/Second'
+            else:
+                unit = 'Count'
+            metrics.append({'Name': name, 'Unit': unit})
+        record = {
+            '_aws': {
+                'Timestamp': int(time.time() * 1000),
+                'CloudWatchMetrics': [{
+                    'Namespace': self.namespace,
+                    'Dimensions': [sorted(self.dimensions)],
+                    'Metrics': metrics
+                }]
+            }
+        }
+        record.update(self.dimensions)
+        record.update(properties)
+        record.update(values)
+        return record
+
+    def emit(self, **properties):
+        """Print the EMF record; Lambda ships stdout to CloudWatch Logs, which extracts the metrics"""
+        print(json.dumps(self.to_emf(**properties)))
+
+
+class InstrumentedClient:
+    """Counts Data API calls by operation (api_<operation>) and passes everything else through"""
+
+    def __init__(self, client, metrics: RunMetrics):
+        self._client = client
+        self._metrics = metrics
+
+    @property
+    def wrapped(self):
+        return self._client
+
+    def __getattr__(self, name: str):
+        attribute = getattr(self._client, name)
+        if not callable(attribute) or name.startswith('_') or name in ('meta', 'exceptions'):
+            return attribute
+        metrics = self._metrics
+
+        def call(*args, **kwargs):
+            metrics.count(f'api_{name}')
+            return attribute(*args, **kwargs)
+        return call
+
+
+@contextmanager
+def profiled(enabled: bool = True, limit: int = 25, sort: str = 'cumulative') -> Iterator[None]:
+    """cProfile the block and print the top functions; a no-op when disabled"""
+    if not enabled:
+        yield
+        return
+    import cProfile
+    import pstats
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        output = io.StringIO()
+        pstats.Stats(profiler, stream=output).sort_stats(sort).print_stats(limit)
+        print(output.getvalue())
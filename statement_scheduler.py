@@ -0,0 +1,255 @@
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError, TimeoutError as FutureTimeoutError
+from typing import Dict, Iterable, List, Optional
+
+from throttled_client import RetryLater
+
+TERMINAL_FAILURES = ('FAILED', 'ABORTED')
+
+
+class StatementFailed(Exception):
+    """Raised through a statement future when the Data API reports failure"""
+
+    def __init__(self, message: str, statement_id: Optional[str] = None):
+        super().__init__(message)
+        self.statement_id = statement_id
+
+
+class DependencyFailed(StatementFailed):
+    """Raised through a statement future when a statement it depends on failed, so it was never sent"""
+
+
+class SendDeadlinePassed(StatementFailed):
+    """Raised through a statement future when its send_by time passed before it could be sent"""
+
+
+class _Statement:
+    __slots__ = ('request', 'future', 'depends_on', 'timeout', 'statement_id',
+                 'delay', 'next_check', 'deadline', 'attempts', 'not_before', 'send_by')
+
+    def __init__(self, future: Future, timeout: float, request: Optional[Dict] = None,
+                 depends_on: Iterable[Future] = (), statement_id: Optional[str] = None,
+                 send_by: Optional[float] = None):
+        self.future = future
+        self.send_by = send_by
+        self.timeout = timeout
+        self.request = request
+        self.depends_on = list(depends_on)
+        self.statement_id = statement_id
+        self.delay = 0.0
+        self.next_check = 0.0
+        self.deadline = 0.0
+        self.attempts = 0
+        self.not_before = 0.0
+
+
+class StatementScheduler:
+    """Keeps many Data API statements in flight and watches them from one poller thread.
+
+    Callers get a Future per statement. A statement is only sent once every
+    future it depends on has succeeded, so ordering is enforced only where a
+    caller asks for it (e.g. ATTACH after its CREATE). Each outstanding
+    statement is described with adaptive backoff: quick first checks, then
+    exponentially slower ones up to max_delay. With a concurrency controller
+    (throttled_client.AdaptiveConcurrency), its current limit also caps the
+    statements in flight. With a client that has try_call
+    (throttled_client.ThrottledClient), a rate-limited or throttled call is
+    put back and retried later instead of stalling the poller, so in-flight
+    statements keep being described meanwhile. The poller exits after
+    idle_timeout seconds with nothing queued or in flight and is restarted by
+    the next submit. A statement given a send_by time that is still unsent
+    then (waiting on dependencies, capacity or a throttled retry) fails with
+    SendDeadlinePassed instead of being sent late.
+    """
+
+    def __init__(self, client, max_in_flight: int = 8, initial_delay: float = 0.05,
+                 max_delay: float = 2.0, backoff: float = 2.0, timeout: float = 300, concurrency=None,
+                 idle_timeout: float = 1.0):
+        self.client = client
+        self.max_in_flight = max(1, max_in_flight)
+        self.concurrency = concurrency
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.backoff = backoff
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.describe_calls = 0
+
+        self._cond = threading.Condition()
+        self._waiting: List[_Statement] = []
+        self._in_flight: Dict[str, _Statement] = {}
+        self._thread = None
+
+    def submit(self, request: Dict, depends_on: Iterable[Future] = (),
+               timeout: Optional[float] = None, send_by: Optional[float] = None) -> Future:
+        """Queue an execute_statement (Sql) or batch_execute_statement (Sqls) request, to be sent before send_by"""
+        future = Future()
+        statement = _Statement(future, timeout or self.timeout, request=request, depends_on=depends_on,
+                               send_by=send_by)
+        for dependency in statement.depends_on:
+            dependency.add_done_callback(self._wake)
+        with self._cond:
+            self._waiting.append(statement)
+            self._ensure_poller()
+            self._cond.notify()
+        return future
+
+    def track(self, statement_id: str, timeout: Optional[float] = None) -> Future:
+        """Watch a statement that was already sent by the caller"""
+        future = Future()
+        statement = _Statement(future, timeout or self.timeout, statement_id=statement_id)
+        with self._cond:
+            self._start_polling(statement, time.time())
+            self._ensure_poller()
+            self._cond.notify()
+        return future
+
+    def wait(self, statement_id: str, timeout: Optional[float] = None) -> Dict:
+        """Block until a statement finishes and return its describe_statement response"""
+        timeout = timeout or self.timeout
+        future = self.track(statement_id, timeout)
+        try:
+            # The poller fails the statement at its deadline; the margin only guards against a stalled poller
+            return future.result(timeout=timeout + self.max_delay + self.idle_timeout)
+        except FutureTimeoutError:
+            with self._cond:
+                self._in_flight.pop(statement_id, None)
+            future.cancel()
+            raise StatementFailed(f"Query timed out after {timeout:g} seconds", statement_id)
+
+    def _wake(self, _future=None):
+        with self._cond:
+            self._cond.notify()
+
+    def _ensure_poller(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='statement-poller', daemon=True)
+            self._thread.start()
+
+    def _start_polling(self, statement: _Statement, now: float):
+        statement.delay = self.initial_delay
+        statement.next_check = now + statement.delay
+        statement.deadline = now + statement.timeout
+        self._in_flight[statement.statement_id] = statement
+
+    def _take_ready(self, now: float) -> List[_Statement]:
+        """Pop waiting statements whose dependencies are settled, up to the in-flight cap"""
+        ready = []
+        remaining = []
+        limit = self.max_in_flight if self.concurrency is None else min(self.max_in_flight, self.concurrency.limit)
+        capacity = limit - len(self._in_flight)
+        for statement in self._waiting:
+            if statement.future.cancelled():
+                continue
+            if statement.send_by is not None and now >= statement.send_by:
+                # Also covers a throttled retry, whose future is already running and cannot be cancelled
+                statement.future.set_exception(SendDeadlinePassed('Deadline passed; statement not sent'))
+                continue
+            if statement.not_before > now or not all(dep.done() for dep in statement.depends_on):
+                remaining.append(statement)
+                continue
+            failed = [dep for dep in statement.depends_on if dep.cancelled() or dep.exception()]
+            if failed:
+                statement.future.set_exception(DependencyFailed('Dependency failed; statement not sent'))
+            elif capacity > 0 and (statement.future.running() or statement.future.set_running_or_notify_cancel()):
+                ready.append(statement)
+                capacity -= 1
+            elif not statement.future.cancelled():
+                remaining.append(statement)
+        self._waiting = remaining
+        return ready
+
+    def _run(self):
+        while True:
+            with self._cond:
+                now = time.time()
+                ready = self._take_ready(now)
+                due = [s for s in self._in_flight.values() if s.next_check <= now]
+                if not ready and not due:
+                    wake_at = [s.next_check for s in self._in_flight.values()]
+                    wake_at.extend(s.not_before for s in self._waiting if s.not_before > now)
+                    wake_at.extend(s.send_by for s in self._waiting if s.send_by is not None)
+                    if wake_at:
+                        self._cond.wait(max(0.0, min(wake_at) - now))
+                    elif self._waiting:
+                        self._cond.wait()
+                    elif not self._cond.wait(self.idle_timeout) and not self._waiting and not self._in_flight:
+                        # Nothing to do: exit so an idle scheduler (and its automator) holds no thread
+                        self._thread = None
+                        return
+                    continue
+
+            for statement in ready:
+                self._send(statement)
+            for statement in due:
+                self._poll(statement)
+
+    def _call(self, operation: str, attempt: int, **kwargs) -> Dict:
+        try_call = getattr(self.client, 'try_call', None)
+        if try_call is None:
+            return getattr(self.client, operation)(**kwargs)
+        return try_call(operation, attempt, **kwargs)
+
+    def _send(self, statement: _Statement):
+        request = dict(statement.request)
+        operation = 'batch_execute_statement' if 'Sqls' in request else 'execute_statement'
+        try:
+            response = self._call(operation, statement.attempts, **request)
+        except RetryLater as e:
+            # Back in the queue; the poller keeps describing in-flight statements meanwhile
+            if e.error is not None:
+                statement.attempts += 1
+            with self._cond:
+                statement.not_before = time.time() + e.delay
+                self._waiting.append(statement)
+            return
+        except Exception as e:
+            statement.future.set_exception(e)
+            return
+        statement.statement_id = response['Id']
+        with self._cond:
+            self._start_polling(statement, time.time())
+
+    def _poll(self, statement: _Statement):
+        try:
+            response = self._call('describe_statement', 0, Id=statement.statement_id)
+            self.describe_calls += 1
+        except RetryLater as e:
+            # Throttled describes are retried until the statement's own deadline
+            if time.time() >= statement.deadline:
+                self._finish(statement, exception=e.error or StatementFailed(
+                    f"Query timed out after {statement.timeout:g} seconds", statement.statement_id))
+            else:
+                statement.next_check = time.time() + e.delay
+            return
+        except Exception as e:
+            self._finish(statement, exception=e)
+            return
+
+        status = response['Status']
+        if status == 'FINISHED':
+            response.setdefault('Id', statement.statement_id)
+            self._finish(statement, result=response)
+        elif status in TERMINAL_FAILURES:
+            self._finish(statement, exception=StatementFailed(
+                f"Query failed: {response.get('Error')}", statement.statement_id))
+        elif time.time() >= statement.deadline:
+            self._finish(statement, exception=StatementFailed(
+                f"Query timed out after {statement.timeout:g} seconds", statement.statement_id))
+        else:
+            statement.delay = min(statement.delay * self.backoff, self.max_delay)
+            statement.next_check = time.time() + statement.delay
+
+    def _finish(self, statement: _Statement, result: Optional[Dict] = None,
+                exception: Optional[BaseException] = None):
+        with self._cond:
+            self._in_flight.pop(statement.statement_id, None)
+        try:
+            if exception is not None:
+                statement.future.set_exception(exception)
+            else:
+                statement.future.set_result(result)
+        except InvalidStateError:
+            # Already given up on by wait()
+            pass
@@ -0,0 +1,209 @@
+import json
+import os
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+
+from run_metrics import RunMetrics, profiled
+
+IDENTIFIER = r'(?:"(?:[^"]|"")+"|[\w$]+)'
+QUALIFIED_NAME = rf'({IDENTIFIER}(?:\s*\.\s*{IDENTIFIER}){{0,2}})'
+
+# Statements that can add or change columns; each captures the relation name
+DDL_TABLE_PATTERNS = [
+    re.compile(rf'\bCREATE\s+(?:(?:LOCAL\s+)?(?:TEMP|TEMPORARY)\s+)?TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?{QUALIFIED_NAME}',
+               re.IGNORECASE),
+    re.compile(rf'\bALTER\s+TABLE\s+(?:IF\s+EXISTS\s+)?{QUALIFIED_NAME}', re.IGNORECASE),
+    re.compile(rf'\bSELECT\b.*?\bINTO\s+(?:(?:TEMP|TEMPORARY|TABLE)\s+)*{QUALIFIED_NAME}',
+               re.IGNORECASE | re.DOTALL),
+]
+RENAME_PATTERN = re.compile(rf'\bALTER\s+TABLE\s+(?:IF\s+EXISTS\s+)?{QUALIFIED_NAME}\s+RENAME\s+TO\s+({IDENTIFIER})',
+                            re.IGNORECASE)
+NAME_PART_PATTERN = re.compile(IDENTIFIER)
+
+# Payload keys that only scope a scan; every other key is an option that must match to merge
+SCOPE_KEYS = ('schema', 'tables', 'ddl')
+
+# Stack settings used by events that name no cluster, workgroup or database
+TARGET_ENV_DEFAULTS = {
+    'cluster_identifier': 'CLUSTER_IDENTIFIER',
+    'workgroup_name': 'WORKGROUP_NAME',
+    'database': 'DATABASE_NAME'
+}
+
+
+def _name_parts(name: str) -> List[str]:
+    parts = []
+    for part in NAME_PART_PATTERN.findall(name):
+        if part.startswith('"'):
+            parts.append(part[1:-1].replace('""', '"'))
+        else:
+            parts.append(part.lower())
+    return parts
+
+
+def _qualify(name: str, default_schema: str) -> str:
+    parts = _name_parts(name)
+    # database.schema.table keeps only schema.table
+    if len(parts) == 1:
+        parts.insert(0, default_schema)
+    return '.'.join(parts[-2:])
+
+
+def parse_ddl_tables(sql: str, default_schema: str = 'public') -> List[str]:
+    """'schema.table' names created or altered by the DDL statements in sql, in order of appearance"""
+    found = []
+    for statement in sql.split(';'):
+        renamed = RENAME_PATTERN.search(statement)
+        if renamed:
+            # The columns now live under the new name, in the same schema
+            schema_name = _qualify(renamed.group(1), default_schema).split('.')[0]
+            found.append(f'{schema_name}.{_name_parts(renamed.group(2))[0]}')
+            continue
+        for pattern in DDL_TABLE_PATTERNS:
+            match = pattern.search(statement)
+            if match:
+                found.append(_qualify(match.group(1), default_schema))
+                break
+    return list(dict.fromkeys(found))
+
+
+def event_payloads(event: Dict, rejected: Optional[List[str]] = None) -> List[Tuple[Optional[str], Dict]]:
+    """(message id, payload) for each change carried by a direct, SQS or EventBridge event.
+
+    SQS records whose body is not a JSON object are left out and their
+    message ids appended to rejected, so one bad message does not fail the
+    rest of the batch.
+    """
+    if isinstance(event.get('Records'), list):
+        payloads = []
+        for record in event['Records']:
+            body = record.get('body') or '{}'
+            try:
+                payload = json.loads(body) if isinstance(body, str) else body
+            except ValueError as e:
+                payload = e
+            if not isinstance(payload, dict):
+                print(f"Rejected message {record.get('messageId')}: body is not a JSON object ({payload})")
+                if rejected is not None:
+                    rejected.append(record.get('messageId'))
+                continue
+            # A queued EventBridge event keeps its payload under 'detail'
+            if isinstance(payload.get('detail'), dict):
+                payload = payload['detail']
+            payloads.append((record.get('messageId'), payload))
+        return payloads
+    if isinstance(event.get('detail'), dict):
+        return [(event.get('id'), event['detail'])]
+    return [(None, event)]
+
+
+def payload_tables(payload: Dict, schema: str) -> Optional[List[str]]:
+    """Qualified tables named by a payload's 'tables' list and/or 'ddl' text; None means no table scope"""
+    tables = []
+    default_schema = 'public' if schema == '*' else schema
+    named = payload.get('tables') or []
+    # "tables": "orders" names one table
+    for table in [named] if isinstance(named, str) else named:
+        tables.append(table if '.' in table else f'{default_schema}.{table}')
+    if isinstance(payload.get('ddl'), str):
+        tables.extend(parse_ddl_tables(payload['ddl'], default_schema))
+    return list(dict.fromkeys(tables)) or None
+
+
+def _options_key(payload: Dict) -> str:
+    """Everything but a payload's scope: payloads only merge when their target and mode options match"""
+    return json.dumps({key: value for key, value in payload.items() if key not in SCOPE_KEYS},
+                      sort_keys=True, default=str)
+
+
+def coalesce(payloads: List[Tuple[Optional[str], Dict]], defaults: Optional[Dict] = None) -> List[Dict]:
+    """Merge payloads with the same target and options into as few scan targets as possible.
+
+    Payloads only merge when everything but their scope (schema, tables, ddl)
+    matches, so a cleanup or dry-run message never takes on another
+    message's mode. Full-scan payloads become one full-scan target per
+    schema ('*' covers them all); table-scoped payloads merge into one
+    qualified table list, minus tables a full scan already covers. Each
+    target carries the message ids it covers, so a failed target can report
+    exactly those messages.
+    """
+    defaults = defaults or {}
+    groups = {}
+    for message_id, payload in payloads:
+        if payload.get('cluster_identifier') or payload.get('workgroup_name'):
+            # An explicit cluster or workgroup replaces the default target instead of adding to it
+            payload = dict(payload, cluster_identifier=payload.get('cluster_identifier'),
+                           workgroup_name=payload.get('workgroup_name'))
+        payload = dict(defaults, **payload)
+        schema = payload.get('schema', 'public')
+        tables = payload_tables(payload, schema)
+        group = groups.setdefault(_options_key(payload), {'payload': payload, 'full_scans': {}, 'tables': {},
+                                                          'ddl': False})
+        group['ddl'] = group['ddl'] or bool(payload.get('ddl'))
+        if tables is None:
+            group['full_scans'].setdefault(schema, []).append(message_id)
+        else:
+            for table in tables:
+                group['tables'].setdefault(table, []).append(message_id)
+
+    merged = []
+    for group in groups.values():
+        full_scans, tables = group['full_scans'], group['tables']
+        if '*' in full_scans:
+            # One database-wide scan covers every other scope
+            full_scans = {'*': [message_id for ids in list(full_scans.values()) + list(tables.values())
+                                for message_id in ids]}
+            tables = {}
+        base = {key: value for key, value in group['payload'].items() if key not in SCOPE_KEYS}
+        for schema, message_ids in full_scans.items():
+            covered = [table for table in tables if table.split('.', 1)[0] == schema]
+            message_ids = message_ids + [message_id for table in covered for message_id in tables.pop(table)]
+            merged.append(dict(base, schema=schema, tables=None, ddl=group['ddl'],
+                               message_ids=list(dict.fromkeys(message_ids))))
+        if tables:
+            schemas = {table.split('.', 1)[0] for table in tables}
+            # Tables that span schemas are planned database-wide with qualified names
+            merged.append(dict(base, schema=schemas.pop() if len(schemas) == 1 else '*', tables=list(tables),
+                               ddl=group['ddl'],
+                               message_ids=list(dict.fromkeys(m for ids in tables.values() for m in ids))))
+    return merged
+
+
+def handle_event(event: Dict, handle: Callable[[Dict], Dict], metrics: RunMetrics,
+                 defaults: Optional[Dict] = None) -> Dict:
+    """Run handle once per coalesced target of a direct, SQS or EventBridge event.
+
+    Targets fall back to the CLUSTER_IDENTIFIER / WORKGROUP_NAME /
+    DATABASE_NAME env vars, then defaults. metrics is reset before each target
+    and emitted as one EMF record after it. A direct or EventBridge event
+    returns its target's response; an SQS batch returns batchItemFailures for
+    rejected messages and those of targets that did not return 200.
+    """
+    stack = {key: os.environ.get(name) for key, name in TARGET_ENV_DEFAULTS.items()}
+    defaults = dict(defaults or {}, **{key: value for key, value in stack.items() if value})
+    rejected = []
+    responses = []
+    for target in coalesce(event_payloads(event, rejected), defaults):
+        metrics.reset()
+        # "profile": true (or MASKING_PROFILE=1) logs a cProfile summary of the run
+        with profiled(bool(target.get('profile') or os.environ.get('MASKING_PROFILE'))):
+            response = handle(target)
+        metrics.emit(
+            cluster_identifier=target.get('cluster_identifier'),
+            workgroup_name=target.get('workgroup_name'),
+            database=target.get('database'),
+            tables=len(target['tables'] or []),
+            status_code=response['statusCode']
+        )
+        responses.append((target, response))
+
+    if 'Records' not in event:
+        return responses[0][1]
+    # Failed messages go back to the queue for another attempt
+    return {
+        'batchItemFailures': [{'itemIdentifier': message_id} for message_id in dict.fromkeys(rejected + [
+            message_id
+            for target, response in responses if response['statusCode'] != 200
+            for message_id in target['message_ids']
+        ])]
+    }
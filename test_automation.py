@@ -1,6 +1,10 @@
 import boto3
 import json
+from masking_plan import BatchPacker
+from masking_verifier import MaskingVerifier, format_matrix
+from plan_compiler import compile_plan
 from redshift_masking_automation import RedshiftMaskingAutomator
+from table_events import coalesce, parse_ddl_tables
 
 class DDMTestAutomation:
     def __init__(self, cluster_identifier: str, database: str, region: str = 'us-east-1'):
@@ -105,6 +109,67 @@ class DDMTestAutomation:
             else:
                 print(f"✗ Missed detection: {expected}")
 
+    def test_shared_policy_types(self):
+        """Shared policies only take string columns; non-string sensitive columns keep per-column policies"""
+        print("\n=== Testing Shared Policy Input Types ===")
+        
+        rows = [
+            ('public', 'contacts', 'email', 'character varying(256)'),
+            ('public', 'contacts', 'phone', 'bigint'),
+            ('public', 'payments', 'credit_card', 'integer')
+        ]
+        creates = [step for step in compile_plan(rows, share_policies=True) if step.action == 'create']
+        
+        for step in creates:
+            shared = step.policy_name.endswith('_varchar')
+            if 'VARCHAR(256)' in step.sql and shared == (step.column == 'email'):
+                print(f"✓ {step.policy_name}")
+            else:
+                print(f"✗ {step.policy_name}: {step.sql.splitlines()[1]}")
+        return creates
+
+    def test_event_coalescing(self):
+        """Queued change events merge only when their options match, without widening any scan"""
+        print("\n=== Testing Event Coalescing ===")
+        
+        checks = []
+        ddl = ('CREATE TABLE sales.orders (id INT); ALTER TABLE "HR"."Staff" RENAME TO staff_v2; '
+               'SELECT * INTO tmp_x FROM y')
+        checks.append(('DDL tables', parse_ddl_tables(ddl), ['sales.orders', 'HR.staff_v2', 'public.tmp_x']))
+        
+        defaults = {'cluster_identifier': 'c', 'database': 'dev'}
+        targets = coalesce([
+            ('m1', {'schema': 'finance'}),
+            ('m2', {'tables': ['hr.staff']}),
+            ('m3', {'tables': ['finance.ledger', 'hr.payroll']}),
+            ('m4', {'cleanup': True, 'dry_run': False}),
+            ('m5', {'tables': ['hr.staff']})
+        ], defaults)
+        scopes = sorted((t['schema'], tuple(t['tables'] or ()), bool(t.get('cleanup')), tuple(sorted(t['message_ids'])))
+                        for t in targets)
+        checks.append(('coalesced targets', scopes, [
+            ('finance', (), False, ('m1', 'm3')),
+            ('hr', ('hr.staff', 'hr.payroll'), False, ('m2', 'm3', 'm5')),
+            ('public', (), True, ('m4',))
+        ]))
+        
+        # Each CREATE stays with its ATTACH; batches touching the same table wait for each other
+        packer = BatchPacker(batch_size=3)
+        batches = []
+        for policy, table in [('mask_a', 'public.t'), ('mask_b', 'public.t'), ('mask_c', 'public.u')]:
+            batches.extend(packer.add(f'CREATE MASKING POLICY {policy} WITH (v VARCHAR(256)) USING (v);'))
+            batches.extend(packer.add(f'ATTACH MASKING POLICY {policy} ON {table}(v) TO PUBLIC;'))
+        batches.extend(packer.flush())
+        checks.append(('packed batches', [(len(batch), sorted(depends_on)) for batch, depends_on in batches],
+                       [(2, []), (2, [0]), (2, [])]))
+        
+        for name, actual, expected in checks:
+            if actual == expected:
+                print(f"✓ {name}")
+            else:
+                print(f"✗ {name}: {actual} != {expected}")
+        return checks
+
     def create_manual_masking_policies(self):
         """Create masking policies from notebook for comparison"""
         policies = [
@@ -192,6 +257,23 @@ class DDMTestAutomation:
             except Exception as e:
                 print(f"✗ {user_type}: {e}")
 
+    def test_masking_matrix(self, schema: str = 'public', tables=None, sample_rows: int = 100):
+        """Verify every masked column for every role at once (one projection per role and table)"""
+        print("\n=== Verifying Masking Matrix ===")
+        
+        verifier = MaskingVerifier(self.automator, {
+            'public': 'regular_user',
+            'analyst_role': 'analyst_user',
+            'admin_role': 'admin_user'
+        }, sample_rows=sample_rows)
+        report = verifier.verify(self.database, schema, tables=tables)
+        
+        print(format_matrix(report))
+        for failure in report['failures']:
+            print(f"✗ {failure['table']} as {failure['role']}: {failure.get('error') or failure['failed_columns']}")
+        print(f"Summary: {json.dumps(report['summary'])}")
+        return report
+
     def run_full_test(self):
         """Run complete test suite"""
         print("Starting DDM Automation Test Suite")
@@ -200,8 +282,11 @@ class DDMTestAutomation:
         self.setup_test_environment()
         self.create_masking_function()
         self.test_automation_detection()
+        self.test_shared_policy_types()
+        self.test_event_coalescing()
         self.create_manual_masking_policies()
         self.test_masking_effectiveness()
+        self.test_masking_matrix()
         
         print("\n" + "=" * 50)
         print("Test Suite Complete")
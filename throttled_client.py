@@ -0,0 +1,228 @@
+import random
+import threading
+import time
+from typing import Dict, Optional
+
+from run_metrics import RunMetrics
+
+# Error codes that mean "slow down", not "this SQL is wrong"
+THROTTLING_ERROR_CODES = ('ThrottlingException', 'ActiveStatementsExceededException', 'TooManyRequestsException')
+
+# Requests per second per operation, in line with the Data API's default per-account quotas
+DEFAULT_RATES = {
+    'execute_statement': 30,
+    'batch_execute_statement': 20,
+    'describe_statement': 100,
+    'get_statement_result': 20,
+    'get_statement_result_v2': 20,
+    'cancel_statement': 3,
+    'list_statements': 3
+}
+
+# Calls that start a statement; only these count toward the concurrency cap
+SUBMIT_OPERATIONS = ('execute_statement', 'batch_execute_statement')
+
+
+def error_code(error: BaseException) -> Optional[str]:
+    """The service error code of a botocore ClientError, or None"""
+    response = getattr(error, 'response', None)
+    if isinstance(response, dict):
+        return response.get('Error', {}).get('Code')
+    return None
+
+
+def is_throttling_error(error: BaseException) -> bool:
+    return error_code(error) in THROTTLING_ERROR_CODES
+
+
+class RetryLater(Exception):
+    """Raised by ThrottledClient.try_call when the call should be made again after delay seconds.
+
+    error is the throttling error that was retried, or None when the call was
+    never sent because its operation's rate limit had no token left.
+    """
+
+    def __init__(self, delay: float, error: Optional[BaseException] = None):
+        super().__init__(f"Retry in {delay:.3f}s" + (f" after {error}" if error is not None else ''))
+        self.delay = delay
+        self.error = error
+
+
+class TokenBucket:
+    """Allows rate calls per second on average with bursts of up to burst calls"""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> float:
+        """Take a token if one is available and return 0, else the seconds until one is"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self):
+        """Block until a token is available, then take it"""
+        while True:
+            wait = self.try_acquire()
+            if not wait:
+                return
+            time.sleep(wait)
+
+
+class AdaptiveConcurrency:
+    """AIMD cap on statements in flight.
+
+    Each successful submit adds 1/limit, so the cap grows by about one per
+    round of statements; a throttling error halves it. Throttles reported
+    within cooldown seconds of a decrease come from the same burst and do not
+    shrink it again.
+    """
+
+    def __init__(self, maximum: int, minimum: int = 1, decrease: float = 0.5, cooldown: float = 1.0):
+        self.maximum = maximum
+        self.minimum = minimum
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self._limit = float(maximum)
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def limit(self) -> int:
+        return max(self.minimum, int(self._limit))
+
+    def on_success(self):
+        with self._lock:
+            self._limit = min(float(self.maximum), self._limit + 1 / max(self._limit, 1.0))
+
+    def on_throttle(self):
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last_decrease >= self.cooldown:
+                self._limit = max(float(self.minimum), self._limit * self.decrease)
+                self._last_decrease = now
+
+
+class ThrottleController:
+    """Rate limits and the concurrency cap for one cluster, shared by every client that calls it.
+
+    rates maps operation name to calls per second; operations missing from
+    it are not rate limited (rates={} disables limiting).
+    """
+
+    def __init__(self, max_concurrency: int = 8, rates: Optional[Dict[str, float]] = None):
+        self.rates = dict(DEFAULT_RATES if rates is None else rates)
+        self.concurrency = AdaptiveConcurrency(max_concurrency)
+        self.throttled = 0
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, operation: str) -> Optional[TokenBucket]:
+        rate = self.rates.get(operation)
+        if not rate:
+            return None
+        with self._lock:
+            bucket = self._buckets.get(operation)
+            if bucket is None:
+                bucket = self._buckets[operation] = TokenBucket(rate)
+            return bucket
+
+    def on_throttle(self):
+        with self._lock:
+            self.throttled += 1
+        self.concurrency.on_throttle()
+
+
+# Data API quotas are shared by everything calling a cluster, so automators share its controller
+_CONTROLLERS: Dict[str, ThrottleController] = {}
+_CONTROLLERS_LOCK = threading.Lock()
+
+
+def cluster_controller(cluster_identifier: str, max_concurrency: int = 8,
+                       rates: Optional[Dict[str, float]] = None) -> ThrottleController:
+    """The process-wide controller for a cluster; the first caller's rates apply"""
+    with _CONTROLLERS_LOCK:
+        controller = _CONTROLLERS.get(cluster_identifier)
+        if controller is None:
+            controller = _CONTROLLERS[cluster_identifier] = ThrottleController(max_concurrency, rates)
+        elif max_concurrency > controller.concurrency.maximum:
+            controller.concurrency.maximum = max_concurrency
+        return controller
+
+
+def clear_controllers():
+    with _CONTROLLERS_LOCK:
+        _CONTROLLERS.clear()
+
+
+class ThrottledClient:
+    """Data API client wrapper: per-operation token buckets and jittered retries of throttling errors.
+
+    SQL errors, validation errors and anything else are raised on the first
+    attempt. A throttling error lowers the cluster's concurrency cap and is
+    retried after a full-jitter exponential backoff, up to max_attempts.
+    Calling an operation waits on the caller's thread; try_call never waits,
+    so a scheduler can retry later and keep serving other statements.
+    """
+
+    def __init__(self, client, controller: ThrottleController, metrics: Optional[RunMetrics] = None,
+                 max_attempts: int = 8, base_delay: float = 0.1, max_delay: float = 5.0):
+        self._client = client
+        self._controller = controller
+        self._metrics = metrics
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    @property
+    def wrapped(self):
+        return self._client
+
+    def try_call(self, operation: str, attempt: int = 0, *args, **kwargs):
+        """Make one attempt at an operation; raises RetryLater instead of waiting.
+
+        attempt counts the throttling errors already retried for this call;
+        the last of max_attempts raises the error itself.
+        """
+        bucket = self._controller.bucket(operation)
+        if bucket is not None:
+            wait = bucket.try_acquire()
+            if wait:
+                raise RetryLater(wait)
+        try:
+            response = getattr(self._client, operation)(*args, **kwargs)
+        except Exception as e:
+            if not is_throttling_error(e) or attempt >= self.max_attempts - 1:
+                raise
+            self._controller.on_throttle()
+            if self._metrics is not None:
+                self._metrics.count('throttle_retries')
+            raise RetryLater(random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt)), e)
+        if operation in SUBMIT_OPERATIONS:
+            self._controller.concurrency.on_success()
+        return response
+
+    def __getattr__(self, name: str):
+        attribute = getattr(self._client, name)
+        if not callable(attribute) or name.startswith('_') or name in ('meta', 'exceptions'):
+            return attribute
+
+        def call(*args, **kwargs):
+            attempt = 0
+            while True:
+                try:
+                    return self.try_call(name, attempt, *args, **kwargs)
+                except RetryLater as e:
+                    if e.error is not None:
+                        attempt += 1
+                    time.sleep(e.delay)
+        return call
@@ -0,0 +1,121 @@
+import re
+from typing import Dict, List, Optional, Tuple
+
+# (schema, table, column)
+ColumnRef = Tuple[str, str, str]
+
+# Each detector is one anchored MULTILINE regex run over all samples of a column at once
+DETECTORS = {
+    'email': re.compile(r'^[^@\s]+@[^@\s]+\.[A-Za-z]{2,}$', re.MULTILINE),
+    'ssn': re.compile(r'^(?!000|666|9\d\d)\d{3}-?(?!00)\d{2}-?(?!0000)\d{4}$', re.MULTILINE),
+    'credit_card': re.compile(r'^(?:\d[ -]?){12,18}\d$', re.MULTILINE),
+    'phone': re.compile(r'^(?:\+?1[\s.-]?)?\(?\d{3}\)?[\s.-]?\d{3}[\s.-]?\d{4}$', re.MULTILINE)
+}
+
+# Sensitivity types whose values can be recognised from content alone
+DETECTABLE_TYPES = tuple(DETECTORS)
+
+
+def luhn_valid(number: str) -> bool:
+    digits = [int(d) for d in number if d.isdigit()]
+    checksum = 0
+    for index, digit in enumerate(reversed(digits)):
+        if index % 2:
+            digit *= 2
+            if digit > 9:
+                digit -= 9
+        checksum += digit
+    return checksum % 10 == 0
+
+
+def _quote_identifier(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+class SamplingBudget:
+    """Caps on how much cluster work one sampling run may spend"""
+
+    def __init__(self, max_rows: int = 100000, max_statements: int = 50, rows_per_column: int = 100,
+                 columns_per_query: int = 25):
+        self.max_rows = max_rows
+        self.max_statements = max_statements
+        self.rows_per_column = rows_per_column
+        self.columns_per_query = columns_per_query
+
+
+class ValueSampler:
+    """Detects PII from a bounded sample of column values.
+
+    Candidate columns are sampled many at a time (one UNION ALL statement
+    per columns_per_query columns), statements run concurrently through the
+    automator's scheduler, and each detector scores a column as the share of
+    its non-null samples that match.
+    """
+
+    def __init__(self, automator, budget: Optional[SamplingBudget] = None, threshold: float = 0.8):
+        self.automator = automator
+        self.budget = budget or SamplingBudget()
+        self.threshold = threshold
+
+    def sample(self, database: str, columns: List[ColumnRef]) -> Dict[ColumnRef, Dict]:
+        """Return {column: {'type', 'confidence', 'sampled', 'scores'}} for the columns the budget covered"""
+        budget = self.budget
+        max_columns = min(
+            len(columns),
+            budget.max_rows // max(budget.rows_per_column, 1),
+            budget.max_statements * budget.columns_per_query
+        )
+        planned = columns[:max_columns]
+        if len(planned) < len(columns):
+            print(f"Sampling budget covers {len(planned)} of {len(columns)} candidate columns")
+
+        chunks = [planned[i:i + budget.columns_per_query] for i in range(0, len(planned), budget.columns_per_query)]
+        futures = [self.automator.submit_statement(database, self._sample_sql(chunk)) for chunk in chunks]
+
+        samples = {column: [] for column in planned}
+        for chunk, future in zip(chunks, futures):
+            try:
+                response = future.result()
+            except Exception as e:
+                print(f"Error sampling {len(chunk)} columns: {e}")
+                continue
+            for index, value in self.automator._iter_statement_rows(response['Id']):
+                if value is not None:
+                    samples[chunk[int(index)]].append(str(value))
+
+        return {column: self.score(values) for column, values in samples.items()}
+
+    def score(self, values: List[str]) -> Dict:
+        """Score one column's samples against every detector"""
+        if not values:
+            return {'type': None, 'confidence': 0.0, 'sampled': 0, 'scores': {}}
+
+        text = '\n'.join(value.strip().replace('\n', ' ') for value in values)
+        scores = {}
+        for sensitivity_type, pattern in DETECTORS.items():
+            matches = pattern.findall(text)
+            if sensitivity_type == 'credit_card':
+                matches = [match for match in matches if luhn_valid(match)]
+            scores[sensitivity_type] = round(len(matches) / len(values), 3)
+
+        best_type = max(scores, key=scores.get)
+        confidence = scores[best_type]
+        return {
+            'type': best_type if confidence >= self.threshold else None,
+            'confidence': confidence,
+            'sampled': len(values),
+            'scores': scores
+        }
+
+    def _sample_sql(self, chunk: List[ColumnRef]) -> str:
+        limit = self.budget.rows_per_column
+        parts = []
+        for index, (schema, table, column) in enumerate(chunk):
+            quoted = _quote_identifier(column)
+            parts.append(
+                f"SELECT {index} AS column_index, sample_value FROM ("
+                f"SELECT CAST({quoted} AS VARCHAR(256)) AS sample_value "
+                f"FROM {_quote_identifier(schema)}.{_quote_identifier(table)} "
+                f"WHERE {quoted} IS NOT NULL LIMIT {limit}) s{index}"
+            )
+        return '\nUNION ALL\n'.join(parts)